@@ -1,7 +1,53 @@
+import hashlib
+import re
+
+# re.Pattern is only available from Python 3.7 (3.8 for isinstance checks)
+PATTERN_TYPE = type(re.compile(""))
+
+
 class ContentTransformer:
     def transform(content):
         raise NotImplementedError()
 
     @classmethod
-    def from_siteinfo(cls, siteinfo, *args, **kwargs):
+    def from_siteinfo(cls, siteinfo, *args, cache=None, **kwargs):
+        """
+        Constructs the transformer for a wiki.  `cache` is an optional
+        :class:`mwtext.site_cache.SiteCache` to use for any other documents
+        that need to be fetched from the wiki.
+        """
         raise NotImplementedError()
+
+    def fingerprint(self):
+        """
+        Returns a hash of the transformer's class and public configuration.
+        Two transformers with the same fingerprint produce the same output for
+        the same content.
+        """
+        config = sorted((key, normalize_config(value))
+                        for key, value in vars(self).items()
+                        if not key.startswith("_"))
+        key = "{0}.{1}:{2!r}".format(
+            type(self).__module__, type(self).__qualname__, config)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def normalize_config(value):
+    """
+    Converts a configuration value into something with a stable `repr()`
+    across processes (sets are unordered and functions have addresses).
+    """
+    if isinstance(value, PATTERN_TYPE):
+        return (value.pattern, value.flags)
+    elif isinstance(value, (set, frozenset)):
+        return sorted(normalize_config(v) for v in value)
+    elif isinstance(value, dict):
+        return sorted((normalize_config(k), normalize_config(v))
+                      for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return [normalize_config(v) for v in value]
+    elif callable(value):
+        return "{0}.{1}".format(getattr(value, '__module__', None),
+                                getattr(value, '__qualname__', repr(value)))
+    else:
+        return value
@@ -0,0 +1,291 @@
+"""
+Incremental tokenization of successive revisions of a page.
+
+Most edits in a full-history dump change a small part of a large page.
+Rather than tokenizing each revision from scratch, wikitext is cut into
+segments at paragraph breaks, each segment is tokenized independently and
+the tokens of a segment are re-used whenever the same segment appears again
+in a later revision.  A paragraph break is only used if it sits outside of
+any multi-line markup (templates, tables, links, comments and refs) and
+none of the patterns that
+:class:`~mwtext.content_transformers.Wikitext2Words` strips or replaces
+match across it, so concatenating the tokens of each segment produces the
+same words that `Wikitext2Words` would produce for the whole text.
+"""
+import re
+from collections import Counter, OrderedDict
+
+from .wikitext2words import strip_starts
+
+PARAGRAPH_BREAK = re.compile(r"\n[^\S\n]*\n")
+DELIMITERS = re.compile(
+    r"(?P<open>\{\{|\{\||\[\[|<!--|<ref\b(?![^<>]*/>))|" +
+    r"(?P<close>\}\}|\|\}|\]\]|</ref\s*>)",
+    re.I
+)
+CLOSES = {"{{": "}}", "{|": "|}", "[[": "]]", "<ref": "</ref>"}
+
+
+def segment_wikitext(text, transformer):
+    """
+    Splits wikitext into segments that `transformer` (a
+    :class:`~mwtext.content_transformers.Wikitext2Words`) tokenizes the same
+    way separately as together.  Every segment but the first starts with the
+    whitespace of a paragraph break.  `"".join(segments) == text`.
+    """
+    breaks = balanced_breaks(text)
+    lower = text.lower()
+    if len(breaks) == 0 or len(lower) != len(text):
+        return [text]
+
+    # Follow each break through the same substitutions that the transformer
+    # makes and drop the ones that a match spans.  Breaks are whitespace and
+    # words never contain whitespace, so the words split there too.
+    positions = [(position, position) for position in breaks]
+    stage_text, spans = replace_matches(
+        lower, strip_matches(lower, transformer.strip_regex), "")
+    positions = map_positions(positions, spans)
+    for regex, replacement in transformer.replace_regexs:
+        stage_text, spans = replace_matches(
+            stage_text, regex.finditer(stage_text), replacement)
+        positions = map_positions(positions, spans)
+
+    segments = []
+    start = 0
+    for position, _ in positions:
+        segments.append(text[start:position])
+        start = position
+    segments.append(text[start:])
+    return segments
+
+
+def paragraph_breaks(text):
+    """
+    Returns the start of each run of whitespace that contains a blank line
+    (other than a run at the start of `text`).
+    """
+    starts = []
+    for match in PARAGRAPH_BREAK.finditer(text):
+        start = match.start()
+        while start > 0 and text[start - 1].isspace():
+            start -= 1
+        if start > 0 and (len(starts) == 0 or start > starts[-1]):
+            starts.append(start)
+    return starts
+
+
+def balanced_breaks(text):
+    """
+    Returns the paragraph breaks that aren't inside of any multi-line markup.
+    Delimiters are matched by type, comments are skipped and closing
+    delimiters with nothing open are ignored.  After a mismatched or unclosed
+    delimiter, the rest of the text is one segment.
+    """
+    breaks = paragraph_breaks(text)
+    balanced = []
+    stack = []
+    i = 0
+    pos = 0
+    while True:
+        match = DELIMITERS.search(text, pos)
+        if match is None:
+            break
+        while i < len(breaks) and breaks[i] < match.start():
+            if len(stack) == 0:
+                balanced.append(breaks[i])
+            i += 1
+
+        delimiter = match.group(0).lower()
+        pos = match.end()
+        if delimiter == "<!--":
+            end = text.find("-->", pos)
+            if end == -1:
+                return balanced
+            pos = end + 3
+            while i < len(breaks) and breaks[i] < pos:
+                i += 1
+        elif match.lastgroup == "open":
+            stack.append(delimiter)
+        else:
+            if delimiter == "|}" and len(stack) > 0 and \
+                    stack[-1] == "{{" and text.startswith("}", pos):
+                # "|}}" closes a template with an empty last argument
+                delimiter = "}}"
+                pos += 1
+            elif delimiter.startswith("</ref"):
+                delimiter = "</ref>"
+            if len(stack) == 0:
+                # A stray close (e.g. "}}" in <math>) isn't inside anything
+                continue
+            if CLOSES[stack[-1]] != delimiter:
+                return balanced
+            stack.pop()
+
+    if len(stack) == 0:
+        balanced.extend(breaks[i:])
+    return balanced
+
+
+def strip_matches(text, strip_regex):
+    """
+    Yields the matches that `strip_regex.sub()` would replace in `text`, only
+    trying the positions where a match can start.
+    """
+    pos = 0
+    while True:
+        start = strip_starts.search(text, pos)
+        if start is None:
+            break
+        match = strip_regex.match(text, start.start())
+        if match is not None and match.end() > match.start():
+            yield match
+            pos = match.end()
+        else:
+            pos = start.start() + 1
+
+
+def replace_matches(text, matches, replacement):
+    """
+    Replaces `matches` in `text` like `re.sub()`.  Returns the new text and
+    a (start, end, replacement length) span for each match.
+    """
+    pieces = []
+    spans = []
+    last = 0
+    for match in matches:
+        new = match.expand(replacement)
+        pieces.append(text[last:match.start()])
+        pieces.append(new)
+        spans.append((match.start(), match.end(), len(new)))
+        last = match.end()
+    pieces.append(text[last:])
+    return "".join(pieces), spans
+
+
+def map_positions(positions, spans):
+    """
+    Drops the (break, position) pairs with a position inside of a span and
+    moves the rest to where they end up once the spans are replaced.
+    """
+    mapped = []
+    shift = 0
+    i = 0
+    for original, position in positions:
+        while i < len(spans) and spans[i][1] <= position:
+            start, end, length = spans[i]
+            shift += end - start - length
+            i += 1
+        if i < len(spans) and spans[i][0] < position:
+            continue
+        mapped.append((original, position - shift))
+    return mapped
+
+
+class IncrementalWikitext2Words:
+    """
+    Wraps a :class:`~mwtext.content_transformers.Wikitext2Words` to tokenize
+    the revisions of a page in order.
+
+    Args:
+        transformer (Wikitext2Words): the transformer to use on segments.
+            CJK tokenization decides on a language using the whole text, so
+            it can't be applied segment by segment.
+        max_segments (int): the number of tokenized segments to remember
+        max_revisions (int): the number of revisions to remember the segments
+            of (for finding a revision's parent)
+    """
+    def __init__(self, transformer, max_segments=4096, max_revisions=16):
+        if transformer.tok_strategy is not None:
+            raise ValueError("Incremental tokenization does not support " +
+                             "tok_strategy={0}"
+                             .format(repr(transformer.tok_strategy)))
+        self.transformer = transformer
+        self.max_segments = max_segments
+        self.max_revisions = max_revisions
+        self.segment_tokens = OrderedDict()
+        self.revision_segments = OrderedDict()
+        self.tokenized_chars = 0
+
+    def new_page(self):
+        self.segment_tokens.clear()
+        self.revision_segments.clear()
+
+    def transform(self, content):
+        """
+        Converts wikitext into a cleaned up list of words.
+        """
+        tokens, _, _ = self.transform_revision(content)
+        return tokens
+
+    def transform_revision(self, content, rev_id=None, parent_id=None):
+        """
+        Tokenizes the text of a revision, re-using the tokens of segments
+        that were seen in earlier revisions of the page.
+
+        Returns:
+            (tokens, added, removed) where `added` and `removed` are the
+            tokens that were inserted and deleted relative to the parent
+            revision (or all tokens if the parent wasn't seen).
+        """
+        segments = segment_wikitext(content, self.transformer)
+
+        tokens = []
+        for segment in segments:
+            tokens.extend(self._segment_tokens(segment))
+
+        parent_segments = self.revision_segments.get(parent_id, [])
+        added, removed = self._token_deltas(parent_segments, segments)
+
+        if rev_id is not None:
+            self.revision_segments[rev_id] = segments
+            if len(self.revision_segments) > self.max_revisions:
+                self.revision_segments.popitem(last=False)
+
+        return tokens, added, removed
+
+    def _segment_tokens(self, segment):
+        if segment in self.segment_tokens:
+            self.segment_tokens.move_to_end(segment)
+            return self.segment_tokens[segment]
+
+        segment_tokens = self.transformer.transform(segment)
+        self.tokenized_chars += len(segment)
+        self.segment_tokens[segment] = segment_tokens
+        if len(self.segment_tokens) > self.max_segments:
+            self.segment_tokens.popitem(last=False)
+        return segment_tokens
+
+    def _token_deltas(self, parent_segments, segments):
+        parent_counts = Counter(parent_segments)
+        counts = Counter(segments)
+
+        added_tokens = []
+        for segment in segments:
+            if counts[segment] > parent_counts[segment]:
+                added_tokens.extend(self._segment_tokens(segment))
+                counts[segment] -= 1
+
+        counts = Counter(segments)
+        removed_tokens = []
+        for segment in parent_segments:
+            if parent_counts[segment] > counts[segment]:
+                removed_tokens.extend(self._segment_tokens(segment))
+                parent_counts[segment] -= 1
+
+        # Tokens that moved between segments were neither added nor removed
+        added_counts = Counter(added_tokens)
+        removed_counts = Counter(removed_tokens)
+        return (in_order(added_tokens, added_counts - removed_counts),
+                in_order(removed_tokens, removed_counts - added_counts))
+
+
+def in_order(tokens, counts):
+    """
+    Filters `tokens` down to the multiset `counts`, preserving order.
+    """
+    filtered = []
+    for token in tokens:
+        if counts[token] > 0:
+            filtered.append(token)
+            counts[token] -= 1
+    return filtered
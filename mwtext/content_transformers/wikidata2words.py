@@ -2,9 +2,9 @@ import json
 import re
 from itertools import chain
 
-import mwapi
 import mwbase
 
+from ..site_cache import fetch_sorted_properties
 from .content_transformer import ContentTransformer
 
 
@@ -15,15 +15,12 @@ class Wikidata2Words(ContentTransformer):
         self.pid_order_map = {pid: i for i, pid in enumerate(ordered_pids)}
 
     @classmethod
-    def from_siteinfo(cls, siteinfo, *args, **kwargs):
-        session = mwapi.Session(
-            "https:" + siteinfo['general']['server'],
-            "Wikidata2Words transformer")
-        doc = session.get(
-            action="parse",
-            page="MediaWiki:Wikibase-SortedProperties",
-            prop="wikitext")
-        wikitext = doc['parse']['wikitext']['*']
+    def from_siteinfo(cls, siteinfo, *args, cache=None, **kwargs):
+        host = "https:" + siteinfo['general']['server']
+        if cache is not None:
+            wikitext = cache.get_sorted_properties(host)
+        else:
+            wikitext = fetch_sorted_properties(host)
         ordered_pids = re.findall('P[0-9]+', wikitext)
         return cls(ordered_pids, *args, **kwargs)
 
@@ -88,7 +88,7 @@ class Wikitext2Structured(ContentTransformer):
         self._skipped_tags = set()
 
     @classmethod
-    def from_siteinfo(cls, siteinfo, *args, **kwargs):
+    def from_siteinfo(cls, siteinfo, *args, cache=None, **kwargs):
         forbidden_wikilink_prefixes = generate_non_link_namespace_names(siteinfo)
         return cls(
             *args,
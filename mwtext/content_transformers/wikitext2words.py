@@ -20,6 +20,9 @@ strip_wikitext = [
     r"'''?"  # No bold or italics
 ]
 
+# Every match of `strip_wikitext` (or of a hidden link) starts at one of these
+strip_starts = re.compile(r"\A;|[<{\[\n&']|//|[a-z]+:")
+
 replace_res = [
     # Replace headers with a paragraph break
     (re.compile(r"(^|\n)==+[^=]+==+"), "\n\n"),
@@ -39,7 +42,7 @@ class Wikitext2Words(ContentTransformer):
     def __init__(self, hidden_link_namespace_names, tok_strategy=None):
         forbidden_link_re = \
             r"\[\[(" + \
-            "|".join(hidden_link_namespace_names).lower() + \
+            "|".join(sorted(hidden_link_namespace_names)).lower() + \
             r"):[^\]]+\]\]"
         self.strip_regex = re.compile(
             "|".join(strip_wikitext + [forbidden_link_re]))
@@ -53,7 +56,7 @@ class Wikitext2Words(ContentTransformer):
         return self._extract_words(content)
 
     @classmethod
-    def from_siteinfo(cls, siteinfo, *args, **kwargs):
+    def from_siteinfo(cls, siteinfo, *args, cache=None, **kwargs):
         hidden_link_namespace_names = \
             util.generate_non_link_namespace_names(siteinfo)
         return cls(hidden_link_namespace_names, *args, **kwargs)
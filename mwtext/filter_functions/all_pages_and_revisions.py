@@ -1,2 +1,6 @@
+def include_page(page):
+    return True
+
+
 def include(page, revision):
     return True
@@ -1,12 +1,26 @@
 import json
+import os
+
 from pkg_resources import resource_filename
 
 import mwbase
 
+from ..utilities.util import qid_to_int, read_qid_set
+
+# Either the bundled SPARQL snapshot or an index built from a dump with
+# `mwtext build_internal_item_index`.
+filepath = os.environ.get('MWTEXT_INTERNAL_ITEMS') or \
+    resource_filename('mwtext', 'assets/wikimedia_internal_item_qids.txt')
+wm_internal_items = read_qid_set(filepath)
+
 
-filepath = resource_filename('mwtext', 'assets/wikimedia_internal_item_qids.txt')
-with open(filepath) as f:
-    wm_internal_items = [line.rstrip('\n') for line in f]
+def is_internal_item(qid):
+    return qid_to_int(qid) in wm_internal_items
+
+
+def include_page(page):
+    # Namespace zero
+    return page.namespace == 0
 
 
 def include(page, revision):
@@ -37,7 +51,7 @@ def include(page, revision):
         return False
 
     # Is subclass of Wikimedia internal item
-    if qid in wm_internal_items:
+    if is_internal_item(qid):
         return False
 
     # Is instance-of Wikimedia internal item or its subclasses
@@ -48,7 +62,7 @@ def include(page, revision):
         if claim.datavalue is not None and \
            claim.datavalue.type == 'wikibase-entityid':
             value = claim.datavalue.id
-            if value in wm_internal_items:
+            if is_internal_item(value):
                 return False
 
     return True
@@ -9,7 +9,32 @@ router = mwcli.Router(
      'learn_vectors':   "Learn a set of word vectors from preprocessed " +
                         "plaintext",
      'word2vec2gensim': "Converts word2vec format to gensim KeyedVector " +
-                        "binaries"}
+                        "binaries",
+     'build_internal_item_index': "Builds the set of Wikimedia internal " +
+                                  "items from a Wikidata dump",
+     'cache_siteinfo': "Pre-populates the local siteinfo cache",
+     'build_label_index': "Builds a compact, memory-mappable label index " +
+                          "for words2plaintext",
+     'dump2plaintext': "Streams an XML dump through a transformer into " +
+                       "fastText formatted plaintext",
+     'shuffle_split': "Shuffles a line corpus on disk and holds out " +
+                      "validation and test splits",
+     'dedup_minhash': "Removes near-duplicate documents using MinHash " +
+                      "signatures",
+     'count_vocab': "Counts token frequencies in revdocs or plaintext",
+     'sweep_vectors': "Searches fastText hyperparameters for " +
+                      "learn_vectors in parallel",
+     'compress_vectors': "Compresses word vectors with product " +
+                         "quantization",
+     'revdocs2docvecs': "Pools word vectors into document vectors for " +
+                        "revdocs",
+     'build_index': "Builds an exact or IVF nearest-neighbor index of " +
+                    "vectors",
+     'query_index': "Queries or evaluates a nearest-neighbor index",
+     'convert_revdocs': "Converts revdocs between JSON lines and the " +
+                        "binary revdocs format",
+     'lookup_revdocs': "Fetches revdocs by page or revision from " +
+                       "indexed transform_content output"}
 )
 
 main = router.main
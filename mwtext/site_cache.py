@@ -0,0 +1,132 @@
+"""
+A small on-disk cache for documents fetched from a MediaWiki API (siteinfo,
+Wikibase sorted properties, etc.).  Entries are addressed by a hash of the
+wiki host and document name, so any number of worker processes (or
+concurrent runs) can share one cache directory.  Writes are atomic.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import mwapi
+
+from .utilities.util import get_siteinfo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join("~", ".cache")), "mwtext")
+DEFAULT_TTL = 7 * 24 * 60 * 60  # One week
+USER_AGENT = "mwtext site_cache"
+
+
+class CacheMiss(RuntimeError):
+    pass
+
+
+class SiteCache:
+    """
+    Args:
+        cache_dir (str): the directory to keep cached documents in
+        ttl (int): seconds before a cached document is re-fetched.  None
+            means cached documents never expire.
+        offline (bool): if True, never make a network request.  Expired
+            documents are still returned and a missing document raises
+            `CacheMiss`.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL,
+                 offline=False):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.ttl = ttl
+        self.offline = offline
+
+    def get(self, host, name, fetch, refresh=False):
+        """
+        Returns the cached document `name` for `host`, calling `fetch()` to
+        (re)populate the cache when it is missing, expired or `refresh` is
+        set.
+        """
+        host = normalize_host(host)
+        path = self.path(host, name)
+        if os.path.exists(path) and not refresh:
+            if self.offline or not self.expired(path):
+                logger.debug("Reading {0} for {1} from {2}"
+                             .format(name, host, path))
+                with open(path) as f:
+                    return json.load(f)['doc']
+
+        if self.offline:
+            raise CacheMiss("No cached {0} for {1} in {2} and running offline"
+                            .format(name, host, self.cache_dir))
+
+        logger.info("Fetching {0} from {1}".format(name, host))
+        doc = fetch(host)
+        self.put(host, name, doc)
+        return doc
+
+    def peek(self, host, name):
+        """
+        Returns the cached document `name` for `host` (expired or not) or
+        None if it isn't cached.  Never fetches.
+        """
+        path = self.path(host, name)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)['doc']
+        else:
+            return None
+
+    def put(self, host, name, doc):
+        host = normalize_host(host)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({'host': host, 'name': name, 'doc': doc}, f)
+        os.replace(tmp_path, self.path(host, name))
+
+    def path(self, host, name):
+        key = normalize_host(host) + "\t" + name
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json")
+
+    def expired(self, path):
+        if self.ttl is None:
+            return False
+        return time.time() - os.path.getmtime(path) > self.ttl
+
+    def get_siteinfo(self, host, refresh=False):
+        return self.get(host, "siteinfo", fetch_siteinfo, refresh=refresh)
+
+    def get_sorted_properties(self, host, refresh=False):
+        return self.get(host, "sorted_properties", fetch_sorted_properties,
+                        refresh=refresh)
+
+
+def normalize_host(host):
+    """
+    Normalizes "//en.wikipedia.org", "https://en.wikipedia.org/", etc. to
+    "https://en.wikipedia.org".
+    """
+    host = host.strip().rstrip("/")
+    if host.startswith("//"):
+        host = "https:" + host
+    elif "://" not in host:
+        host = "https://" + host
+    return host.lower()
+
+
+def fetch_siteinfo(host):
+    session = mwapi.Session(host, user_agent=USER_AGENT)
+    return get_siteinfo(session)
+
+
+def fetch_sorted_properties(host):
+    session = mwapi.Session(host, user_agent=USER_AGENT)
+    doc = session.get(
+        action="parse",
+        page="MediaWiki:Wikibase-SortedProperties",
+        prop="wikitext")
+    return doc['parse']['wikitext']['*']
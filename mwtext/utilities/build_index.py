@@ -0,0 +1,86 @@
+r"""
+``$ mwtext build_index -h``
+::
+
+    Builds a nearest-neighbor index (see `mwtext.utilities.vector_index`)
+    over word vectors or document vectors for `query_index`.
+
+    Usage:
+        build_index (-h|--help)
+        build_index <vectors> <index-dir>
+                    [--binary] [--metric=<name>] [--ivf] [--nlist=<num>]
+                    [--iterations=<num>] [--sample=<num>] [--seed=<num>]
+                    [--verbose] [--debug]
+
+    Options:
+        -h --help           Print this documentation
+        <vectors>           The path to a gensim KeyedVectors file (".kv"), a
+                            word2vec formatted file or a document vector
+                            matrix (".npy") from `revdocs2docvecs`.  Document
+                            vectors are keyed by the page names in the
+                            matching ".pages" file.
+        <index-dir>         The directory to write the index to
+        --binary            Read the binary word2vec format
+        --metric=<name>     "cosine" or "dot" [default: cosine]
+        --ivf               Build an inverted file index rather than an
+                            exact one
+        --nlist=<num>       The number of IVF lists [default: 1024]
+        --iterations=<num>  The number of k-means iterations [default: 20]
+        --sample=<num>      The number of vectors to learn IVF centroids
+                            from [default: 100000]
+        --seed=<num>        Seeds sampling and k-means [default: 0]
+        --verbose           Print progress information to stderr.
+        --debug             Print debug logs.
+"""
+import logging
+
+import docopt
+import numpy as np
+
+from .vector_index import METRICS, ExactIndex, IVFIndex
+from .word2vec2gensim import get_vectors, load_keyed_vectors
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    metric = args['--metric']
+    if metric not in METRICS:
+        raise RuntimeError("Unknown metric {0}".format(metric))
+
+    keys, vectors = read_keyed_matrix(args['<vectors>'],
+                                      binary=args['--binary'])
+    logger.info("Read {0} vectors of {1} dimensions".format(*vectors.shape))
+
+    if args['--ivf']:
+        index = IVFIndex.build(
+            vectors, keys, metric=metric, nlist=int(args['--nlist']),
+            iterations=int(args['--iterations']),
+            sample=int(args['--sample']), seed=int(args['--seed']))
+    else:
+        index = ExactIndex.build(vectors, keys, metric=metric)
+    index.save(args['<index-dir>'])
+    logger.info("Wrote {0} index of {1} vectors to {2}".format(
+        index.KIND, len(index), args['<index-dir>']))
+
+
+def read_keyed_matrix(path, binary=False):
+    """
+    Reads keys and vectors from a document vector matrix (keyed by the page
+    names in its ".pages" file) or from word vectors.
+    """
+    if path.endswith(".npy"):
+        vectors = np.load(path, mmap_mode='r')
+        with open(path[:-len(".npy")] + ".pages") as f:
+            keys = [line.rstrip("\n").split("\t", 1)[1] for line in f]
+        return keys, vectors
+    else:
+        kv = load_keyed_vectors(path, binary=binary)
+        return kv.index_to_key, get_vectors(kv, kv.index_to_key)
@@ -0,0 +1,169 @@
+r"""
+``$ mwtext build_internal_item_index -h``
+::
+
+    Builds the set of Wikimedia internal items (all P279* subclasses of
+    Q17442446) from a Wikidata XML dump.  The output can be used in place of
+    the bundled `wikimedia_internal_item_qids.txt` snapshot by pointing the
+    MWTEXT_INTERNAL_ITEMS environment variable at it.
+
+    Usage:
+        build_internal_item_index (-h|--help)
+        build_internal_item_index [<input-file>...]
+                                  [--root=<qid>]...
+                                  [--format=<type>]
+                                  [--threads=<num>] [--output=<path>]
+                                  [--verbose] [--debug]
+
+    Options:
+        -h --help           Print this documentation
+        <input-file>        The path to a Wikidata XML Dump file
+                            [default: <stdin>]
+        --root=<qid>        The root item(s) of the subclass tree
+                            [default: Q17442446]
+        --format=<type>     "binary" writes a compact sorted id set.  "text"
+                            writes one QID per line. [default: binary]
+        --threads=<num>     If a collection of files are provided, how many
+                            processor threads?  [default: <cpu_count>]
+        --output=<path>     Write the index to this path [default: <stdout>]
+        --verbose           Print progress information to stderr.
+        --debug             Print debug logs.
+"""
+import io
+import json
+import logging
+import sys
+from collections import defaultdict
+from multiprocessing import cpu_count
+
+import docopt
+import mwcli
+import mwcli.files
+import para
+
+from . import dump_reader
+from .scheduler import largest_first
+from .util import qid_to_int, write_qid_set
+
+logger = logging.getLogger(__name__)
+
+SUBCLASS_OF = 'P279'
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if len(args['<input-file>']) == 0:
+        paths = [io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')]
+    else:
+        paths = [mwcli.files.normalize_path(p) for p in args['<input-file>']]
+
+    roots = [qid_to_int(qid) for qid in args['--root']]
+    if args['--threads'] == "<cpu_count>":
+        threads = cpu_count()
+    else:
+        threads = int(args['--threads'])
+    verbose = bool(args['--verbose'])
+
+    subclasses = read_subclasses(paths, threads, verbose)
+    internal_items = subclass_closure(subclasses, roots)
+    logger.info("Found {0} internal items".format(len(internal_items)))
+
+    if args['--output'] == "<stdout>":
+        output = sys.stdout.buffer
+    else:
+        output = open(args['--output'], "wb")
+
+    if args['--format'] == "text":
+        for id in sorted(internal_items):
+            output.write("Q{0}\n".format(id).encode('utf-8'))
+    else:
+        write_qid_set(internal_items, output)
+    output.close()
+
+
+def read_subclasses(paths, threads, verbose=False):
+    """
+    Streams a set of dump files in parallel and gathers a map from each item
+    to the (numeric) ids of its direct subclasses.
+    """
+    def process_path(path):
+        dump = dump_reader.read_xml(mwcli.files.reader(path))
+        yield from extract_subclass_edges(dump, verbose=verbose)
+
+    subclasses = defaultdict(list)
+    for child, parent in para.map(process_path, largest_first(paths),
+                                  mappers=threads):
+        subclasses[parent].append(child)
+
+    return subclasses
+
+
+def extract_subclass_edges(dump, verbose=False):
+    """
+    Yields (child, parent) numeric id pairs for every truthy P279 statement
+    on the latest revision of each item in the dump that is a
+    'wikibase-item' with text.  Later revisions without text (e.g.
+    suppressed ones) or of another model are skipped.
+    """
+    for page in dump:
+        if page.namespace != 0:
+            continue
+
+        revision = page.latest_revision(model='wikibase-item')
+        if revision is None:
+            continue
+
+        item_doc = json.loads(revision.text)
+        child = qid_to_int(item_doc.get('id'))
+        if child is None:
+            continue
+
+        for parent in truthy_item_values(item_doc, SUBCLASS_OF):
+            yield child, parent
+
+        if verbose:
+            sys.stderr.write(".")
+            sys.stderr.flush()
+
+
+def truthy_item_values(item_doc, property):
+    """
+    Mimics the "wdt:" truthy statements in the query service.  Preferred
+    statements win if there are any.  Deprecated statements never count.
+    """
+    statements = item_doc.get('claims', {}).get(property, [])
+    preferred = [s for s in statements if s.get('rank') == 'preferred']
+    if len(preferred) > 0:
+        statements = preferred
+
+    for statement in statements:
+        if statement.get('rank') == 'deprecated':
+            continue
+        datavalue = statement.get('mainsnak', {}).get('datavalue')
+        if datavalue is None or datavalue.get('type') != 'wikibase-entityid':
+            continue
+        numeric_id = datavalue['value'].get('numeric-id')
+        if numeric_id is not None:
+            yield int(numeric_id)
+
+
+def subclass_closure(subclasses, roots):
+    """
+    Returns the set of roots and everything reachable through `subclasses`.
+    """
+    seen = set(roots)
+    to_visit = list(roots)
+    while len(to_visit) > 0:
+        id = to_visit.pop()
+        for child in subclasses.get(id, []):
+            if child not in seen:
+                seen.add(child)
+                to_visit.append(child)
+
+    return seen
@@ -0,0 +1,50 @@
+r"""
+``$ mwtext build_label_index -h``
+::
+
+    Builds a compact label index from a labels file.  The index directory can
+    be passed to `words2plaintext --labels` in place of the labels file and
+    is memory-mapped rather than read into Python dicts and sets.
+
+    Usage:
+        build_label_index (-h|--help)
+        build_label_index <labels-file> <index-dir> --title-lang=<lang>
+                          [--label-field=<k>]
+                          [--verbose] [--debug]
+
+    Options:
+        -h --help            Print this documentation
+        <labels-file>        The path to a file containing label data
+        <index-dir>          The directory to write the index to
+        --title-lang=<lang>  The lang code to use to identify the title from
+                             sitelinks in the labeled dataset.
+        --label-field=<k>    The field to examine within the labels file
+                             [default: taxo_labels]
+        --verbose            Print progress information to stderr.
+        --debug              Print debug logs.
+"""
+import logging
+
+import docopt
+import mwcli.files
+
+from .label_index import LabelIndex
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    logger.info("Reading label file {0}...".format(args['<labels-file>']))
+    label_index = LabelIndex.from_labels_file(
+        mwcli.files.reader(args['<labels-file>']),
+        args['--title-lang'], args['--label-field'])
+    label_index.save(args['<index-dir>'])
+    logger.info("Wrote {0} pages and {1} labels to {2}".format(
+        len(label_index), len(label_index.label2ids), args['<index-dir>']))
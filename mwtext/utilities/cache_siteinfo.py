@@ -0,0 +1,67 @@
+r"""
+``$ mwtext cache_siteinfo -h``
+::
+
+    Fetches siteinfo (and optionally Wikibase sorted properties) for a set of
+    wikis into the local cache used by `transform_content`.  Run this once on
+    a machine with network access and later runs can work with '--offline'.
+
+    Usage:
+        cache_siteinfo (-h|--help)
+        cache_siteinfo <wiki-host>...
+                       [--sorted-properties]
+                       [--cache-dir=<path>] [--refresh]
+                       [--verbose] [--debug]
+
+    Options:
+        -h --help            Print this documentation
+        <wiki-host>          The hostname of a MediaWiki install to query.
+        --sorted-properties  Also cache MediaWiki:Wikibase-SortedProperties
+                             (used by Wikidata2Words)
+        --cache-dir=<path>   The cache directory to populate
+                             ("$XDG_CACHE_HOME/mwtext" or
+                             "~/.cache/mwtext") [default: <default>]
+        --refresh            Re-fetch documents even if they are fresh
+        --verbose            Print progress information to stderr.
+        --debug              Print debug logs.
+"""
+import logging
+import sys
+
+import docopt
+
+from ..site_cache import DEFAULT_CACHE_DIR, SiteCache
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if args['--cache-dir'] == "<default>":
+        cache = SiteCache(DEFAULT_CACHE_DIR)
+    else:
+        cache = SiteCache(args['--cache-dir'])
+    cache_siteinfo(cache, args['<wiki-host>'],
+                   sorted_properties=bool(args['--sorted-properties']),
+                   refresh=bool(args['--refresh']),
+                   verbose=bool(args['--verbose']))
+
+
+def cache_siteinfo(cache, wiki_hosts, sorted_properties=False, refresh=False,
+                   verbose=False):
+    for wiki_host in wiki_hosts:
+        siteinfo = cache.get_siteinfo(wiki_host, refresh=refresh)
+        if sorted_properties:
+            cache.get_sorted_properties(wiki_host, refresh=refresh)
+        if verbose:
+            sys.stderr.write("{0}: {1}\n".format(
+                wiki_host, cache.path(wiki_host, "siteinfo")))
+            sys.stderr.flush()
+        logger.debug("Cached siteinfo for {0}"
+                     .format(siteinfo['general'].get('sitename')))
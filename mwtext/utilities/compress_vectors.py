@@ -0,0 +1,90 @@
+r"""
+``$ mwtext compress_vectors -h``
+::
+
+    Compresses word vectors with product quantization (see
+    `mwtext.utilities.product_quantizer`).  Writes the codebooks, codes and
+    vocabulary to '<output-dir>' and prints a JSON report of the
+    reconstruction error against the original vectors.
+
+    Usage:
+        compress_vectors (-h|--help)
+        compress_vectors <input> <output-dir>
+                         [--binary] [--subvectors=<num>] [--clusters=<num>]
+                         [--iterations=<num>] [--sample=<num>] [--seed=<num>]
+                         [--verbose] [--debug]
+
+    Options:
+        -h --help            Print this documentation
+        <input>              The path to a gensim KeyedVectors file (".kv")
+                             or a word2vec formatted file (can be bz2 or gz
+                             compressed)
+        <output-dir>         The directory to write the compressed vectors to
+        --binary             Read the binary word2vec format
+        --subvectors=<num>   The number of subvectors to split each vector
+                             into.  Must divide the dimensions. [default: 10]
+        --clusters=<num>     The number of centroids per subspace.  Codes
+                             are one byte with 256 or fewer. [default: 256]
+        --iterations=<num>   The number of k-means iterations [default: 20]
+        --sample=<num>       The number of vectors to learn codebooks from
+                             [default: 100000]
+        --seed=<num>         Seeds sampling and k-means [default: 0]
+        --verbose            Print progress information to stderr.
+        --debug              Print debug logs.
+"""
+import json
+import logging
+import sys
+
+import docopt
+
+from .product_quantizer import (CompressedVectors, ProductQuantizer,
+                                reconstruction_error)
+from .word2vec2gensim import get_vectors, load_keyed_vectors
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    words, vectors = read_vectors(args['<input>'], binary=args['--binary'])
+    logger.info("Read {0} vectors of {1} dimensions"
+                .format(*vectors.shape))
+
+    report = compress_vectors(
+        words, vectors, args['<output-dir>'],
+        subvectors=int(args['--subvectors']),
+        clusters=int(args['--clusters']),
+        iterations=int(args['--iterations']),
+        sample=int(args['--sample']), seed=int(args['--seed']))
+    json.dump(report, sys.stdout)
+    sys.stdout.write("\n")
+
+
+def read_vectors(path, binary=False):
+    """
+    Reads words and a float32 matrix of vectors from a KeyedVectors file
+    (memory-mapped) or a word2vec file.
+    """
+    kv = load_keyed_vectors(path, binary=binary)
+    return kv.index_to_key, get_vectors(kv, kv.index_to_key)
+
+
+def compress_vectors(words, vectors, output_dir, subvectors=10,
+                     clusters=256, iterations=20, sample=100000, seed=0):
+    quantizer = ProductQuantizer.fit(
+        vectors, subvectors, clusters=clusters, iterations=iterations,
+        sample=sample, seed=seed)
+    codes = quantizer.encode(vectors)
+    CompressedVectors(words, codes, quantizer).save(output_dir)
+
+    report = reconstruction_error(quantizer, vectors, codes)
+    report['bytes'] = int(codes.nbytes + quantizer.codebooks.nbytes)
+    report['original_bytes'] = int(vectors.nbytes)
+    return report
@@ -0,0 +1,97 @@
+r"""
+``$ mwtext convert_revdocs -h``
+::
+
+    Converts revdocs between JSON lines and the compact binary format (see
+    `mwtext.utilities.revdoc_format`).  Binary input is recognized by its
+    magic bytes, so either format can be read from <stdin>.
+
+    Usage:
+        convert_revdocs (-h|--help)
+        convert_revdocs [<input-file>...] [--to=<format>] [--output=<path>]
+                        [--verbose] [--debug]
+
+    Options:
+        -h --help          Print this documentation
+        <input-file>       The path to a file of revdocs in either format
+                           [default: <stdin>]
+        --to=<format>      "binary" or "json" [default: binary]
+        --output=<path>    A path to write output to.  Binary output to a
+                           path ending in ".bz2" or ".gz" is compressed.
+                           [default: <stdout>]
+        --verbose          Print progress information to stderr.
+        --debug            Print debug logs.
+"""
+import json
+import logging
+import sys
+
+import docopt
+
+from .revdoc_format import RevdocWriter, open_binary, open_revdocs
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if len(args['<input-file>']) == 0:
+        input_files = [open_revdocs(sys.stdin.buffer)]
+    else:
+        input_files = [open_binary(p) for p in args['<input-file>']]
+        input_files = [open_revdocs(f) for f in input_files]
+
+    to = args['--to']
+    if to == "binary":
+        if args['--output'] == "<stdout>":
+            output = sys.stdout.buffer
+        else:
+            output = open_binary(args['--output'], "wb")
+    elif to == "json":
+        if args['--output'] == "<stdout>":
+            output = sys.stdout
+        else:
+            output = open(args['--output'], "w")
+    else:
+        raise RuntimeError("Unknown format {0}".format(to))
+
+    n = convert_revdocs(input_files, output, to=to,
+                        verbose=bool(args['--verbose']))
+    logger.info("Converted {0} revdocs".format(n))
+
+    if args['--output'] == "<stdout>":
+        output.flush()
+    else:
+        output.close()
+
+
+def convert_revdocs(input_files, output, to="binary", verbose=False):
+    """
+    Writes the revdocs of `input_files` (as opened by
+    :func:`~mwtext.utilities.revdoc_format.open_revdocs`) to `output` in the
+    `to` format.  Returns the number of revdocs converted.
+    """
+    writer = RevdocWriter(output) if to == "binary" else None
+    n = 0
+    for input_file in input_files:
+        for line in input_file:
+            rev_doc = json.loads(line) if isinstance(line, str) else line
+            if writer is not None:
+                writer.write(rev_doc)
+            else:
+                output.write(json.dumps(rev_doc))
+                output.write("\n")
+            n += 1
+            if verbose and n % 10000 == 0:
+                sys.stderr.write(".")
+                sys.stderr.flush()
+
+    if verbose:
+        sys.stderr.write("\n")
+    return n
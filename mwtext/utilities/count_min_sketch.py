@@ -0,0 +1,115 @@
+"""
+Approximate token counting in bounded memory.
+
+A :class:`CountMinSketch` keeps `depth` rows of `width` counters.  Each token
+increments one counter per row and its count is estimated as the minimum of
+those counters, which never under-counts.  :class:`HeavyHitters` pairs a
+sketch with a bounded set of candidate tokens so that the most frequent
+tokens can be listed.  Both merge by addition, so workers can count
+separately and be combined at the end.
+"""
+import hashlib
+
+import numpy as np
+
+BATCH_SIZE = 100000
+
+
+def token_hashes(tokens):
+    """
+    Returns two independent 32-bit hashes for each token as uint64 arrays.
+    Both are halves of one 64-bit blake2b digest of the token.
+    """
+    digests = b"".join(
+        hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+        for token in tokens)
+    hashes = np.frombuffer(digests, dtype="<u4").reshape(-1, 2) \
+        .astype(np.uint64)
+    return hashes[:, 0], hashes[:, 1]
+
+
+class CountMinSketch:
+    """
+    Args:
+        width (int): the number of counters per row
+        depth (int): the number of rows
+    """
+    def __init__(self, width=2 ** 22, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, tokens):
+        # Double hashing: row i uses first + i * second
+        first, second = token_hashes(tokens)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((first + rows * (second | np.uint64(1))) %
+                np.uint64(self.width)).astype(np.int64)
+
+    def add(self, tokens):
+        columns = self._columns(tokens)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], 1)
+
+    def estimate(self, tokens):
+        columns = self._columns(tokens)
+        rows = np.arange(self.depth)[:, None]
+        return self.table[rows, columns].min(axis=0)
+
+    def merge(self, other):
+        if self.table.shape != other.table.shape:
+            raise ValueError("Can't merge sketches of different sizes")
+        self.table += other.table
+
+
+class HeavyHitters:
+    """
+    Tracks the `capacity` tokens with the largest estimated counts.
+
+    Args:
+        capacity (int): the number of candidate tokens to keep
+        width (int): the width of the sketch
+        depth (int): the depth of the sketch
+    """
+    def __init__(self, capacity=1000000, width=2 ** 22, depth=4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width=width, depth=depth)
+        self.candidates = set()
+        self.batch = []
+
+    def update(self, tokens):
+        self.batch.extend(tokens)
+        if len(self.batch) >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if len(self.batch) == 0:
+            return
+        self.sketch.add(self.batch)
+        self.candidates.update(self.batch)
+        self.batch = []
+        if len(self.candidates) > self.capacity * 2:
+            self._prune()
+
+    def _prune(self):
+        candidates = list(self.candidates)
+        counts = self.sketch.estimate(candidates)
+        top = np.argsort(-counts, kind='stable')[:self.capacity]
+        self.candidates = {candidates[i] for i in top}
+
+    def merge(self, other):
+        self._flush()
+        other._flush()
+        self.sketch.merge(other.sketch)
+        self.candidates.update(other.candidates)
+        self._prune()
+
+    def most_common(self, n=None):
+        """
+        Returns (token, estimated count) pairs, most frequent first.
+        """
+        self._flush()
+        candidates = sorted(self.candidates)
+        counts = self.sketch.estimate(candidates)
+        order = np.argsort(-counts, kind='stable')[:n]
+        return [(candidates[i], int(counts[i])) for i in order]
@@ -0,0 +1,167 @@
+r"""
+``$ mwtext count_vocab -h``
+::
+
+    Counts token frequencies in revdocs or fastText plaintext and writes a
+    frequency table (<token>\t<count>, most frequent first).  Use it to pick
+    `learn_vectors --qt-cutoff` and `word2vec2gensim --limit` or to drop
+    rare tokens with `words2plaintext --vocab`.
+
+    Files are counted in parallel with one counter per worker.  With
+    '--sketch' each worker counts into a count-min sketch and only tracks
+    the '--top' most frequent tokens, so memory is bounded even when the
+    exact vocabulary won't fit.  Sketched counts may over-count.
+
+    Usage:
+        count_vocab (-h|--help)
+        count_vocab [<input-file>...]
+                    [--format=<type>] [--min-count=<num>]
+                    [--sketch] [--top=<num>] [--width=<num>] [--depth=<num>]
+                    [--threads=<num>] [--output=<path>]
+                    [--verbose] [--debug]
+
+    Options:
+        -h --help          Print this documentation
+        <input-file>       The path to a file of revdocs or plaintext
+                           (optionally compressed).  Binary ".revdocs"
+                           files and 'manifest.json's written by
+                           `transform_content` are read too.
+                           [default: <stdin>]
+        --format=<type>    "revdocs" for revdocs with "words" or structured
+                           'transformed_content'.  "plaintext" for
+                           `words2plaintext` output (labels are ignored).
+                           [default: revdocs]
+        --min-count=<num>  Only write tokens seen at least this many times
+                           [default: 1]
+        --sketch           Count approximately with a count-min sketch
+        --top=<num>        The number of most frequent tokens to track and
+                           write with '--sketch' [default: 1000000]
+        --width=<num>      The number of counters per sketch row
+                           [default: 4194304]
+        --depth=<num>      The number of sketch rows [default: 4]
+        --threads=<num>    If a collection of files are provided, how many
+                           processor threads? [default: <cpu_count>]
+        --output=<path>    Write the frequency table to this path
+                           [default: <stdout>]
+        --verbose          Print progress information to stderr.
+        --debug            Print debug logs.
+"""
+import logging
+import sys
+from collections import Counter
+from multiprocessing import cpu_count
+
+import docopt
+import para
+
+from .count_min_sketch import HeavyHitters
+from .revdoc_format import open_revdocs
+from .scheduler import largest_first
+from .shards import expand_manifests
+from .util import read_plaintext, read_revdoc
+
+logger = logging.getLogger(__name__)
+
+FIELDS = {'page', 'transformed_content'}
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if len(args['<input-file>']) == 0:
+        paths = [sys.stdin.buffer]
+    else:
+        paths = expand_manifests(args['<input-file>'])
+
+    if args['--format'] == "revdocs":
+        read_doc = read_revdoc
+    elif args['--format'] == "plaintext":
+        read_doc = read_plaintext
+    else:
+        raise RuntimeError("Unknown format {0}".format(args['--format']))
+
+    if args['--sketch']:
+        top = int(args['--top'])
+        width = int(args['--width'])
+        depth = int(args['--depth'])
+
+        def new_counter():
+            return HeavyHitters(capacity=top, width=width, depth=depth)
+    else:
+        top = None
+        new_counter = Counter
+
+    if args['--threads'] == "<cpu_count>":
+        threads = cpu_count()
+    else:
+        threads = int(args['--threads'])
+
+    if args['--output'] == "<stdout>":
+        output = sys.stdout
+    else:
+        output = open(args['--output'], "w")
+
+    counts = count_vocab(paths, read_doc, new_counter, threads,
+                         verbose=bool(args['--verbose']))
+    token_counts = sorted(counts.most_common(top),
+                          key=lambda token_count: (-token_count[1],
+                                                   token_count[0]))
+    write_vocab(token_counts, output, min_count=int(args['--min-count']))
+
+
+def count_vocab(paths, read_doc, new_counter=Counter, threads=1,
+                verbose=False):
+    """
+    Counts the tokens of each path in a separate worker and merges the
+    per-worker counters.  `new_counter()` constructs either a
+    :class:`collections.Counter` or a
+    :class:`~mwtext.utilities.count_min_sketch.HeavyHitters`.
+    """
+    def process_path(path):
+        counter = new_counter()
+        with open_revdocs(path, fields=FIELDS) as f:
+            for i, line in enumerate(f):
+                _, tokens = read_doc(line)
+                counter.update(tokens)
+                if verbose and i % 10000 == 0:
+                    sys.stderr.write(".")
+                    sys.stderr.flush()
+        yield counter
+
+    counts = None
+    for counter in para.map(process_path, largest_first(paths),
+                            mappers=threads):
+        if counts is None:
+            counts = counter
+        elif isinstance(counts, Counter):
+            counts.update(counter)
+        else:
+            counts.merge(counter)
+
+    return counts if counts is not None else new_counter()
+
+
+def write_vocab(token_counts, f, min_count=1):
+    for token, count in token_counts:
+        if count < min_count:
+            break
+        f.write("{0}\t{1}\n".format(token, count))
+
+
+def read_vocab(f, min_count=1):
+    """
+    Reads the set of tokens with at least `min_count` occurrences from a
+    frequency table written by `count_vocab`.
+    """
+    vocab = set()
+    for line in f:
+        token, count = line.rstrip("\n").split("\t")
+        if int(count) < min_count:
+            break
+        vocab.add(token)
+    return vocab
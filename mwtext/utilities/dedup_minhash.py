@@ -0,0 +1,136 @@
+r"""
+``$ mwtext dedup_minhash -h``
+::
+
+    Removes near-duplicate documents (e.g. bot-generated stubs) from revdocs
+    or fastText plaintext.  Documents are compared by MinHash signatures of
+    their token shingles and LSH banding.  The input is read twice: once to
+    find duplicates and once to write the documents that are kept.
+
+    Usage:
+        dedup_minhash (-h|--help)
+        dedup_minhash <input-file>...
+                      [--format=<type>]
+                      [--threshold=<sim>] [--max-copies=<num>]
+                      [--num-perm=<num>] [--bands=<num>]
+                      [--shingle-size=<num>] [--seed=<num>]
+                      [--tmp-dir=<path>] [--report=<path>]
+                      [--output=<path>] [--verbose] [--debug]
+
+    Options:
+        -h --help            Print this documentation
+        <input-file>         The path to a file of revdocs or plaintext
+                             (optionally compressed).  Binary ".revdocs"
+                             files and 'manifest.json's written by
+                             `transform_content` are read too.
+        --format=<type>      "revdocs" for revdocs with a Wikitext2Words or
+                             Wikitext2Structured 'transformed_content'.
+                             "plaintext" for `words2plaintext` output
+                             (labels are ignored). [default: revdocs]
+        --threshold=<sim>    The estimated Jaccard similarity at which a
+                             document is a near-duplicate [default: 0.8]
+        --max-copies=<num>   How many documents of a cluster of near-
+                             duplicates to keep [default: 1]
+        --num-perm=<num>     The number of hashes per signature
+                             [default: 128]
+        --bands=<num>        The number of LSH bands [default: 16]
+        --shingle-size=<num>  The number of tokens per shingle [default: 5]
+        --seed=<num>         Seeds the hash functions [default: 0]
+        --tmp-dir=<path>     The directory to spill signatures to
+                             [default: <tmp>]
+        --report=<path>      Write a TSV of removed documents (line,
+                             duplicate_of, similarity, name) to this path
+        --output=<path>      Write kept documents to this path
+                             [default: <stdout>]
+        --verbose            Print progress information to stderr.
+        --debug              Print debug logs.
+"""
+import json
+import logging
+import sys
+
+import docopt
+
+from .minhash import DuplicateFinder, MinHasher
+from .revdoc_format import open_revdocs
+from .shards import expand_manifests
+from .util import read_plaintext, read_revdoc
+
+logger = logging.getLogger(__name__)
+
+REPORT_HEADERS = ("line", "duplicate_of", "similarity", "name")
+FIELDS = {'page', 'transformed_content'}
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if args['--format'] == "revdocs":
+        read_doc = read_revdoc
+    elif args['--format'] == "plaintext":
+        read_doc = read_plaintext
+    else:
+        raise RuntimeError("Unknown format {0}".format(args['--format']))
+
+    minhasher = MinHasher(num_perm=int(args['--num-perm']),
+                          shingle_size=int(args['--shingle-size']),
+                          seed=int(args['--seed']))
+    tmp_dir = args['--tmp-dir'] if args['--tmp-dir'] != "<tmp>" else None
+    finder = DuplicateFinder(minhasher, bands=int(args['--bands']),
+                             threshold=float(args['--threshold']),
+                             max_copies=int(args['--max-copies']),
+                             tmp_dir=tmp_dir)
+
+    if args['--output'] == "<stdout>":
+        output = sys.stdout
+    else:
+        output = open(args['--output'], "w")
+
+    if args['--report'] is not None:
+        report = open(args['--report'], "w")
+    else:
+        report = None
+
+    try:
+        dedup_minhash(expand_manifests(args['<input-file>']), read_doc,
+                      finder, output,
+                      report=report, verbose=bool(args['--verbose']))
+    finally:
+        finder.close()
+
+
+def dedup_minhash(paths, read_doc, finder, output, report=None,
+                  verbose=False):
+    for path in paths:
+        with open_revdocs(path, fields=FIELDS) as f:
+            for line in f:
+                _, tokens = read_doc(line)
+                finder.add(tokens)
+                if verbose and len(finder) % 10000 == 0:
+                    sys.stderr.write(".")
+                    sys.stderr.flush()
+
+    keep, duplicate_of, similarity = finder.find()
+    logger.info("Removing {0} of {1} documents as near-duplicates"
+                .format(len(keep) - int(keep.sum()), len(keep)))
+
+    if report is not None:
+        report.write("\t".join(REPORT_HEADERS) + "\n")
+
+    i = 0
+    for path in paths:
+        with open_revdocs(path) as f:
+            for line in f:
+                if keep[i]:
+                    output.write(line if isinstance(line, str)
+                                 else json.dumps(line) + "\n")
+                elif report is not None:
+                    name, _ = read_doc(line)
+                    report.write("{0}\t{1}\t{2:.3f}\t{3}\n".format(
+                        i, duplicate_of[i], similarity[i], name))
+                i += 1
@@ -0,0 +1,120 @@
+r"""
+``$ mwtext dump2plaintext -h``
+::
+
+    Streams MediaWiki XML dumps through a "words" content transformer and
+    (optionally) a label map straight into fastText formatted lines.  This
+    is equivalent to piping `transform_content` into `words2plaintext`
+    without encoding, compressing and re-reading revdocs in between.
+
+    Note that fastText reads its training file more than once, so output
+    for `learn_vectors` needs to be written to a regular file rather than a
+    pipe.
+
+    Usage:
+        dump2plaintext (-h|--help)
+        dump2plaintext <content-transformer> [<input-file>...]
+                       [--labels=<path>] [--title-lang=<lang>]
+                       [--label-field=<k>]
+                       [--include=<func>]
+                       [--param=<kv>]...
+                       [--include-redirects]
+                       [--namespace=<id>]...
+                       [--content-model=<mdl>]...
+                       [--min-content-length=<chrs>]
+                       [--siteinfo=<path>]
+                       [--wiki-host=<url>]
+                       [--cache-dir=<path>] [--cache-ttl=<secs>]
+                       [--no-cache] [--offline]
+                       [--memoize] [--memo-size=<revs>]
+                       [--memo-store=<path>]
+                       [--incremental]
+                       [--latest-only]
+                       [--sample-rate=<prop>] [--sample-seed=<str>]
+                       [--threads=<num>] [--output=<path>]
+                       [--compress=<type>] [--verbose] [--debug]
+
+    Options:
+        -h --help           Print this documentation
+{transform_options}
+        --labels=<path>     The path to a file containing label data for
+                            associating with text or to a label index
+                            directory written by `build_label_index`.  If
+                            not set, no labels will be included.
+        --title-lang=<lang>  The lang code to use to identify the title from
+                             sitelinks in the labeled dataset.
+        --label-field=<k>   The field to examine within the labels file
+                            [default: taxo_labels]
+        --threads=<num>     If a collection of files are provided, how many
+                            processor threads?  Note that this actually uses
+                            subprocesses and will parallelize over CPU
+                            [default: <cpu_count>]
+        --output=<path>     Write output to a directory with one output file
+                            per input path.  [default: <stdout>]
+        --compress=<type>   If set, output written to the output-dir will be
+                            compressed in this format: "bz2", "gz" or
+                            "json" for none. [default: bz2]
+        --verbose           Print progress information to stderr.  Kind of a
+                            mess when running multi-threaded.
+        --debug             Print debug logs.
+"""
+import logging
+
+import mwcli
+
+from . import dump_reader, transform_content
+from .words2plaintext import format_words_and_labels, read_label_index
+
+__doc__ = __doc__.replace("{transform_options}\n",
+                          transform_content.TRANSFORM_OPTIONS)
+
+logger = logging.getLogger(__name__)
+
+
+def dump2plaintext(dump, transformer, page_name2labels=None, verbose=False,
+                   **kwargs):
+    """
+    Yields a fastText formatted line for each relevant revision in `dump`.
+    If `page_name2labels` is set, revisions of pages without labels are
+    skipped.  `kwargs` are passed on to
+    :func:`~mwtext.utilities.transform_content.transform_content`.
+    """
+    rev_docs = transform_content.transform_content(
+        dump, transformer, verbose=verbose, **kwargs)
+    for rev_doc in rev_docs:
+        page_name = rev_doc['page']['page_name']
+        if page_name2labels is not None:
+            labels = page_name2labels.get(page_name)
+            if labels is None:
+                logger.debug("Skipping {0} because it has no labels."
+                             .format(page_name))
+                continue
+        else:
+            labels = []
+        yield format_words_and_labels(rev_doc['transformed_content'], labels)
+
+
+def process_args(args):
+    # Token deltas only make sense for revdocs
+    kwargs = transform_content.process_args(
+        dict(args, **{'--token-deltas': False}))
+
+    if args['--labels'] is not None:
+        kwargs['page_name2labels'] = read_label_index(
+            args['--labels'], args['--title-lang'], args['--label-field'])
+    else:
+        kwargs['page_name2labels'] = None
+
+    return kwargs
+
+
+streamer = mwcli.Streamer(
+    __doc__,
+    __name__,
+    dump2plaintext,
+    process_args=process_args,
+    file_reader=dump_reader.read_xml,
+    line_writer=mwcli.Streamer.write_line
+)
+
+main = streamer.main
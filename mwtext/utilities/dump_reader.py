@@ -0,0 +1,140 @@
+"""
+An :class:`mwxml.Dump` reader whose pages can jump to their latest revision.
+
+mwxml fully parses each <revision> into a :class:`mwxml.Revision` (user,
+timestamp, slots, ...) as a page is iterated.  When only the current text of
+a page in a full-history dump is needed, :func:`Page.latest_revision` keeps
+only the raw element of the most recent <revision> while streaming past the
+others and only snapshots and parses the last one.  Pages that are never
+iterated don't have any of their revisions parsed.
+"""
+from xml.etree import ElementTree as etree
+
+import mwcli  # noqa: F401 -- mwcli has to be imported before mwxml
+import mwxml
+from mwxml.element_iterator import trim_ns
+from mwxml.errors import MalformedXML
+from mwxml.iteration.revision import Revision
+
+
+class Page(mwxml.Page):
+
+    def initialize(self, *args, revisions=None, **kwargs):
+        super().initialize(*args, revisions=revisions, **kwargs)
+
+        # A lazy generator of unparsed <revision> elements
+        self._revision_elements = revisions
+
+    def __iter__(self):
+        for element in self._revision_elements:
+            yield self._parse_revision(element)
+
+    def __next__(self):
+        return self._parse_revision(next(self._revision_elements))
+
+    def latest_revision(self, model=None):
+        """
+        Consumes the page's revisions and returns only the last one (or None
+        if the page has no revisions).  If `model` is set, returns the last
+        revision of that content model that has text.
+        """
+        latest = None
+        for element in self._revision_elements:
+            raw = detach(element)
+            if model is not None and not has_model_and_text(raw, model):
+                raw.clear()
+                continue
+            if latest is not None:
+                # Only the latest revision's tags and text are kept in memory
+                latest.clear()
+            latest = raw
+
+        if latest is None:
+            return None
+        else:
+            return self._parse_revision(ElementSnapshot.from_etree(latest))
+
+    def _parse_revision(self, element):
+        revision = Revision.from_element(element)
+        revision.page = self
+        return revision
+
+    @classmethod
+    def load_revisions(cls, first_revision, element):
+        if first_revision is not None:
+            yield first_revision
+
+        for sub_element in element:
+            tag = sub_element.tag
+
+            if tag == "revision":
+                yield sub_element
+            else:
+                raise MalformedXML("Expected to see <revision>.  " +
+                                   "Instead saw <{0}>".format(tag))
+
+
+class Dump(mwxml.Dump):
+
+    @classmethod
+    def process_item(cls, item_element, namespace_map):
+        if item_element.tag == "page":
+            return Page.from_element(item_element, namespace_map)
+        else:
+            return super().process_item(item_element, namespace_map)
+
+
+class ElementSnapshot:
+    """
+    A detached copy of the tag, attributes, text and children of a streamed
+    element.  Implements as much of the `ElementIterator` interface as
+    `from_element()` parsers need.
+    """
+    __slots__ = ('tag', 'attrib', 'text', 'children')
+
+    def __init__(self, tag, attrib, text, children):
+        self.tag = tag
+        self.attrib = attrib
+        self.text = text
+        self.children = children
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def attr(self, key, alt=None):
+        return self.attrib.get(key, alt)
+
+    @classmethod
+    def from_etree(cls, element):
+        children = [cls.from_etree(sub_element) for sub_element in element]
+        return cls(trim_ns(element.tag), dict(element.attrib), element.text,
+                   children)
+
+
+def detach(element):
+    """
+    Reads the rest of a streamed element without clearing its children and
+    returns its underlying :class:`xml.etree.ElementTree.Element`.  The
+    `ElementIterator` is left holding an empty element, so moving on to the
+    next element doesn't clear the returned one.
+    """
+    pointer = element.pointer
+    while not element.done and pointer.depth() > element.depth:
+        try:
+            next(pointer)
+        except StopIteration:
+            break
+    element.done = True
+    raw = element.element
+    element.element = etree.Element(raw.tag)
+    return raw
+
+
+def has_model_and_text(raw, model):
+    children = {trim_ns(sub_element.tag): sub_element for sub_element in raw}
+    return 'model' in children and children['model'].text == model and \
+        'text' in children and children['text'].text is not None
+
+
+def read_xml(f):
+    return Dump.from_file(f)
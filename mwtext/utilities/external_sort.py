@@ -0,0 +1,97 @@
+"""
+Sorting and joining keyed line streams that don't fit in memory.
+
+Records are `(key, payload)` pairs of strings.  They are sorted in runs of
+at most `buffer_size` records and about `buffer_bytes` bytes of encoded keys
+and payloads (so large records such as whole revdocs don't hold memory
+unbounded), each run is spilled to a temporary file as
+`<json key>\\t<payload>` lines and the runs are lazily merged back together.
+Keys are compared in their JSON encoded form, which is consistent across
+streams (all that a merge join needs) and never contains a tab.  Payloads
+must not contain newlines.
+"""
+import heapq
+import json
+import os
+import tempfile
+from itertools import groupby
+
+DEFAULT_BUFFER_SIZE = 1000000
+DEFAULT_BUFFER_BYTES = 256 * 1024 * 1024
+
+
+def external_sort(records, tmp_dir, buffer_size=DEFAULT_BUFFER_SIZE,
+                  buffer_bytes=DEFAULT_BUFFER_BYTES):
+    """
+    Yields `(encoded_key, payload)` pairs sorted by key.  The sort is stable,
+    so records with the same key are yielded in the order they were read.
+    Run files are written to `tmp_dir` and removed once they are exhausted.
+    """
+    run_paths = []
+    records = iter(records)
+    while True:
+        run = sorted(read_buffer(records, buffer_size, buffer_bytes),
+                     key=first)
+        if len(run) == 0:
+            break
+        fd, path = tempfile.mkstemp(suffix=".run", dir=tmp_dir)
+        with open(fd, "w", encoding="utf-8") as f:
+            for encoded_key, payload in run:
+                f.write(encoded_key + "\t" + payload + "\n")
+        run_paths.append(path)
+
+    # heapq.merge() favors earlier runs when keys tie, keeping the sort stable
+    yield from heapq.merge(*(read_run(path) for path in run_paths),
+                           key=first)
+
+
+def read_buffer(records, buffer_size, buffer_bytes):
+    """
+    Reads `(encoded_key, payload)` pairs until `buffer_size` records or
+    about `buffer_bytes` characters of keys and payloads have been read.
+    """
+    buffer = []
+    size = 0
+    for key, payload in records:
+        encoded_key = json.dumps(key)
+        buffer.append((encoded_key, payload))
+        size += len(encoded_key) + len(payload)
+        if len(buffer) >= buffer_size or size >= buffer_bytes:
+            break
+    return buffer
+
+
+def read_run(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                encoded_key, payload = line[:-1].split("\t", 1)
+                yield encoded_key, payload
+    finally:
+        os.remove(path)
+
+
+def merge_join(left, right):
+    """
+    Joins two streams of `(encoded_key, payload)` pairs that are sorted by
+    key.  Yields `(left_payload, right_payloads)` for every left record where
+    `right_payloads` lists the payloads of the right records with the same
+    key (possibly empty).
+    """
+    right_groups = groupby(right, key=first)
+    right_key, right_group = next(right_groups, (None, None))
+    for left_key, left_group in groupby(left, key=first):
+        while right_key is not None and right_key < left_key:
+            right_key, right_group = next(right_groups, (None, None))
+        if right_key == left_key:
+            right_payloads = [payload for _, payload in right_group]
+            right_key, right_group = next(right_groups, (None, None))
+        else:
+            right_payloads = []
+
+        for _, left_payload in left_group:
+            yield left_payload, right_payloads
+
+
+def first(pair):
+    return pair[0]
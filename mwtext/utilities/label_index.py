@@ -0,0 +1,179 @@
+"""
+A compact, memory-mappable map from page names to label ids.
+
+Page names are stored as a sorted array of 64-bit hashes and the labels of
+the i'th page as `label_ids[offsets[i]:offsets[i + 1]]`.  An index is saved
+as a directory of `.npy` files, so opening one with `mmap=True` is instant
+and forked worker processes share a single page-cached copy.
+"""
+import hashlib
+import json
+import os
+from array import array
+
+import numpy as np
+
+FILES = ("hashes.npy", "offsets.npy", "label_ids.npy")
+LABELS_FILE = "labels.json"
+
+
+def hash_key(key):
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def read_labeled_pages(f, title_lang, label_field, label2ids):
+    """
+    Reads (page_name, label_ids) pairs from a labels file.  New labels are
+    assigned ids in `label2ids` in the order they are seen.
+    """
+    for line in f:
+        ob = json.loads(line)
+
+        # Get title
+        if title_lang == "wikidata":
+            if ob['qid'] is None:
+                continue
+            else:
+                page_name = ob['qid']
+        else:
+            if title_lang not in ob['sitelinks']:
+                continue
+            else:
+                page_name = ob['sitelinks'][title_lang]
+
+        # Get labels
+        label_ids = set()
+        for label in ob[label_field]:
+            if label not in label2ids:
+                label2ids[label] = len(label2ids)
+            label_ids.add(label2ids[label])
+
+        yield page_name, sorted(label_ids)
+
+
+class LabelIndex:
+    """
+    Args:
+        hashes (np.ndarray[uint64]): sorted hashes of page names
+        offsets (np.ndarray[int64]): start of each page's labels in
+            `label_ids` (len(hashes) + 1 entries)
+        label_ids (np.ndarray): the label ids of every page, concatenated
+        label2ids (dict): a map from label names to ids
+    """
+    def __init__(self, hashes, offsets, label_ids, label2ids):
+        self.hashes = hashes
+        self.offsets = offsets
+        self.label_ids = label_ids
+        self.label2ids = label2ids
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, page_name):
+        return self._find(page_name) is not None
+
+    def __getitem__(self, page_name):
+        i = self._find(page_name)
+        if i is None:
+            raise KeyError(page_name)
+        return self.label_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def get(self, page_name, default=None):
+        i = self._find(page_name)
+        if i is None:
+            return default
+        return self.label_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def _find(self, page_name):
+        key = np.uint64(hash_key(page_name))
+        i = int(np.searchsorted(self.hashes, key))
+        if i < len(self.hashes) and self.hashes[i] == key:
+            return i
+        else:
+            return None
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for filename, values in zip(
+                FILES, (self.hashes, self.offsets, self.label_ids)):
+            np.save(os.path.join(path, filename), values)
+        with open(os.path.join(path, LABELS_FILE), "w") as f:
+            json.dump(self.label2ids, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = 'r' if mmap else None
+        hashes, offsets, label_ids = (
+            np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+            for filename in FILES)
+        with open(os.path.join(path, LABELS_FILE)) as f:
+            label2ids = json.load(f)
+        return cls(hashes, offsets, label_ids, label2ids)
+
+    @classmethod
+    def from_labels_file(cls, f, title_lang, label_field):
+        """
+        Builds an index from a labels file (see
+        :func:`~mwtext.utilities.words2plaintext.create_label_map`) without
+        holding a Python object per page.  If a page name appears more than
+        once, the last set of labels wins.
+        """
+        label2ids = {}
+        hashes = array('Q')
+        counts = array('I')
+        label_ids = array('I')
+        labeled_pages = read_labeled_pages(
+            f, title_lang, label_field, label2ids)
+        for page_name, page_label_ids in labeled_pages:
+            hashes.append(hash_key(page_name))
+            counts.append(len(page_label_ids))
+            label_ids.extend(page_label_ids)
+
+        return cls.from_arrays(
+            np.frombuffer(hashes, dtype=np.uint64),
+            np.frombuffer(counts, dtype=np.uint32),
+            np.frombuffer(label_ids, dtype=np.uint32),
+            label2ids)
+
+    @classmethod
+    def from_label_map(cls, page_name2labels, label2ids):
+        hashes = np.fromiter((hash_key(page_name)
+                              for page_name in page_name2labels),
+                             dtype=np.uint64, count=len(page_name2labels))
+        counts = np.fromiter((len(labels)
+                              for labels in page_name2labels.values()),
+                             dtype=np.uint32, count=len(page_name2labels))
+        label_ids = np.fromiter((label_id
+                                 for labels in page_name2labels.values()
+                                 for label_id in sorted(labels)),
+                                dtype=np.uint32, count=int(counts.sum()))
+        return cls.from_arrays(hashes, counts, label_ids, label2ids)
+
+    @classmethod
+    def from_arrays(cls, hashes, counts, label_ids, label2ids):
+        """
+        Sorts pages by hash given their hashes, label counts and
+        concatenated label ids in file order.
+        """
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+
+        order = np.argsort(hashes, kind='stable')
+        sorted_hashes = hashes[order]
+        # Keep the last of any repeated page names
+        keep = np.ones(len(order), dtype=bool)
+        keep[:-1] = sorted_hashes[:-1] != sorted_hashes[1:]
+        order = order[keep]
+
+        sorted_counts = counts[order].astype(np.int64)
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(sorted_counts, out=offsets[1:])
+
+        # Gather each page's labels into the new order
+        positions = np.repeat(starts[order] - offsets[:-1], sorted_counts) + \
+            np.arange(offsets[-1], dtype=np.int64)
+        dtype = np.uint16 if len(label2ids) <= 2 ** 16 else np.uint32
+        sorted_label_ids = label_ids[positions].astype(dtype)
+
+        return cls(hashes[order], offsets, sorted_label_ids, label2ids)
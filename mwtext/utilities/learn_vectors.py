@@ -5,15 +5,23 @@ a complete set of vectors for the words observed in the input text.
 Usage:
     learn_vectors (-h|--help)
     learn_vectors <input> [--param=<kv>]... [--qt-cutoff=<num>] [--output=<path>]
+                  [--format=<type>] [--float16]
 
 Options:
     --param=<kv>       A named parameter for training the fasttext model. The
                        value will be interpretted as a JSON blob.
     <input>            The path of an input file containing labels and words in
                        the fasttext format.
-    --qt-cutoff=<num>  Set a limit on the number of words that will stay in
-                       model dictionary after quantization(feature selection)
+    --qt-cutoff=<num>  Set a limit on the number of words to output.  Like
+                       fastText's quantization (feature selection), the
+                       words with the largest vectors are kept.
     --output=<path>    The output file to write vectors to [default: <stdout>]
+    --format=<type>    The format to write vectors in.  "text" and "binary"
+                       are word2vec formats.  "npy" writes the matrix to the
+                       output path + ".npy" and one word per line to the
+                       output path + ".vocab".  "gensim" writes a gensim
+                       KeyedVectors file. [default: text]
+    --float16          Store vectors as float16 ("npy" and "gensim" only)
     --debug            Print debug information.
 """
 import json
@@ -21,6 +29,13 @@ import sys
 
 import docopt
 import fasttext
+import fasttext_pybind
+import numpy as np
+
+from .word2vec2gensim import save_keyed_vectors
+
+FORMATS = {"text", "binary", "npy", "gensim"}
+EOS = "</s>"
 
 
 def main(argv):
@@ -34,23 +49,134 @@ def main(argv):
         value = json.loads(value_str)
         params[key] = value
 
-    if args['--output'] == "<stdout>":
-        output = sys.stdout
+    format = args['--format']
+    if format not in FORMATS:
+        raise RuntimeError("Unknown format {0}".format(format))
+    if args['--float16'] and format not in ("npy", "gensim"):
+        raise RuntimeError("--float16 only works with 'npy' and 'gensim'")
+    dtype = np.float16 if args['--float16'] else np.float32
+
+    if format in ("npy", "gensim"):
+        if args['--output'] == "<stdout>":
+            raise RuntimeError("'{0}' needs an --output path".format(format))
+        output = args['--output']
+    elif args['--output'] == "<stdout>":
+        output = sys.stdout.buffer if format == "binary" else sys.stdout
     else:
-        output = open(args['--output'], "w")
+        output = open(args['--output'], "wb" if format == "binary" else "w")
     qt_cutoff = int(args['--qt-cutoff']) if args['--qt-cutoff'] is not None else 0
-    learn_vectors(input_path, params, qt_cutoff, output)
+    learn_vectors(input_path, params, qt_cutoff, output, format=format,
+                  dtype=dtype)
+    if args['--output'] != "<stdout>" and format in ("text", "binary"):
+        output.close()
+
+
+def learn_vectors(input_path, params, qt_cutoff, output, format="text",
+                  dtype=np.float32):
+    model = train_model(input_path, params)
+    write_vectors(model, output, format=format, dtype=dtype, cutoff=qt_cutoff)
+
+
+def train_model(input_path, params):
+    # Vectors are exported from the full precision model.  A quantized model
+    # can only be decoded one word at a time.
+    return fasttext.train_supervised(input_path, **params)
+
+
+def write_vectors(model, output, format="text", dtype=np.float32, cutoff=0):
+    words = model.get_words()
+    vectors = word_vectors(model, words)
+    if cutoff > 0:
+        words, vectors = select_words(words, vectors, cutoff)
+    vectors = vectors.astype(dtype, copy=False)
+
+    if format == "text":
+        write_word2vec_text(words, vectors, output)
+    elif format == "binary":
+        write_word2vec_binary(words, vectors, output)
+    elif format == "npy":
+        write_npy(words, vectors, output)
+    elif format == "gensim":
+        write_gensim(words, vectors, output)
+
+
+def word_vectors(model, words):
+    """
+    Builds a len(words) x dim matrix of word vectors.  Vectors are gathered
+    from the input matrix in one batch unless the model is quantized, in
+    which case only fasttext can decode them.
+    """
+    if model.is_quantized():
+        return quantized_word_vectors(model, words)
+
+    if len(words) == 0:
+        return np.zeros((0, model.get_dimension()), dtype=np.float32)
+
+    input_matrix = model.get_input_matrix()
+    # A word's vector is the mean of the rows of its subwords (including
+    # the word itself)
+    subword_ids = [model.get_subwords(word)[1] for word in words]
+    counts = np.array([len(ids) for ids in subword_ids], dtype=np.int64)
+    starts = np.zeros(len(words), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    rows = input_matrix[np.concatenate(subword_ids)]
+    return (np.add.reduceat(rows, starts) / counts[:, None]).astype(np.float32)
+
+
+def select_words(words, vectors, cutoff):
+    """
+    Keeps the `cutoff` words with the largest vectors (by L2 norm) in their
+    original order, the same way fastText's quantization selects words.  The
+    end of sentence token is always kept.
+    """
+    if cutoff >= len(words):
+        return words, vectors
+    norms = np.linalg.norm(vectors, axis=1)
+    if EOS in words:
+        norms[words.index(EOS)] = np.inf
+    keep = np.sort(np.argsort(-norms, kind='stable')[:cutoff])
+    return [words[i] for i in keep], vectors[keep]
+
+
+def quantized_word_vectors(model, words):
+    """
+    Decodes the vectors of a quantized model one word at a time into a
+    single fasttext vector (and a NumPy view of it) that is reused for
+    every word.  `get_word_vector()` allocates both for each word.
+    """
+    dim = model.get_dimension()
+    vectors = np.empty((len(words), dim), dtype=np.float32)
+    vector = fasttext_pybind.Vector(dim)
+    view = np.asarray(vector)
+    for i, word in enumerate(words):
+        model.f.getWordVector(vector, word)
+        vectors[i] = view
+    return vectors
+
+
+def write_word2vec_text(words, vectors, f):
+    f.write("{0} {1}\n".format(*vectors.shape))
+    for word, vector in zip(words, vectors):
+        f.write(" ".join([word] + [str(v) for v in vector]))
+        f.write("\n")
+
+
+def write_word2vec_binary(words, vectors, f):
+    f.write("{0} {1}\n".format(*vectors.shape).encode('utf-8'))
+    vectors = vectors.astype('<f4', copy=False)
+    for word, vector in zip(words, vectors):
+        f.write(word.encode('utf-8') + b" " + vector.tobytes() + b"\n")
 
 
-def learn_vectors(input_path, params, qt_cutoff, output):
-    model = fasttext.train_supervised(input_path, **params)
-    model.quantize(input=input_path, cutoff=qt_cutoff, retrain=True, qnorm=True)
+def write_npy(words, vectors, path):
+    np.save(path + ".npy", vectors)
+    with open(path + ".vocab", "w") as f:
+        for word in words:
+            f.write(word + "\n")
 
-    dimensions = params.get('dim', 100)
-    words = len(model.words)
 
-    output.write("{0} {1}\n".format(words, dimensions))
-    for word in model.get_words():
-        vector = model.get_word_vector(word)
-        output.write(" ".join([word] + [str(v) for v in vector]))
-        output.write("\n")
+def write_gensim(words, vectors, path):
+    from gensim.models import KeyedVectors
+    kv = KeyedVectors(vectors.shape[1], count=0, dtype=vectors.dtype)
+    kv.add_vectors(words, vectors)
+    save_keyed_vectors(kv, path)
@@ -0,0 +1,74 @@
+r"""
+``$ mwtext lookup_revdocs -h``
+::
+
+    Fetches revdocs by page id, page name or rev id from output files
+    written by `transform_content --index`.  Only the blocks that contain
+    matching records are decompressed.  Writes the matching revdocs as JSON
+    lines.
+
+    Usage:
+        lookup_revdocs (-h|--help)
+        lookup_revdocs <index-dir>...
+                       (--page-id=<id>|--page-name=<name>|--rev-id=<id>)
+                       [--field=<name>]... [--latest]
+                       [--verbose] [--debug]
+
+    Options:
+        -h --help           Print this documentation
+        <index-dir>         The ".index" directory of an output file
+        --page-id=<id>      The id of the page to look up
+        --page-name=<name>  The name of the page to look up
+        --rev-id=<id>       The id of the revision to look up
+        --field=<name>      Only output these fields of each revdoc
+        --latest            Only output the last matching revdoc
+        --verbose           Print progress information to stderr.
+        --debug             Print debug logs.
+"""
+import json
+import logging
+import sys
+
+import docopt
+
+from .page_index import PageIndex
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    page_indexes = [PageIndex.load(path) for path in args['<index-dir>']]
+    fields = args['--field'] if len(args['--field']) > 0 else None
+
+    docs = lookup_revdocs(
+        page_indexes,
+        page_id=int(args['--page-id']) if args['--page-id'] else None,
+        page_name=args['--page-name'],
+        rev_id=int(args['--rev-id']) if args['--rev-id'] else None,
+        fields=fields)
+    if args['--latest']:
+        docs = list(docs)[-1:]
+
+    for doc in docs:
+        json.dump(doc, sys.stdout)
+        sys.stdout.write("\n")
+
+
+def lookup_revdocs(page_indexes, page_id=None, page_name=None, rev_id=None,
+                   fields=None):
+    """
+    Yields the matching revdocs from each of `page_indexes` in turn.
+    """
+    for page_index in page_indexes:
+        for doc in page_index.find(page_id=page_id, page_name=page_name,
+                                   rev_id=rev_id, fields=fields):
+            if fields is not None:
+                doc = {field: doc[field] for field in fields if field in doc}
+            yield doc
@@ -0,0 +1,100 @@
+"""
+Memoization of transformed content for full-history dumps where reverts make
+many revisions share byte-identical text (and so the same sha1).
+"""
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+COMMIT_EVERY = 1000
+
+
+class TransformMemo:
+    """
+    Wraps a transformer with a per-page LRU keyed by revision sha1 and an
+    optional sqlite store shared between processes and runs.  Store entries
+    are keyed by (transformer fingerprint, sha1) so a store can hold the
+    output of several differently configured transformers.
+
+    Args:
+        transformer (ContentTransformer): the transformer to memoize
+        size (int): max number of transformed documents to hold per page
+        store_path (str): path to a sqlite database to share results in
+    """
+    def __init__(self, transformer, size=64, store_path=None):
+        self.transformer = transformer
+        self.fingerprint = transformer.fingerprint()
+        self.size = size
+        self.lru = OrderedDict()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+        self.store = None
+        self.uncommitted = 0
+        if store_path is not None:
+            self.store = sqlite3.connect(store_path, timeout=60)
+            self.store.execute("PRAGMA journal_mode=WAL")
+            self.store.execute(
+                "CREATE TABLE IF NOT EXISTS memo (" +
+                "fingerprint TEXT, sha1 TEXT, content TEXT, " +
+                "PRIMARY KEY (fingerprint, sha1))")
+            self.store.commit()
+
+    def new_page(self):
+        self.lru.clear()
+
+    def transform(self, sha1, text):
+        if sha1 is None:
+            self.misses += 1
+            return self.transformer.transform(text)
+
+        if sha1 in self.lru:
+            self.lru.move_to_end(sha1)
+            self.hits += 1
+            return self.lru[sha1]
+
+        transformed = None
+        if self.store is not None:
+            row = self.store.execute(
+                "SELECT content FROM memo WHERE fingerprint = ? AND sha1 = ?",
+                (self.fingerprint, sha1)).fetchone()
+            if row is not None:
+                transformed = json.loads(row[0])
+                self.store_hits += 1
+
+        if transformed is None:
+            transformed = self.transformer.transform(text)
+            self.misses += 1
+            if self.store is not None:
+                self.store.execute(
+                    "INSERT OR IGNORE INTO memo VALUES (?, ?, ?)",
+                    (self.fingerprint, sha1, json.dumps(transformed)))
+                self.uncommitted += 1
+                if self.uncommitted >= COMMIT_EVERY:
+                    self.store.commit()
+                    self.uncommitted = 0
+
+        self.lru[sha1] = transformed
+        if len(self.lru) > self.size:
+            self.lru.popitem(last=False)
+
+        return transformed
+
+    def stats(self):
+        total = self.hits + self.store_hits + self.misses
+        return {
+            'hits': self.hits,
+            'store_hits': self.store_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.store_hits) / total if total else 0.0
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store.commit()
+            self.store.close()
+            self.store = None
@@ -0,0 +1,266 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding.
+
+Each document's tokens are hashed into overlapping `shingle_size` token
+shingles and a signature of `num_perm` minimum hash values is computed with
+vectorized multiply-shift hashing.  Signatures are split into `bands` bands
+and documents that share any band are candidate duplicates.  A candidate is
+a near-duplicate of an earlier document if the estimated Jaccard similarity
+of their shingles (the proportion of equal signature values) reaches
+`threshold`.
+
+:class:`DuplicateFinder` spills signatures and band keys to disk as they are
+computed and finds candidates one band at a time by sorting band keys, so
+memory use is a few arrays of one value per document rather than a hash
+table per band.
+"""
+import os
+import tempfile
+import zlib
+
+import numpy as np
+
+SHINGLE_PRIME = np.uint64(0x100000001b3)
+BAND_PRIME = np.uint64(0x9e3779b97f4a7c15)
+MAX_HASH = np.uint32(0xffffffff)
+CHUNK_SIZE = 4096
+BATCH_SIZE = 10000
+
+
+class MinHasher:
+    """
+    Args:
+        num_perm (int): the number of hash functions in a signature
+        shingle_size (int): the number of tokens per shingle
+        seed (int): seeds the hash functions
+    """
+    def __init__(self, num_perm=128, shingle_size=5, seed=0):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        random = np.random.RandomState(seed)
+        self.a = random.randint(0, 2 ** 63, size=(num_perm, 1),
+                                dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = random.randint(0, 2 ** 63, size=(num_perm, 1),
+                                dtype=np.uint64)
+
+    def shingles(self, tokens):
+        """
+        Returns an array of 64-bit hashes of the `shingle_size`-grams of
+        `tokens`.  Documents shorter than `shingle_size` are one shingle.
+        """
+        token_hashes = np.fromiter(
+            (zlib.crc32(token.encode('utf-8')) for token in tokens),
+            dtype=np.uint64, count=len(tokens))
+        k = min(self.shingle_size, len(tokens))
+        n = len(tokens) - k + 1
+        hashes = np.zeros(n, dtype=np.uint64)
+        for i in range(k):
+            hashes = hashes * SHINGLE_PRIME + token_hashes[i:i + n]
+        return hashes
+
+    def signature(self, tokens):
+        """
+        Returns the MinHash signature of `tokens` as an array of `num_perm`
+        uint32s.  A document without tokens has a signature of all
+        :data:`MAX_HASH`.
+        """
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        if len(tokens) == 0:
+            return signature
+
+        shingles = self.shingles(tokens)
+        for start in range(0, len(shingles), CHUNK_SIZE):
+            chunk = shingles[start:start + CHUNK_SIZE]
+            hashes = (self.a * chunk + self.b) >> np.uint64(32)
+            np.minimum(signature, hashes.min(axis=1), out=signature)
+        return signature
+
+
+def band_keys(signatures, bands):
+    """
+    Combines each band of rows of `signatures` (a documents x num_perm
+    array) into one 64-bit key.  Returns a documents x bands array.
+    """
+    rows = signatures.shape[1] // bands
+    keys = np.zeros((signatures.shape[0], bands), dtype=np.uint64)
+    for band in range(bands):
+        for row in range(band * rows, (band + 1) * rows):
+            keys[:, band] = keys[:, band] * BAND_PRIME + \
+                signatures[:, row].astype(np.uint64)
+    return keys
+
+
+class DuplicateFinder:
+    """
+    Collects the signatures of a stream of documents and then finds which of
+    them are near-duplicates of earlier documents.
+
+    Args:
+        minhasher (MinHasher): computes signatures
+        bands (int): the number of LSH bands.  Must divide `num_perm`.
+        threshold (float): the minimum estimated Jaccard similarity of a
+            near-duplicate
+        max_copies (int): how many documents of each cluster of
+            near-duplicates to keep.  More than 1 down-weights rather than
+            drops repeated content.
+        tmp_dir (str): the directory to spill signatures and band keys to
+    """
+    def __init__(self, minhasher, bands=16, threshold=0.8, max_copies=1,
+                 tmp_dir=None):
+        if minhasher.num_perm % bands != 0:
+            raise ValueError("num_perm={0} is not divisible by bands={1}"
+                             .format(minhasher.num_perm, bands))
+        self.minhasher = minhasher
+        self.bands = bands
+        self.threshold = threshold
+        self.max_copies = max_copies
+        self.spill_dir = tempfile.TemporaryDirectory(
+            prefix="mwtext-minhash-", dir=tmp_dir)
+        self.signature_file = open(self._path("signatures"), "wb")
+        self.band_files = [open(self._path("band-{0}".format(band)), "wb")
+                           for band in range(bands)]
+        self.batch = []
+        self.empty = []
+
+    def _path(self, name):
+        return os.path.join(self.spill_dir.name, name)
+
+    def __len__(self):
+        return len(self.empty)
+
+    def add(self, tokens):
+        self.batch.append(self.minhasher.signature(tokens))
+        self.empty.append(len(tokens) == 0)
+        if len(self.batch) >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if len(self.batch) == 0:
+            return
+        signatures = np.vstack(self.batch)
+        self.signature_file.write(signatures.tobytes())
+        keys = band_keys(signatures, self.bands)
+        for band, f in enumerate(self.band_files):
+            f.write(keys[:, band].tobytes())
+        self.batch = []
+
+    def find(self):
+        """
+        Returns:
+            (keep, duplicate_of, similarity) arrays with one entry per
+            document: whether to keep it, the first document of its cluster
+            and its highest estimated similarity to an earlier document it
+            matched (or 1.0 for documents that matched nothing earlier).
+
+        Within each band's bucket, every document is compared with every
+        earlier document (with a distinct signature) and clusters are
+        joined with union-find, so a chain of near-duplicates is one
+        cluster.
+        """
+        self._flush()
+        for f in [self.signature_file] + self.band_files:
+            f.close()
+        n = len(self.empty)
+        empty = np.array(self.empty, dtype=bool)
+        if n == 0:
+            return (np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64),
+                    np.zeros(0, dtype=np.float32))
+        signatures = np.memmap(self._path("signatures"), dtype=np.uint32,
+                               mode='r', shape=(n, self.minhasher.num_perm))
+
+        parent = np.arange(n, dtype=np.int64)
+        matched = np.zeros(n, dtype=bool)
+        similarity = np.ones(n, dtype=np.float32)
+        for band in range(self.bands):
+            keys = np.fromfile(self._path("band-{0}".format(band)),
+                               dtype=np.uint64)
+            order = np.flatnonzero(~empty)
+            order = order[np.argsort(keys[order], kind='stable')]
+            sorted_keys = keys[order]
+            # Only buckets with more than one document have candidates
+            starts = np.flatnonzero(
+                np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            ends = np.r_[starts[1:], len(order)]
+            multiple = ends - starts > 1
+            for start, end in zip(starts[multiple], ends[multiple]):
+                self._match(signatures, order[start:end], parent, matched,
+                            similarity)
+
+        # Point every document at the root of its cluster
+        roots = parent
+        while True:
+            next_roots = roots[roots]
+            if np.array_equal(next_roots, roots):
+                break
+            roots = next_roots
+
+        # Keep the first `max_copies` documents of each cluster
+        order = np.lexsort((np.arange(n), roots))
+        sorted_roots = roots[order]
+        group_starts = np.ones(n, dtype=bool)
+        group_starts[1:] = sorted_roots[1:] != sorted_roots[:-1]
+        starts = np.maximum.accumulate(np.where(group_starts, np.arange(n), 0))
+        keep = np.empty(n, dtype=bool)
+        keep[order] = np.arange(n) - starts < self.max_copies
+
+        return keep, roots, similarity
+
+    def _match(self, signatures, bucket, parent, matched, similarity):
+        """
+        Joins the clusters of each document in `bucket` (in document order)
+        and every earlier document in it that it is a near-duplicate of.
+        """
+        # Documents with equal signatures are only compared once
+        unique, firsts, inverse = np.unique(
+            signatures[bucket], axis=0, return_index=True,
+            return_inverse=True)
+        inverse = inverse.ravel()
+        for i in np.flatnonzero(firsts[inverse] != np.arange(len(bucket))):
+            union(parent, bucket[firsts[inverse[i]]], bucket[i])
+            self._matched(bucket[i], 1.0, matched, similarity)
+
+        in_order = np.argsort(firsts)
+        documents = bucket[firsts[in_order]]
+        unique = unique[in_order]
+        for i in range(1, len(documents)):
+            sims = (unique[:i] == unique[i]).mean(axis=1)
+            earlier = np.flatnonzero(sims >= self.threshold)
+            for j in earlier:
+                union(parent, documents[j], documents[i])
+            if len(earlier) > 0:
+                self._matched(documents[i], sims[earlier].max(), matched,
+                              similarity)
+
+    @staticmethod
+    def _matched(document, sim, matched, similarity):
+        if not matched[document] or sim > similarity[document]:
+            similarity[document] = sim
+        matched[document] = True
+
+    def close(self):
+        for f in [self.signature_file] + self.band_files:
+            f.close()
+        self.spill_dir.cleanup()
+
+
+def find_root(parent, i):
+    """
+    Returns the root of `i`'s tree in the union-find forest `parent`, halving
+    the path to it.
+    """
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def union(parent, a, b):
+    """
+    Joins the trees of `a` and `b` in `parent` under the lower of their roots.
+    """
+    a = find_root(parent, a)
+    b = find_root(parent, b)
+    if a < b:
+        parent[b] = a
+    elif b < a:
+        parent[a] = b
@@ -0,0 +1,220 @@
+"""
+Random access to the revdocs in an output file of `transform_content`.
+
+With '--index', records are written in blocks of a fixed number of records.
+Each compressed block is an independent bz2 stream (or gzip member) appended
+to the file.  Ordinary bz2/gzip readers still see one stream of records,
+and a single record can be read by decompressing only its block.  A side
+index records the block and in-block offset of every record.  It is sorted
+by page id, page name (hashed) and rev id.
+
+An index is saved as a directory of `.npy` files next to its output file
+(``<output-file>.index``), so opening one with `mmap=True` is instant.
+"""
+import bz2
+import gzip
+import json
+import os
+from array import array
+
+import numpy as np
+
+from .label_index import hash_key
+from .revdoc_format import read_record_at
+
+INDEX_EXTENSION = "index"
+META_FILE = "meta.json"
+ARRAYS = ("blocks", "record_blocks", "record_offsets",
+          "page_id_keys", "page_id_rows", "page_name_keys", "page_name_rows",
+          "rev_id_keys", "rev_id_rows")
+COMPRESSORS = {'bz2': bz2.compress,
+               'gz': lambda data: gzip.compress(data, mtime=0)}
+DECOMPRESSORS = {'bz2': bz2.decompress, 'gz': gzip.decompress}
+DEFAULT_BLOCK_SIZE = 100
+
+
+class BlockWriter:
+    """
+    A file-like object that writes records in independently compressed
+    blocks and keeps track of where each record starts.
+
+    Args:
+        f (file): a file opened for writing bytes
+        compression (str): "bz2", "gz" or None
+        block_size (int): the number of records per block
+    """
+    def __init__(self, f, compression=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.f = f
+        self.compress = COMPRESSORS.get(compression)
+        self.compression = compression if self.compress else None
+        self.block_size = block_size
+
+        self.buffer = bytearray()
+        self.block_records = 0
+        self.offset = 0
+        self.blocks = array('q', [0])
+        self.record_blocks = array('I')
+        self.record_offsets = array('I')
+        self.page_ids = array('q')
+        self.rev_ids = array('q')
+        self.name_hashes = array('Q')
+
+    def write(self, data):
+        self.buffer += data
+
+    def start_record(self, page_id, page_name, rev_id):
+        """
+        Marks the start of a record.  Call before writing it.
+        """
+        self.record_blocks.append(len(self.blocks) - 1)
+        self.record_offsets.append(len(self.buffer))
+        self.page_ids.append(page_id)
+        self.rev_ids.append(rev_id)
+        self.name_hashes.append(hash_key(page_name))
+
+    def end_record(self):
+        self.block_records += 1
+        if self.block_records >= self.block_size:
+            self.flush_block()
+
+    def flush_block(self):
+        if len(self.buffer) == 0:
+            return
+        data = self.compress(bytes(self.buffer)) \
+            if self.compress is not None else bytes(self.buffer)
+        self.f.write(data)
+        self.offset += len(data)
+        self.blocks.append(self.offset)
+        self.buffer.clear()
+        self.block_records = 0
+
+    def close(self):
+        self.flush_block()
+        self.f.close()
+
+    def page_index(self, path, format="json", fields=None):
+        """
+        Builds a :class:`PageIndex` of the records written to `path`.
+        """
+        page_ids = np.frombuffer(self.page_ids, dtype=np.int64)
+        rev_ids = np.frombuffer(self.rev_ids, dtype=np.int64)
+        name_hashes = np.frombuffer(self.name_hashes, dtype=np.uint64)
+        arrays = {'blocks': np.frombuffer(self.blocks, dtype=np.int64),
+                  'record_blocks': np.frombuffer(self.record_blocks,
+                                                 dtype=np.uint32),
+                  'record_offsets': np.frombuffer(self.record_offsets,
+                                                  dtype=np.uint32)}
+        for name, keys in [("page_id", page_ids), ("page_name", name_hashes),
+                           ("rev_id", rev_ids)]:
+            rows = np.argsort(keys, kind='stable')
+            arrays[name + "_keys"] = keys[rows]
+            arrays[name + "_rows"] = rows
+        meta = {'file': os.path.basename(path),
+                'compression': self.compression, 'format': format,
+                'fields': fields}
+        return PageIndex(arrays, meta, os.path.dirname(path))
+
+
+class PageIndex:
+    """
+    Args:
+        arrays (dict): a map from the names in `ARRAYS` to arrays
+        meta (dict): the indexed file's name, compression, format ("json" or
+            "binary") and the binary format's fields
+        directory (str): the directory of the indexed file
+    """
+    def __init__(self, arrays, meta, directory):
+        self.arrays = arrays
+        self.meta = meta
+        self.path = os.path.join(directory, meta['file'])
+        self.decompress = DECOMPRESSORS.get(meta['compression'])
+        self._block = (None, None)
+
+    def __len__(self):
+        return len(self.arrays['record_blocks'])
+
+    def rows(self, page_id=None, page_name=None, rev_id=None):
+        """
+        Returns the sorted record numbers that match a page id, a page name
+        or a rev id.  Page names are matched by hash, so :meth:`find` checks
+        the decoded records.
+        """
+        if page_id is not None:
+            name, key = "page_id", np.int64(page_id)
+        elif page_name is not None:
+            name, key = "page_name", np.uint64(hash_key(page_name))
+        elif rev_id is not None:
+            name, key = "rev_id", np.int64(rev_id)
+        else:
+            raise ValueError("Need a page id, page name or rev id")
+        keys = self.arrays[name + "_keys"]
+        start = int(np.searchsorted(keys, key, side='left'))
+        end = int(np.searchsorted(keys, key, side='right'))
+        return np.sort(self.arrays[name + "_rows"][start:end])
+
+    def find(self, page_id=None, page_name=None, rev_id=None, fields=None):
+        """
+        Yields the revdocs that match, in file order.  Only `fields` are
+        decoded from binary revdocs if set.
+        """
+        if page_name is not None and fields is not None:
+            fields = set(fields) | {'page'}
+        for row in self.rows(page_id=page_id, page_name=page_name,
+                             rev_id=rev_id):
+            doc = self.read(row, fields=fields)
+            if page_name is None or doc['page']['page_name'] == page_name:
+                yield doc
+
+    def read(self, row, fields=None):
+        """
+        Reads the `row`th record by decompressing only its block.
+        """
+        block = int(self.arrays['record_blocks'][row])
+        offset = int(self.arrays['record_offsets'][row])
+        data = self.read_block(block)
+        if self.meta['format'] == "binary":
+            return read_record_at(data, offset, self.meta['fields'],
+                                  wanted=fields)
+        else:
+            end = data.index(b"\n", offset)
+            return json.loads(data[offset:end].decode('utf-8'))
+
+    def read_block(self, block):
+        # Consecutive reads from the same block only decompress it once
+        if self._block[0] == block:
+            return self._block[1]
+        start = int(self.arrays['blocks'][block])
+        end = int(self.arrays['blocks'][block + 1])
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        if self.decompress is not None:
+            data = self.decompress(data)
+        self._block = (block, data)
+        return data
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), self.arrays[name])
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads an index directory.  The indexed file is expected to be in the
+        same directory as the index.
+        """
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, name + ".npy"),
+                                mmap_mode=mmap_mode)
+                  for name in ARRAYS}
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        directory = os.path.dirname(os.path.abspath(path))
+        return cls(arrays, meta, directory)
+
+
+def index_path(path):
+    return path + "." + INDEX_EXTENSION
@@ -0,0 +1,319 @@
+"""
+Product quantization of word vectors.
+
+Each vector is split into `m` subvectors and each subvector is replaced by
+the id of its nearest centroid in that subspace's codebook, so a 50-dim
+float32 vector (200 bytes) with `m=10` and 256 centroids is stored in 10
+bytes.  Dot products with a query are computed on the codes directly by
+summing one lookup per subspace from a table of the query's dot products
+with every centroid.
+
+A :class:`CompressedVectors` store is saved as a directory of `.npy` files
+(plus a vocabulary with one word per line), so opening one with `mmap=True`
+is instant and forked processes share a single page-cached copy.
+"""
+import os
+
+import numpy as np
+
+FILES = ("codebooks.npy", "codes.npy")
+VOCAB_FILE = "vocab.txt"
+DEFAULT_BATCH_SIZE = 10000
+
+
+def kmeans(vectors, k, iterations=20, rng=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Clusters `vectors` into `k` centroids with Lloyd's algorithm starting
+    from `k` randomly chosen vectors.  Empty clusters are re-seeded with the
+    vectors that are farthest from their centroids.
+    """
+    rng = rng or np.random.default_rng(0)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) < k:
+        raise ValueError("Need at least {0} vectors to fit {0} centroids, "
+                         "but got {1}".format(k, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments, distances = assign(vectors, centroids, batch_size)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+
+        empty = np.flatnonzero(counts == 0)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        if len(empty) > 0:
+            farthest = np.argsort(distances)[::-1][:len(empty)]
+            centroids[empty] = vectors[farthest]
+
+    return centroids
+
+
+def assign(vectors, centroids, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Returns the index of the nearest centroid of each vector and the squared
+    distance to it.
+    """
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    distances = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2
+        batch_distances = centroid_norms - 2 * batch @ centroids.T
+        nearest = batch_distances.argmin(axis=1)
+        assignments[start:start + len(batch)] = nearest
+        distances[start:start + len(batch)] = np.maximum(
+            batch_distances[np.arange(len(batch)), nearest] +
+            (batch ** 2).sum(axis=1), 0)
+    return assignments, distances
+
+
+class ProductQuantizer:
+    """
+    Args:
+        codebooks (np.ndarray[float32]): an (m, k, dim / m) array of the `k`
+            centroids of each of the `m` subspaces
+    """
+    def __init__(self, codebooks):
+        self.codebooks = codebooks
+
+    @property
+    def subvectors(self):
+        return self.codebooks.shape[0]
+
+    @property
+    def clusters(self):
+        return self.codebooks.shape[1]
+
+    @property
+    def dim(self):
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    @property
+    def code_dtype(self):
+        return np.uint8 if self.clusters <= 2 ** 8 else np.uint16
+
+    @classmethod
+    def fit(cls, vectors, subvectors, clusters=256, iterations=20,
+            sample=100000, seed=0):
+        """
+        Learns a codebook for each subspace from (a sample of up to `sample`
+        of) `vectors`.
+        """
+        vectors = np.asarray(vectors)
+        dim = vectors.shape[1]
+        if dim % subvectors != 0:
+            raise ValueError("{0} dimensions can't be split into {1} "
+                             "subvectors".format(dim, subvectors))
+        if clusters > 2 ** 16:
+            raise ValueError("At most {0} clusters are supported"
+                             .format(2 ** 16))
+        rng = np.random.default_rng(seed)
+        if sample is not None and len(vectors) > sample:
+            rows = np.sort(rng.choice(len(vectors), sample, replace=False))
+            vectors = vectors[rows]
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        sub_dim = dim // subvectors
+        codebooks = np.empty((subvectors, clusters, sub_dim), dtype=np.float32)
+        for j in range(subvectors):
+            codebooks[j] = kmeans(vectors[:, j * sub_dim:(j + 1) * sub_dim],
+                                  clusters, iterations=iterations, rng=rng)
+        return cls(codebooks)
+
+    def split(self, vectors):
+        return np.asarray(vectors, dtype=np.float32).reshape(
+            len(vectors), self.subvectors, -1)
+
+    def encode(self, vectors, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Returns an (n, m) array with the nearest centroid of each subvector.
+        """
+        codes = np.empty((len(vectors), self.subvectors),
+                         dtype=self.code_dtype)
+        for start in range(0, len(vectors), batch_size):
+            batch = self.split(vectors[start:start + batch_size])
+            for j in range(self.subvectors):
+                codes[start:start + len(batch), j], _ = assign(
+                    batch[:, j], self.codebooks[j], batch_size)
+        return codes
+
+    def decode(self, codes):
+        """
+        Reconstructs float32 vectors from an (n, m) array of codes.
+        """
+        codes = np.asarray(codes)
+        subspaces = np.arange(self.subvectors)
+        return self.codebooks[subspaces, codes].reshape(len(codes), self.dim)
+
+    def dot_tables(self, queries):
+        """
+        Returns a (q, m, k) array of the dot products of each query's
+        subvectors with every centroid of their subspace.
+        """
+        return np.einsum('qmd,mkd->qmk', self.split(queries), self.codebooks)
+
+    def dot(self, queries, codes):
+        """
+        Returns a (q, n) array of approximate dot products of `queries` with
+        the vectors encoded by `codes`.
+        """
+        tables = self.dot_tables(np.atleast_2d(queries))
+        codes = np.asarray(codes, dtype=np.int64)
+        products = np.zeros((len(tables), len(codes)), dtype=np.float32)
+        for j in range(self.subvectors):
+            products += tables[:, j, codes[:, j]]
+        return products
+
+    def norms(self, codes):
+        """
+        Returns the norms of the vectors encoded by `codes`.  Subspaces are
+        orthogonal, so these are sums of per-centroid squared norms.
+        """
+        centroid_norms = (self.codebooks ** 2).sum(axis=2)
+        codes = np.asarray(codes, dtype=np.int64)
+        squared = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.subvectors):
+            squared += centroid_norms[j, codes[:, j]]
+        return np.sqrt(squared)
+
+    def similarity(self, queries, codes):
+        """
+        Returns a (q, n) array of approximate cosine similarities.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        query_norms = np.linalg.norm(queries, axis=1)
+        norms = np.outer(query_norms, self.norms(codes))
+        products = self.dot(queries, codes)
+        return np.divide(products, norms, out=np.zeros_like(products),
+                         where=norms > 0)
+
+
+class CompressedVectors:
+    """
+    Args:
+        words (list(str)): the words in the order of `codes`
+        codes (np.ndarray): an (n, m) array of codes
+        quantizer (ProductQuantizer): the quantizer that encoded `codes`
+    """
+    def __init__(self, words, codes, quantizer):
+        self.words = words
+        self.codes = codes
+        self.quantizer = quantizer
+        self.word2index = {word: i for i, word in enumerate(words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word2index
+
+    def indexes(self, words):
+        return [self.word2index[word] for word in words]
+
+    def get_vectors(self, words):
+        """
+        Decompresses the vectors of a batch of `words`.
+        """
+        return self.quantizer.decode(self.codes[self.indexes(words)])
+
+    def decode(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Yields (words, vectors) for every batch of `batch_size` words.
+        """
+        for start in range(0, len(self.words), batch_size):
+            yield (self.words[start:start + batch_size],
+                   self.quantizer.decode(self.codes[start:start + batch_size]))
+
+    def dot(self, queries):
+        """
+        Returns a (q, n) array of approximate dot products of `queries` with
+        every vector.
+        """
+        return self.quantizer.dot(queries, self.codes)
+
+    def similarity(self, word1, word2):
+        """
+        Returns the approximate cosine similarity of two words' vectors.
+        """
+        i, j = self.indexes([word1, word2])
+        return float(self.quantizer.similarity(
+            self.quantizer.decode(self.codes[i:i + 1]),
+            self.codes[j:j + 1])[0, 0])
+
+    def most_similar(self, word_or_vector, topn=10):
+        """
+        Returns the `topn` (word, similarity) pairs closest to a word or a
+        vector, excluding the word itself.
+        """
+        if isinstance(word_or_vector, str):
+            exclude = self.word2index[word_or_vector]
+            query = self.get_vectors([word_or_vector])
+        else:
+            exclude = None
+            query = word_or_vector
+        similarities = self.quantizer.similarity(query, self.codes)[0]
+        if exclude is not None:
+            similarities[exclude] = -np.inf
+        topn = min(topn, len(similarities) - (exclude is not None))
+        if topn <= 0:
+            return []
+        best = np.argpartition(-similarities, topn - 1)[:topn]
+        best = best[np.argsort(-similarities[best], kind='stable')]
+        return [(self.words[i], float(similarities[i])) for i in best]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for filename, values in zip(
+                FILES, (self.quantizer.codebooks, self.codes)):
+            np.save(os.path.join(path, filename), values)
+        with open(os.path.join(path, VOCAB_FILE), "w") as f:
+            for word in self.words:
+                f.write(word + "\n")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mmap_mode = 'r' if mmap else None
+        codebooks, codes = (
+            np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+            for filename in FILES)
+        with open(os.path.join(path, VOCAB_FILE)) as f:
+            words = [line.rstrip("\n") for line in f]
+        return cls(words, codes, ProductQuantizer(np.asarray(codebooks)))
+
+
+def reconstruction_error(quantizer, vectors, codes,
+                         batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Compares `vectors` to their reconstruction from `codes`.  Returns a dict
+    of the mean squared error per dimension, the mean relative squared error
+    (||x - x'||^2 / ||x||^2) and the mean cosine similarity of each vector
+    with its reconstruction.
+    """
+    squared_error = 0.0
+    relative_error = 0.0
+    cosine = 0.0
+    n = len(vectors)
+    for start in range(0, n, batch_size):
+        batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+        decoded = quantizer.decode(codes[start:start + batch_size])
+        errors = ((batch - decoded) ** 2).sum(axis=1)
+        squared = (batch ** 2).sum(axis=1)
+        norms = np.sqrt(squared * (decoded ** 2).sum(axis=1))
+        squared_error += float(errors.sum())
+        relative_error += float(np.divide(
+            errors, squared, out=np.zeros_like(errors),
+            where=squared > 0).sum())
+        cosine += float(np.divide(
+            (batch * decoded).sum(axis=1), norms,
+            out=np.ones_like(norms), where=norms > 0).sum())
+
+    if n == 0:
+        return {'vectors': 0, 'mse': 0.0, 'relative_error': 0.0,
+                'cosine': 1.0}
+    return {'vectors': n,
+            'mse': squared_error / (n * quantizer.dim),
+            'relative_error': relative_error / n,
+            'cosine': cosine / n}
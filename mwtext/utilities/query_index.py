@@ -0,0 +1,155 @@
+r"""
+``$ mwtext query_index -h``
+::
+
+    Finds the nearest neighbors of keys (words or page names) in an index
+    written by `build_index`.  Queries are read one per line and searched in
+    batches.  Writes one JSON line per query:
+    {"query": <key>, "neighbors": [[<key>, <score>], ...]}.  The query's own
+    key is excluded from its neighbors and unknown keys get no neighbors.
+
+    With '--evaluate', searches a random sample of the indexed vectors
+    instead and prints a JSON report of the recall of the index against an
+    exact search and the latency of both.
+
+    Usage:
+        query_index (-h|--help)
+        query_index <index-dir> [<query-file>]
+                    [--k=<num>] [--nprobe=<num>] [--batch-size=<num>]
+                    [--evaluate] [--sample=<num>] [--seed=<num>]
+                    [--output=<path>]
+                    [--verbose] [--debug]
+
+    Options:
+        -h --help           Print this documentation
+        <index-dir>         The directory of an index
+        <query-file>        A file of keys to query, one per line
+                            [default: <stdin>]
+        --k=<num>           The number of neighbors to find [default: 10]
+        --nprobe=<num>      The number of IVF lists to search [default: 8]
+        --batch-size=<num>  The number of queries to search at once
+                            [default: 1000]
+        --evaluate          Measure recall and latency rather than query
+        --sample=<num>      The number of queries to evaluate with
+                            [default: 1000]
+        --seed=<num>        Seeds the evaluation sample [default: 0]
+        --output=<path>     A path to write output to [default: <stdout>]
+        --verbose           Print progress information to stderr.
+        --debug             Print debug logs.
+"""
+import json
+import logging
+import sys
+import time
+from itertools import islice
+
+import docopt
+import numpy as np
+
+from .vector_index import IVFIndex, load_index, recall
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    index = load_index(args['<index-dir>'])
+    k = int(args['--k'])
+    nprobe = int(args['--nprobe'])
+
+    if args['--output'] == "<stdout>":
+        output = sys.stdout
+    else:
+        output = open(args['--output'], "w")
+
+    if args['--evaluate']:
+        report = evaluate(index, k=k, nprobe=nprobe,
+                          sample=int(args['--sample']),
+                          seed=int(args['--seed']),
+                          batch_size=int(args['--batch-size']))
+        json.dump(report, output)
+        output.write("\n")
+    else:
+        if args['<query-file>'] is None:
+            f = sys.stdin
+        else:
+            f = open(args['<query-file>'])
+        keys = (line.rstrip("\n") for line in f)
+        for result in query_index(index, keys, k=k, nprobe=nprobe,
+                                  batch_size=int(args['--batch-size'])):
+            json.dump(result, output)
+            output.write("\n")
+
+    if output is not sys.stdout:
+        output.close()
+
+
+def search(index, queries, k, nprobe):
+    if isinstance(index, IVFIndex):
+        return index.search(queries, k=k, nprobe=nprobe)
+    else:
+        return index.search(queries, k=k)
+
+
+def query_index(index, keys, k=10, nprobe=8, batch_size=1000):
+    """
+    Yields a dict of the neighbors of each key in batches of `batch_size`
+    queries.
+    """
+    keys = iter(keys)
+    while True:
+        batch = list(islice(keys, batch_size))
+        if len(batch) == 0:
+            break
+        known = [key for key in batch if key in index.key2id]
+        neighbors = {}
+        if len(known) > 0:
+            # One extra neighbor in case the key itself is found
+            ids, scores = search(index, index.vectors_of(known), k + 1,
+                                 nprobe)
+            for key, key_ids, key_scores in zip(known, ids, scores):
+                neighbors[key] = [
+                    [index.keys[i], float(score)]
+                    for i, score in zip(key_ids, key_scores)
+                    if i >= 0 and index.keys[i] != key][:k]
+        for key in batch:
+            yield {'query': key, 'neighbors': neighbors.get(key, [])}
+
+
+def evaluate(index, k=10, nprobe=8, sample=1000, seed=0, batch_size=1000):
+    """
+    Searches `sample` of the indexed vectors with `index` and with an exact
+    index.  Returns the recall@k of `index` and the milliseconds per query of
+    each.
+    """
+    exact = index.exact() if isinstance(index, IVFIndex) else index
+    rng = np.random.default_rng(seed)
+    keys = [exact.keys[i] for i in rng.choice(
+        len(exact), min(sample, len(exact)), replace=False)]
+    queries = exact.vectors_of(keys)
+
+    def timed_search(searcher):
+        start = time.perf_counter()
+        found = [search(searcher, queries[i:i + batch_size], k, nprobe)[0]
+                 for i in range(0, len(queries), batch_size)]
+        seconds = time.perf_counter() - start
+        return (np.vstack(found) if len(found) > 0 else
+                np.empty((0, k), dtype=np.int64)), seconds
+
+    exact_ids, exact_seconds = timed_search(exact)
+    ids, seconds = timed_search(index)
+    if exact is not index:
+        # The exact index's ids are positions in list order
+        exact_ids = index.ids[exact_ids]
+
+    n = max(len(queries), 1)
+    return {'queries': len(queries), 'k': k, 'nprobe': nprobe,
+            'recall': recall(exact_ids, ids),
+            'ms_per_query': 1000 * seconds / n,
+            'exact_ms_per_query': 1000 * exact_seconds / n}
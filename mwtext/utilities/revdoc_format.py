@@ -0,0 +1,375 @@
+"""
+A compact binary format for streams of revdocs.
+
+A file starts with a header -- the magic bytes ``MWRD``, a version byte and
+a length-prefixed JSON schema listing the names of the fields that records
+may contain.  Each record is a tag byte, the record's length and then its
+fields as (field id, value length, value) triples, so a reader can skip a
+whole record or any field without decoding it.  A field name that isn't in
+the schema is declared inline by a definition block before the first record
+that uses it.
+
+Values are typed msgpack-style: a type byte followed by the value.  Integers
+are zigzag varints, strings are length-prefixed UTF-8 and lists of strings
+(e.g. the tokens of Wikitext2Words) are stored as one length-prefixed
+``\\x00``-joined UTF-8 blob that decodes with a single `str.split()`.
+
+Files with a ".revdocs" extension (optionally followed by ".bz2" or ".gz")
+are read and written in this format.
+"""
+import bz2
+import gzip
+import io
+import json
+import os
+import struct
+
+MAGIC = b"MWRD"
+VERSION = 1
+EXTENSION = "revdocs"
+COMPRESSIONS = {'bz2': bz2.open, 'gz': gzip.open}
+# The extensions of input files that output paths replace
+INPUT_COMPRESSIONS = {'bz2', 'gz', '7z'}
+INPUT_FORMATS = {'xml', 'json', EXTENSION}
+
+RECORD = 1
+DEFINE = 2
+
+NONE, FALSE, TRUE, INT, FLOAT, STR, LIST, DICT, TOKENS = range(9)
+TOKEN_SEPARATOR = "\x00"
+FLOAT_STRUCT = struct.Struct("<d")
+
+REVDOC_FIELDS = (
+    "id", "timestamp", "user", "minor", "page", "comment", "text", "bytes",
+    "sha1", "parent_id", "model", "format", "deleted", "slots",
+    "transformed_content", "tokens_added", "tokens_removed")
+"""
+The fields of revdocs written by `transform_content` (see
+:meth:`mwxml.Revision.to_json`)
+"""
+
+
+def write_varint(value, out):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buffer, pos):
+    value = buffer[pos]
+    if value < 0x80:
+        return value, pos + 1
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def read_stream_varint(f):
+    value = 0
+    shift = 0
+    while True:
+        byte = f.read(1)
+        if len(byte) == 0:
+            raise EOFError("Unexpected end of file in a varint")
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def is_tokens(value):
+    return len(value) > 0 and all(
+        type(token) is str and TOKEN_SEPARATOR not in token
+        for token in value)
+
+
+def encode_value(value, out):
+    if value is None:
+        out.append(NONE)
+    elif value is True:
+        out.append(TRUE)
+    elif value is False:
+        out.append(FALSE)
+    elif isinstance(value, int):
+        out.append(INT)
+        # Zigzag encoding keeps small negative numbers small
+        write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+    elif isinstance(value, float):
+        out.append(FLOAT)
+        out += FLOAT_STRUCT.pack(value)
+    elif isinstance(value, str):
+        out.append(STR)
+        data = value.encode('utf-8')
+        write_varint(len(data), out)
+        out += data
+    elif isinstance(value, (list, tuple)):
+        if is_tokens(value):
+            out.append(TOKENS)
+            data = TOKEN_SEPARATOR.join(value).encode('utf-8')
+            write_varint(len(value), out)
+            write_varint(len(data), out)
+            out += data
+        else:
+            out.append(LIST)
+            write_varint(len(value), out)
+            for item in value:
+                encode_value(item, out)
+    elif isinstance(value, dict):
+        out.append(DICT)
+        write_varint(len(value), out)
+        for key, item in value.items():
+            data = str(key).encode('utf-8')
+            write_varint(len(data), out)
+            out += data
+            encode_value(item, out)
+    else:
+        raise TypeError("Can't encode {0!r}".format(type(value)))
+
+
+def decode_value(buffer, pos):
+    # Ordered by how common each type is in revdocs
+    value_type = buffer[pos]
+    pos += 1
+    if value_type == STR:
+        length, pos = read_varint(buffer, pos)
+        return str(buffer[pos:pos + length], 'utf-8'), pos + length
+    elif value_type == TOKENS:
+        _, pos = read_varint(buffer, pos)
+        length, pos = read_varint(buffer, pos)
+        data = str(buffer[pos:pos + length], 'utf-8')
+        return data.split(TOKEN_SEPARATOR), pos + length
+    elif value_type == INT:
+        zigzag, pos = read_varint(buffer, pos)
+        return (zigzag >> 1) ^ -(zigzag & 1), pos
+    elif value_type == DICT:
+        count, pos = read_varint(buffer, pos)
+        items = {}
+        for _ in range(count):
+            length, pos = read_varint(buffer, pos)
+            key = str(buffer[pos:pos + length], 'utf-8')
+            items[key], pos = decode_value(buffer, pos + length)
+        return items, pos
+    elif value_type == FALSE:
+        return False, pos
+    elif value_type == TRUE:
+        return True, pos
+    elif value_type == NONE:
+        return None, pos
+    elif value_type == LIST:
+        count, pos = read_varint(buffer, pos)
+        items = []
+        for _ in range(count):
+            item, pos = decode_value(buffer, pos)
+            items.append(item)
+        return items, pos
+    elif value_type == FLOAT:
+        return FLOAT_STRUCT.unpack_from(buffer, pos)[0], pos + 8
+    else:
+        raise ValueError("Unknown value type {0}".format(value_type))
+
+
+class RevdocWriter:
+    """
+    Writes revdocs (dicts) to a binary file.
+
+    Args:
+        f (file): a file opened for writing bytes
+        fields (iterable(str)): the field names to put in the schema header
+    """
+    def __init__(self, f, fields=REVDOC_FIELDS):
+        self.f = f
+        self.fields = list(fields)
+        self.field_ids = {name: i for i, name in enumerate(self.fields)}
+
+        header = bytearray(MAGIC)
+        header.append(VERSION)
+        schema = json.dumps({'fields': self.fields}).encode('utf-8')
+        write_varint(len(schema), header)
+        header += schema
+        f.write(header)
+
+    def write(self, doc):
+        body = bytearray()
+        write_varint(len(doc), body)
+        value = bytearray()
+        for name, field_value in doc.items():
+            if name not in self.field_ids:
+                self.define(name)
+            write_varint(self.field_ids[name], body)
+            value.clear()
+            encode_value(field_value, value)
+            write_varint(len(value), body)
+            body += value
+
+        record = bytearray([RECORD])
+        write_varint(len(body), record)
+        record += body
+        self.f.write(record)
+
+    def define(self, name):
+        self.field_ids[name] = len(self.fields)
+        self.fields.append(name)
+        data = name.encode('utf-8')
+        block = bytearray([DEFINE])
+        write_varint(len(data), block)
+        block += data
+        self.f.write(block)
+
+
+class RevdocReader:
+    """
+    Iterates over the revdocs in a binary file.
+
+    Args:
+        f (file): a file opened for reading bytes
+        fields (set(str)): if set, only these fields are decoded.  The
+            values of other fields are skipped.
+    """
+    def __init__(self, f, fields=None):
+        self.f = f
+        self.wanted = set(fields) if fields is not None else None
+
+        magic = f.read(len(MAGIC) + 1)
+        if magic[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a binary revdocs file")
+        if magic[len(MAGIC)] != VERSION:
+            raise ValueError("Unsupported version {0}"
+                             .format(magic[len(MAGIC)]))
+        length = read_stream_varint(f)
+        self.fields = json.loads(f.read(length).decode('utf-8'))['fields']
+
+    def __iter__(self):
+        f = self.f
+        while True:
+            tag = f.read(1)
+            if len(tag) == 0:
+                return
+            length = read_stream_varint(f)
+            data = f.read(length)
+            if len(data) != length:
+                raise EOFError("Unexpected end of file in a record")
+            if tag[0] == DEFINE:
+                self.fields.append(data.decode('utf-8'))
+            elif tag[0] == RECORD:
+                yield self.decode(data)
+            else:
+                raise ValueError("Unknown block type {0}".format(tag[0]))
+
+    def decode(self, data):
+        return decode_record(data, self.fields, self.wanted)
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def decode_record(data, fields, wanted=None):
+    """
+    Decodes the body of a record given the schema's `fields`.  Only the
+    `wanted` fields are decoded (all of them if None).
+    """
+    doc = {}
+    count, pos = read_varint(data, 0)
+    for _ in range(count):
+        # Field ids and most value lengths fit in one byte
+        field_id = data[pos]
+        if field_id < 0x80:
+            pos += 1
+        else:
+            field_id, pos = read_varint(data, pos)
+        length = data[pos]
+        if length < 0x80:
+            pos += 1
+        else:
+            length, pos = read_varint(data, pos)
+        name = fields[field_id]
+        if wanted is None or name in wanted:
+            doc[name], _ = decode_value(data, pos)
+        pos += length
+    return doc
+
+
+def read_record_at(buffer, pos, fields, wanted=None):
+    """
+    Decodes the record that starts at (or after the field definitions at)
+    `pos` in `buffer`.  `fields` must be the complete schema of the file, so
+    definitions are skipped.
+    """
+    while True:
+        tag = buffer[pos]
+        length, pos = read_varint(buffer, pos + 1)
+        if tag == RECORD:
+            return decode_record(buffer[pos:pos + length], fields, wanted)
+        elif tag != DEFINE:
+            raise ValueError("Unknown block type {0}".format(tag))
+        pos += length
+
+
+def is_binary_path(path):
+    """
+    Checks if a path has a ".revdocs" extension (optionally compressed).
+    """
+    parts = os.path.basename(path).split(".")
+    if len(parts) > 1 and parts[-1] in COMPRESSIONS:
+        parts = parts[:-1]
+    return len(parts) > 1 and parts[-1] == EXTENSION
+
+
+def open_binary(path, mode="rb", **kwargs):
+    _, extension = os.path.splitext(path)
+    opener = COMPRESSIONS.get(extension[1:], open)
+    return opener(path, mode, **kwargs)
+
+
+def output_path(old_path, output_dir, compression):
+    """
+    Returns the path of the binary revdocs file to write for an input file.
+    Like `mwcli.files.output_dir_path()`, only the input's extensions are
+    replaced, so parts of a split dump (e.g. "...27.xml-p1p41242.bz2" and
+    "...27.xml-p41243p151573.bz2") are written to different files.
+    """
+    parts = os.path.basename(old_path).split(".")
+    if len(parts) > 1 and parts[-1] in INPUT_COMPRESSIONS:
+        parts = parts[:-1]
+    if len(parts) > 1 and parts[-1] in INPUT_FORMATS:
+        parts = parts[:-1]
+    new_filename = ".".join(parts) + "." + EXTENSION
+    if compression in COMPRESSIONS:
+        new_filename += "." + compression
+    return os.path.join(output_dir, new_filename)
+
+
+def open_revdocs(path_or_f, fields=None):
+    """
+    Opens a file of revdocs in either format.  A binary revdocs file (by
+    extension or, for an open file, by its magic bytes) is returned as an
+    iterator of dicts (see :class:`RevdocReader`).  Anything else is
+    returned as a text file of JSON lines (decompressed if the path ends in
+    ".bz2" or ".gz").
+    """
+    if hasattr(path_or_f, "read"):
+        f = path_or_f
+        if isinstance(f, io.TextIOBase):
+            return f
+        if not hasattr(f, "peek"):
+            f = io.BufferedReader(f)
+        if f.peek(len(MAGIC))[:len(MAGIC)] == MAGIC:
+            return RevdocReader(f, fields=fields)
+        else:
+            return io.TextIOWrapper(f, encoding='utf-8')
+    elif is_binary_path(path_or_f):
+        return RevdocReader(open_binary(path_or_f), fields=fields)
+    else:
+        return open_binary(path_or_f, "rt", encoding='utf-8')
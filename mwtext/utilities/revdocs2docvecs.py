@@ -0,0 +1,284 @@
+r"""
+``$ mwtext revdocs2docvecs -h``
+::
+
+    Pools the word vectors of each revdoc's transformed content into a
+    document vector.  Tokens are mapped to vocabulary ids a batch of revdocs
+    at a time and pooled with NumPy segment sums, so no per-token Python
+    arithmetic is done.  Tokens that aren't in the vocabulary are ignored and
+    revdocs with no known tokens get a zero vector.
+
+    Writes the vectors to '<output>.npy' (load it with
+    `np.load(path, mmap_mode='r')`) and one "<page_id>\t<page_name>" line
+    per row to '<output>.pages'.  Rows are in input order.  Input files are
+    processed in parallel.
+
+    Usage:
+        revdocs2docvecs (-h|--help)
+        revdocs2docvecs <vectors> <output> [<input-file>...]
+                        [--binary] [--weighting=<type>]
+                        [--batch-size=<num>] [--threads=<num>]
+                        [--float16] [--tmp-dir=<path>]
+                        [--verbose] [--debug]
+
+    Options:
+        -h --help            Print this documentation
+        <vectors>            The path to a gensim KeyedVectors file (".kv")
+                             or a word2vec formatted file
+        <output>             The path prefix to write the vectors and page
+                             index to
+        <input-file>         The path to a file of revdocs with "words" or
+                             structured 'transformed_content'.  Files with a
+                             ".revdocs" extension are read as binary revdocs.
+                             A 'manifest.json' written by `transform_content`
+                             is read as all of its shards. [default: <stdin>]
+        --binary             Read the binary word2vec format
+        --weighting=<type>   "mean" averages token vectors.  "tfidf" weights
+                             each token by its inverse document frequency in
+                             the input (an extra pass over the input files).
+                             [default: mean]
+        --batch-size=<num>   The number of revdocs to pool at once
+                             [default: 10000]
+        --threads=<num>      If a collection of files are provided, how many
+                             processor threads? [default: <cpu_count>]
+        --float16            Store the document vectors as float16
+        --tmp-dir=<path>     The directory to write per-file results to
+                             before they are concatenated [default: <tmp>]
+        --verbose            Print progress information to stderr.
+        --debug              Print debug logs.
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+from itertools import islice, repeat
+from multiprocessing import cpu_count
+
+import docopt
+import numpy as np
+import para
+
+from .revdoc_format import open_revdocs
+from .scheduler import largest_first
+from .shards import expand_manifests
+from .util import revdoc_tokens
+from .word2vec2gensim import load_keyed_vectors
+
+logger = logging.getLogger(__name__)
+
+WEIGHTINGS = {"mean", "tfidf"}
+FIELDS = {'page', 'transformed_content'}
+DEFAULT_BATCH_SIZE = 10000
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if len(args['<input-file>']) == 0:
+        paths = [sys.stdin.buffer]
+    else:
+        paths = expand_manifests(args['<input-file>'])
+
+    weighting = args['--weighting']
+    if weighting not in WEIGHTINGS:
+        raise RuntimeError("Unknown weighting {0}".format(weighting))
+    if weighting == "tfidf" and len(args['<input-file>']) == 0:
+        raise RuntimeError("'tfidf' needs <input-file>s to read twice")
+
+    if args['--threads'] == "<cpu_count>":
+        threads = cpu_count()
+    else:
+        threads = int(args['--threads'])
+    tmp_dir = None if args['--tmp-dir'] == "<tmp>" else args['--tmp-dir']
+
+    logger.info("Loading vectors from {0}...".format(args['<vectors>']))
+    kv = load_keyed_vectors(args['<vectors>'], binary=args['--binary'])
+
+    revdocs2docvecs(
+        paths, kv, args['<output>'], weighting=weighting,
+        batch_size=int(args['--batch-size']), threads=threads,
+        dtype=np.float16 if args['--float16'] else np.float32,
+        tmp_dir=tmp_dir, verbose=bool(args['--verbose']))
+
+
+def revdocs2docvecs(paths, kv, output, weighting="mean",
+                    batch_size=DEFAULT_BATCH_SIZE, threads=1,
+                    dtype=np.float32, tmp_dir=None, verbose=False):
+    """
+    Writes pooled document vectors to `output + ".npy"` and their page ids
+    and names to `output + ".pages"`.  Each path is pooled by a separate
+    worker into a temporary file and the results are concatenated in input
+    order.  Returns the number of documents written.
+    """
+    if weighting == "tfidf":
+        weights = inverse_document_frequencies(
+            paths, kv, batch_size=batch_size, threads=threads)
+    else:
+        weights = None
+
+    with tempfile.TemporaryDirectory(prefix="revdocs2docvecs-",
+                                     dir=tmp_dir) as part_dir:
+        def process_path(item):
+            # Each batch's vectors are appended to a raw part file as soon as
+            # they are pooled, so a worker only holds one batch in memory.
+            i, path = item
+            part_path = os.path.join(part_dir, str(i))
+            rows = 0
+            with open_revdocs(path, fields=FIELDS) as f, \
+                    open(part_path + ".vectors", "wb") as part, \
+                    open(part_path + ".pages", "w") as pages:
+                for page_ids, page_names, vectors in pool_docs(
+                        f, kv, weights, batch_size):
+                    part.write(vectors.astype(dtype, copy=False).tobytes())
+                    rows += len(vectors)
+                    for page_id, page_name in zip(page_ids, page_names):
+                        pages.write("{0}\t{1}\n".format(page_id, page_name))
+                    if verbose:
+                        sys.stderr.write(".")
+                        sys.stderr.flush()
+            yield i, (part_path, rows)
+
+        items = largest_first(enumerate(paths), path=lambda item: item[1])
+        part_files = dict(para.map(process_path, items, mappers=threads))
+        if verbose:
+            sys.stderr.write("\n")
+        parts = [read_part(*part_files[i], kv.vector_size, dtype)
+                 for i in range(len(part_files))]
+
+        n = sum(len(part) for part in parts)
+        matrix = np.lib.format.open_memmap(
+            output + ".npy", mode="w+", dtype=dtype,
+            shape=(n, kv.vector_size))
+        start = 0
+        with open(output + ".pages", "w") as pages:
+            for i, part in enumerate(parts):
+                matrix[start:start + len(part)] = part
+                start += len(part)
+                with open(part_files[i][0] + ".pages") as f:
+                    for line in f:
+                        pages.write(line)
+        matrix.flush()
+        del matrix, parts
+
+    logger.info("Wrote {0} document vectors to {1}.npy".format(n, output))
+    return n
+
+
+def read_part(part_path, rows, dim, dtype):
+    """
+    Memory-maps the raw (rows, dim) matrix that a worker wrote.
+    """
+    if rows == 0:
+        return np.zeros((0, dim), dtype=dtype)
+    return np.memmap(part_path + ".vectors", dtype=dtype, mode='r',
+                     shape=(rows, dim))
+
+
+def read_batches(f, batch_size):
+    """
+    Yields lists of (page_id, page_name, tokens) for every `batch_size`
+    revdocs (JSON lines or decoded binary revdocs).
+    """
+    while True:
+        lines = list(islice(f, batch_size))
+        if len(lines) == 0:
+            break
+        batch = []
+        for line in lines:
+            rev_doc = json.loads(line) if isinstance(line, str) else line
+            batch.append((rev_doc['page']['id'], rev_doc['page']['page_name'],
+                          revdoc_tokens(rev_doc)))
+        yield batch
+
+
+def token_ids(docs_tokens, key_to_index):
+    """
+    Maps the tokens of a batch of documents to vocabulary ids in one pass.
+    Returns the ids of the known tokens and the index of the document that
+    each belongs to.
+    """
+    lengths = np.fromiter((len(tokens) for tokens in docs_tokens),
+                          dtype=np.int64, count=len(docs_tokens))
+    all_tokens = [token for tokens in docs_tokens for token in tokens]
+    ids = np.fromiter(map(key_to_index.get, all_tokens, repeat(-1)),
+                      dtype=np.int64, count=len(all_tokens))
+    docs = np.repeat(np.arange(len(docs_tokens)), lengths)
+    known = ids >= 0
+    return ids[known], docs[known]
+
+
+def pool_docs(f, kv, weights=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yields (page_ids, page_names, vectors) for each batch of revdocs in `f`.
+    """
+    for batch in read_batches(f, batch_size):
+        page_ids, page_names, docs_tokens = zip(*batch)
+        ids, docs = token_ids(docs_tokens, kv.key_to_index)
+        yield page_ids, page_names, pool(kv, ids, docs, len(batch), weights)
+
+
+def pool(kv, ids, docs, n, weights=None):
+    """
+    Returns an (n, dim) float32 array of the (weighted) mean of the vectors
+    of `ids` in each document.  `docs` must be sorted.
+    """
+    vectors = np.zeros((n, kv.vector_size), dtype=np.float32)
+    if len(ids) == 0:
+        return vectors
+
+    rows = kv.vectors[ids].astype(np.float32)
+    if weights is not None:
+        token_weights = weights[ids]
+        rows *= token_weights[:, None]
+    else:
+        token_weights = np.ones(len(ids), dtype=np.float32)
+
+    totals = np.bincount(docs, weights=token_weights, minlength=n)
+    counts = np.bincount(docs, minlength=n)
+    nonempty = np.flatnonzero(counts)
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    vectors[nonempty] = np.add.reduceat(rows, starts[nonempty])
+    pooled = totals[nonempty] > 0
+    vectors[nonempty[pooled]] /= totals[nonempty[pooled], None]
+    return vectors
+
+
+def inverse_document_frequencies(paths, kv, batch_size=DEFAULT_BATCH_SIZE,
+                                 threads=1):
+    """
+    Counts the documents that each vocabulary token appears in (in parallel
+    across paths) and returns smoothed idf weights:
+    `log((1 + n) / (1 + df)) + 1`.
+    """
+    vocab_size = len(kv.index_to_key)
+
+    def process_path(path):
+        document_frequencies = np.zeros(vocab_size, dtype=np.int64)
+        n = 0
+        with open_revdocs(path, fields=FIELDS) as f:
+            for batch in read_batches(f, batch_size):
+                ids, docs = token_ids([tokens for _, _, tokens in batch],
+                                      kv.key_to_index)
+                # Count each (document, token) pair once
+                pairs = np.unique(docs * vocab_size + ids)
+                document_frequencies += np.bincount(pairs % vocab_size,
+                                                    minlength=vocab_size)
+                n += len(batch)
+        yield n, document_frequencies
+
+    n = 0
+    document_frequencies = np.zeros(vocab_size, dtype=np.int64)
+    for path_n, path_frequencies in para.map(
+            process_path, largest_first(paths), mappers=threads):
+        n += path_n
+        document_frequencies += path_frequencies
+
+    return (np.log((1 + n) / (1 + document_frequencies)) + 1) \
+        .astype(np.float32)
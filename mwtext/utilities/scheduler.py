@@ -0,0 +1,204 @@
+"""
+Orders the input files of parallel jobs so that they finish together.
+
+:func:`para.map` puts its items on a shared queue that each worker takes
+its next item from when it becomes idle, so the order of the items is the
+order that they are started in.  When the largest file is started last, the
+other workers sit idle while it finishes.  :func:`plan_tasks` starts the
+largest files first and can split a large bz2 multistream dump (the
+``*-multistream*.xml*.bz2`` files with a ``*-multistream-index*.txt*.bz2``
+next to them) into sub-tasks of a range of its streams.  Any idle worker can
+take a sub-task, so one large file no longer holds up a whole run.
+
+A sub-task is read as the dump's <siteinfo> header (the first stream), its
+range of streams and a closing ``</mediawiki>`` tag, so it parses as a dump
+of its own.
+"""
+import bz2
+import io
+import os
+
+import mwcli.files
+
+READ_SIZE = 1 << 20
+CLOSING_TAG = "</mediawiki>\n"
+
+
+class Task:
+    """
+    A file or a range of the streams of a multistream dump file.
+
+    Args:
+        path (str): the path of the file
+        size (int): the (compressed) size of the file or range in bytes
+        part (int): the number of the range in the file or None if the
+            task is the whole file
+        start (int): the offset of the first stream of the range
+        end (int): the offset after the last stream of the range or None
+            for the end of the file
+    """
+    __slots__ = ('path', 'size', 'part', 'start', 'end')
+
+    def __init__(self, path, size, part=None, start=None, end=None):
+        self.path = path
+        self.size = size
+        self.part = part
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return "{0}({1!r}, {2}, part={3}, start={4}, end={5})".format(
+            self.__class__.__name__, self.path, self.size, self.part,
+            self.start, self.end)
+
+
+def file_size(path):
+    """
+    Returns the size of a file or 0 for an open file (e.g. <stdin>).
+    """
+    if isinstance(path, str) and os.path.exists(path):
+        return os.path.getsize(path)
+    else:
+        return 0
+
+
+def largest_first(items, path=lambda item: item):
+    """
+    Sorts `items` by the size of their file, largest first.  Ties keep
+    their order.
+    """
+    return sorted(items, key=lambda item: -file_size(path(item)))
+
+
+def multistream_index_path(path):
+    """
+    Returns the path of the index of a multistream dump file (e.g.
+    "enwiki-20240101-pages-articles-multistream-index1.txt-p1p41242.bz2" for
+    "enwiki-20240101-pages-articles-multistream1.xml-p1p41242.bz2") or None
+    if the file doesn't have one.
+    """
+    if not isinstance(path, str):
+        return None
+    directory, filename = os.path.split(path)
+    if "-multistream" not in filename or ".xml" not in filename or \
+       not filename.endswith(".bz2"):
+        return None
+    before, after = filename.rsplit("-multistream", 1)
+    index_filename = before + "-multistream-index" + \
+        after.replace(".xml", ".txt", 1)
+    index_path = os.path.join(directory, index_filename)
+    return index_path if os.path.exists(index_path) else None
+
+
+def read_stream_offsets(index_path):
+    """
+    Reads the sorted, distinct stream offsets from a multistream index of
+    "<offset>:<page_id>:<title>" lines.
+    """
+    offsets = set()
+    with mwcli.files.reader(index_path) as f:
+        for line in f:
+            offset, _ = line.split(":", 1)
+            offsets.add(int(offset))
+    return sorted(offsets)
+
+
+def split_offsets(offsets, size, split_size):
+    """
+    Groups the streams starting at `offsets` (the last of which ends at
+    `size`) into (start, end) ranges of at least `split_size` bytes.  The
+    last range ends at None -- the end of the file.
+    """
+    ranges = []
+    start = offsets[0]
+    for offset in offsets[1:]:
+        if offset - start >= split_size:
+            ranges.append((start, offset))
+            start = offset
+    if len(ranges) > 0 and size - start < split_size / 2:
+        # Merge a small remainder into the range before it
+        start, _ = ranges.pop()
+    ranges.append((start, None))
+    return ranges
+
+
+def plan_tasks(paths, split_size=None):
+    """
+    Returns a list of :class:`Task` for `paths`, largest first.  If
+    `split_size` is set, multistream dump files that are larger than it and
+    have an index are split into tasks of about `split_size` bytes.
+    """
+    tasks = []
+    for path in paths:
+        size = file_size(path)
+        index_path = multistream_index_path(path) \
+            if split_size is not None and size > split_size else None
+        offsets = read_stream_offsets(index_path) \
+            if index_path is not None else []
+        if len(offsets) < 2:
+            tasks.append(Task(path, size))
+            continue
+        for part, (start, end) in enumerate(
+                split_offsets(offsets, size, split_size)):
+            tasks.append(Task(path, (end or size) - start, part=part,
+                              start=start, end=end))
+    return sorted(tasks, key=lambda task: -task.size)
+
+
+class RangeReader(io.RawIOBase):
+    """
+    Reads the bytes of `f` from `start` to `end` (or the end of the file).
+    """
+    def __init__(self, f, start, end=None):
+        self.f = f
+        self.f.seek(start)
+        self.remaining = end - start if end is not None else None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer)
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        data = self.f.read(size)
+        buffer[:len(data)] = data
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+
+def read_header(path):
+    """
+    Decompresses only the first stream of a multistream dump file -- the
+    <mediawiki> tag and the <siteinfo>.
+    """
+    decompressor = bz2.BZ2Decompressor()
+    header = []
+    with open(path, "rb") as f:
+        while not decompressor.eof:
+            data = f.read(READ_SIZE)
+            if len(data) == 0:
+                break
+            header.append(decompressor.decompress(data))
+    return b"".join(header).decode('utf-8', errors='replace')
+
+
+def open_task(task):
+    """
+    Opens a task as a text file of XML.
+    """
+    if task.part is None:
+        return mwcli.files.reader(task.path)
+    streams = bz2.BZ2File(RangeReader(open(task.path, "rb"), task.start,
+                                      task.end))
+    text = io.TextIOWrapper(streams, encoding='utf-8', errors='replace')
+    if task.end is None:
+        # The last stream closes the <mediawiki> tag
+        return mwcli.files.concat(read_header(task.path), text)
+    else:
+        return mwcli.files.concat(read_header(task.path), text, CLOSING_TAG)
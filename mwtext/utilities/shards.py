@@ -0,0 +1,276 @@
+"""
+Writes revdocs into output files ("shards") that are rotated after a number
+of records or (uncompressed) bytes and describes them in a JSON manifest.
+
+Each worker of `transform_content` shards its own input, so every shard but
+the last of each input is about the same size.  The manifest lists each
+shard's path, record count, byte counts, page id range and SHA-256 checksum
+so that downstream jobs can split work evenly and check that nothing is
+missing or truncated.
+"""
+import bz2
+import gzip
+import hashlib
+import json
+import os
+
+import mwcli.files
+
+from .page_index import BlockWriter, index_path
+from .revdoc_format import EXTENSION, RevdocWriter, output_path
+
+MANIFEST_FILE = "manifest.json"
+# gzip headers get no timestamp so that rewriting an output reproduces its
+# checksum
+COMPRESSORS = {'bz2': lambda f: bz2.BZ2File(f, "wb"),
+               'gz': lambda f: gzip.GzipFile(fileobj=f, mode="wb", mtime=0)}
+
+
+class HashingWriter:
+    """
+    Passes writes through to `f` while hashing and counting them.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class CountingWriter:
+    """
+    Passes writes through to `f` while counting them.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        return self.f.write(data)
+
+
+def shard_path(path, output_dir, compression, binary=False, shard=None,
+               part=None):
+    """
+    Returns the path of an output file for an input file.  The output of a
+    part of an input (see :mod:`~mwtext.utilities.scheduler`) gets a
+    "-part<number>" suffix and shards get a "-<number>" suffix before the
+    output file's extension.
+    """
+    if binary:
+        new_path = output_path(path, output_dir, compression)
+    else:
+        new_path = mwcli.files.output_dir_path(path, output_dir, compression)
+    if shard is None and part is None:
+        return new_path
+    directory, filename = os.path.split(new_path)
+    if binary:
+        stem, extension = filename.rsplit("." + EXTENSION, 1)
+        extension = EXTENSION + extension
+    else:
+        stem, extension = filename.rsplit(".", 1)
+    if part is not None:
+        stem += "-part{0:04d}".format(part)
+    if shard is not None:
+        stem += "-{0:05d}".format(shard)
+    return os.path.join(directory, stem + "." + extension)
+
+
+class ShardWriter:
+    """
+    Args:
+        path (str): the input path that shards are named after
+        output_dir (str): the directory to write shards to
+        compression (str): "bz2", "gz" or anything else for none
+        binary (bool): write binary revdocs rather than JSON lines
+        max_records (int): start a new shard after this many records
+        max_bytes (int): start a new shard after this many uncompressed
+            bytes
+        index (bool): write each shard in blocks with a page index (see
+            :mod:`~mwtext.utilities.page_index`)
+        block_size (int): the number of records per block with `index`
+        part (int): the part of the input that is being written, if the
+            input was split into parts
+    """
+    def __init__(self, path, output_dir, compression, binary=False,
+                 max_records=None, max_bytes=None, index=False,
+                 block_size=None, part=None):
+        self.path = path
+        self.part = part
+        self.output_dir = output_dir
+        self.compression = compression if compression in COMPRESSORS \
+            else None
+        self.mwcli_compression = compression
+        self.binary = binary
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.sharded = max_records is not None or max_bytes is not None
+        self.index = index
+        self.block_size = block_size
+        self.shards = []
+        self.shard = None
+
+    def write(self, doc):
+        if self.shard is None:
+            self.open_shard()
+        shard = self.shard
+
+        if shard['blocks'] is not None:
+            shard['blocks'].start_record(
+                doc['page']['id'], doc['page']['page_name'], doc['id'])
+        if self.binary:
+            shard['writer'].write(doc)
+        else:
+            shard['counter'].write(json.dumps(doc).encode('utf-8') + b"\n")
+        if shard['blocks'] is not None:
+            shard['blocks'].end_record()
+
+        info = shard['info']
+        info['records'] += 1
+        page_id = doc['page']['id']
+        if info['min_page_id'] is None or page_id < info['min_page_id']:
+            info['min_page_id'] = page_id
+        if info['max_page_id'] is None or page_id > info['max_page_id']:
+            info['max_page_id'] = page_id
+
+        if (self.max_records is not None and
+                info['records'] >= self.max_records) or \
+           (self.max_bytes is not None and
+                shard['counter'].bytes >= self.max_bytes):
+            self.close_shard()
+
+    def open_shard(self):
+        path = shard_path(
+            self.path, self.output_dir, self.mwcli_compression,
+            binary=self.binary,
+            shard=len(self.shards) if self.sharded else None,
+            part=self.part)
+        hashing = HashingWriter(open(path, "wb"))
+        if self.index:
+            blocks = BlockWriter(hashing, self.compression,
+                                 block_size=self.block_size)
+            output = blocks
+        else:
+            blocks = None
+            output = COMPRESSORS[self.compression](hashing) \
+                if self.compression is not None else hashing
+        counter = CountingWriter(output)
+        writer = RevdocWriter(counter) if self.binary else None
+        self.shard = {
+            'path': path, 'hashing': hashing, 'output': output,
+            'blocks': blocks, 'counter': counter, 'writer': writer,
+            'info': {'path': os.path.basename(path), 'input': self.path,
+                     'part': self.part, 'records': 0,
+                     'min_page_id': None, 'max_page_id': None}}
+
+    def close_shard(self):
+        shard = self.shard
+        shard['output'].close()
+        if shard['output'] is not shard['hashing']:
+            shard['hashing'].close()
+
+        info = shard['info']
+        info['bytes'] = shard['hashing'].bytes
+        info['uncompressed_bytes'] = shard['counter'].bytes
+        info['sha256'] = shard['hashing'].sha256.hexdigest()
+        if shard['blocks'] is not None:
+            page_index = shard['blocks'].page_index(
+                shard['path'], format="binary" if self.binary else "json",
+                fields=shard['writer'].fields if self.binary else None)
+            page_index.save(index_path(shard['path']))
+            info['index'] = os.path.basename(index_path(shard['path']))
+        self.shards.append(info)
+        self.shard = None
+
+    def close(self):
+        """
+        Closes the current shard and returns the list of shard descriptions.
+        An input with no records still gets one (empty) output file.
+        """
+        if self.shard is None and len(self.shards) == 0:
+            self.open_shard()
+        if self.shard is not None:
+            self.close_shard()
+        return self.shards
+
+
+def write_manifest(output_dir, shards, format="json", compression=None):
+    manifest = {'format': format, 'compression': compression,
+                'records': sum(shard['records'] for shard in shards),
+                'shards': shards}
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path):
+    """
+    Reads a manifest (or the manifest in a directory) and returns it with
+    the path of each shard made absolute.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_FILE)
+    with open(path) as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(os.path.abspath(path))
+    for shard in manifest['shards']:
+        shard['path'] = os.path.join(directory, shard['path'])
+    return manifest
+
+
+def verify_manifest(manifest, checksums=False):
+    """
+    Returns a list of problems with the shards of a manifest: missing files,
+    unexpected sizes and (if `checksums`) SHA-256 mismatches.
+    """
+    problems = []
+    for shard in manifest['shards']:
+        if not os.path.exists(shard['path']):
+            problems.append("{0} is missing".format(shard['path']))
+            continue
+        size = os.path.getsize(shard['path'])
+        if size != shard['bytes']:
+            problems.append("{0} has {1} bytes but should have {2}"
+                            .format(shard['path'], size, shard['bytes']))
+        elif checksums:
+            sha256 = hashlib.sha256()
+            with open(shard['path'], "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha256.update(chunk)
+            if sha256.hexdigest() != shard['sha256']:
+                problems.append("{0} doesn't match its checksum"
+                                .format(shard['path']))
+    return problems
+
+
+def expand_manifests(paths):
+    """
+    Replaces any manifest (or directory with a manifest) in `paths` with
+    the paths of its shards in order.  Raises a RuntimeError if a shard is
+    missing or has the wrong size.
+    """
+    expanded = []
+    for path in paths:
+        if os.path.basename(path) == MANIFEST_FILE or (
+                os.path.isdir(path) and
+                os.path.exists(os.path.join(path, MANIFEST_FILE))):
+            manifest = read_manifest(path)
+            problems = verify_manifest(manifest)
+            if len(problems) > 0:
+                raise RuntimeError("Incomplete shards in {0}: {1}"
+                                   .format(path, "; ".join(problems)))
+            expanded.extend(shard['path'] for shard in manifest['shards'])
+        else:
+            expanded.append(path)
+    return expanded
@@ -0,0 +1,158 @@
+"""
+Out-of-core shuffling and train/validation/test splitting of line corpora.
+
+Each line is hashed (with a seed) once.  Half of the hash decides which
+split the line belongs to and the other half gives it a position in a
+random order.  Lines are scattered by position into on-disk buckets that are
+small enough to sort in memory, so the whole corpus never needs to fit in
+RAM and the same seed always produces the same splits and order.  Identical
+lines always land in the same split, so duplicates can't leak from training
+data into held-out data.
+"""
+import hashlib
+import os
+import tempfile
+
+TRAIN = "train"
+DEFAULT_BUCKETS = 64
+
+
+def line_hash(line, seed=0):
+    """
+    Returns a (split_hash, order_hash) pair of 64-bit integers for `line`.
+    """
+    key = "{0}:{1}".format(seed, line).encode('utf-8')
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+
+
+def choose_split(split_hash, split_rates):
+    """
+    Picks a split for a line given its split hash and a list of
+    (split, rate) pairs for the held-out splits.  Lines not claimed by any
+    held-out split belong to :data:`TRAIN`.
+    """
+    threshold = 0
+    for split, rate in split_rates:
+        threshold += rate * 2 ** 64
+        if split_hash < threshold:
+            return split
+    return TRAIN
+
+
+class SplitWriter:
+    """
+    Writes lines straight to the output of their split without shuffling.
+    Behaves like a writable file: text is split into lines as it is
+    written, so it can stand in for the output of any line writer.
+
+    Args:
+        outputs (dict): a map from split names to writable files.  Must
+            include :data:`TRAIN`.
+        split_rates (list): (split, rate) pairs for the held-out splits
+        seed (str): seeds the split assignment
+    """
+    def __init__(self, outputs, split_rates=None, seed=0):
+        self.outputs = outputs
+        self.split_rates = split_rates or []
+        self.seed = seed
+        self.counts = {split: 0 for split in outputs}
+        self.partial_line = ""
+
+    def write(self, text):
+        lines = (self.partial_line + text).split("\n")
+        self.partial_line = lines.pop()
+        for line in lines:
+            self.write_line(line)
+
+    def write_line(self, line):
+        split_hash, _ = line_hash(line, self.seed)
+        split = choose_split(split_hash, self.split_rates)
+        self.outputs[split].write(line)
+        self.outputs[split].write("\n")
+        self.counts[split] += 1
+
+    def close(self):
+        if self.partial_line != "":
+            self.write_line(self.partial_line)
+            self.partial_line = ""
+
+
+class ShuffleWriter(SplitWriter):
+    """
+    Scatters lines into `buckets` temporary files per split and writes each
+    split out in a shuffled order on :func:`close`.  Each bucket is read
+    into memory on its own, so `buckets` should be large enough that
+    `corpus size / buckets` fits comfortably.
+
+    Args:
+        outputs (dict): a map from split names to writable files.  Must
+            include :data:`TRAIN`.
+        split_rates (list): (split, rate) pairs for the held-out splits
+        seed (str): seeds the split assignment and order
+        buckets (int): the number of on-disk buckets per split
+        tmp_dir (str): the directory to create buckets in
+    """
+    def __init__(self, outputs, split_rates=None, seed=0,
+                 buckets=DEFAULT_BUCKETS, tmp_dir=None):
+        super().__init__(outputs, split_rates=split_rates, seed=seed)
+        self.buckets = buckets
+        self.bucket_dir = tempfile.TemporaryDirectory(
+            prefix="mwtext-shuffle-", dir=tmp_dir)
+        self.bucket_files = {
+            split: [open(os.path.join(self.bucket_dir.name,
+                                      "{0}-{1}".format(split, i)),
+                         "w+", encoding="utf-8")
+                    for i in range(buckets)]
+            for split in outputs}
+
+    def write_line(self, line):
+        split_hash, order_hash = line_hash(line, self.seed)
+        split = choose_split(split_hash, self.split_rates)
+        # The top bits choose a bucket so that buckets are already in order
+        bucket = order_hash * self.buckets >> 64
+        f = self.bucket_files[split][bucket]
+        f.write("{0:016x}\t".format(order_hash))
+        f.write(line)
+        f.write("\n")
+        self.counts[split] += 1
+
+    def close(self):
+        super().close()
+        try:
+            for split, bucket_files in self.bucket_files.items():
+                output = self.outputs[split]
+                for f in bucket_files:
+                    f.seek(0)
+                    lines = f.readlines()
+                    f.close()
+                    lines.sort()
+                    for line in lines:
+                        output.write(line[17:])
+        finally:
+            for bucket_files in self.bucket_files.values():
+                for f in bucket_files:
+                    f.close()
+            self.bucket_dir.cleanup()
+
+
+def split_writer(output, held_out=None, shuffle=False, seed=0,
+                 buckets=DEFAULT_BUCKETS, tmp_dir=None):
+    """
+    Constructs a :class:`SplitWriter` (or :class:`ShuffleWriter` if
+    `shuffle`) that writes training lines to `output`.
+
+    Args:
+        held_out (list): (split, rate, file) triples for held-out splits
+    """
+    outputs = {TRAIN: output}
+    split_rates = []
+    for split, rate, f in held_out or []:
+        outputs[split] = f
+        split_rates.append((split, rate))
+
+    if shuffle:
+        return ShuffleWriter(outputs, split_rates=split_rates, seed=seed,
+                             buckets=buckets, tmp_dir=tmp_dir)
+    else:
+        return SplitWriter(outputs, split_rates=split_rates, seed=seed)
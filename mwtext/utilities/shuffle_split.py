@@ -0,0 +1,101 @@
+r"""
+``$ mwtext shuffle_split -h``
+::
+
+    Shuffles a line-based corpus (e.g. the output of `words2plaintext`) on
+    disk and optionally holds out validation and test splits.  Lines are
+    assigned to splits and ordered by a seeded hash, so the same seed always
+    produces the same output.
+
+    Usage:
+        shuffle_split (-h|--help)
+        shuffle_split [<input-file>...]
+                      [--validation=<path>] [--validation-rate=<prop>]
+                      [--test=<path>] [--test-rate=<prop>]
+                      [--no-shuffle] [--seed=<str>] [--buckets=<num>]
+                      [--tmp-dir=<path>]
+                      [--output=<path>] [--verbose] [--debug]
+
+    Options:
+        -h --help                 Print this documentation
+        <input-file>              The path to a file of lines
+                                  [default: <stdin>]
+        --validation=<path>       Write a validation split to this path
+        --validation-rate=<prop>  The proportion of lines to hold out for
+                                  validation [default: 0.01]
+        --test=<path>             Write a test split to this path
+        --test-rate=<prop>        The proportion of lines to hold out for
+                                  testing [default: 0.01]
+        --no-shuffle              Only split.  Keep lines in input order.
+        --seed=<str>              Seeds the split and the shuffle
+                                  [default: 0]
+        --buckets=<num>           The number of on-disk buckets to shuffle
+                                  each split in.  Each bucket is shuffled in
+                                  memory. [default: 64]
+        --tmp-dir=<path>          The directory to write buckets to
+                                  [default: <tmp>]
+        --output=<path>           Write the (training) lines to this path
+                                  [default: <stdout>]
+        --verbose                 Print progress information to stderr.
+        --debug                   Print debug logs.
+"""
+import logging
+import sys
+
+import docopt
+
+from .shuffle import split_writer
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    if len(args['<input-file>']) == 0:
+        input_files = [sys.stdin]
+    else:
+        input_files = [open(p) for p in args['<input-file>']]
+
+    if args['--output'] == "<stdout>":
+        output = sys.stdout
+    else:
+        output = open(args['--output'], "w")
+
+    writer = writer_from_args(args, output, shuffle=not args['--no-shuffle'])
+    shuffle_split(input_files, writer)
+    for f in writer.outputs.values():
+        if f is not sys.stdout:
+            f.close()
+
+
+def writer_from_args(args, output, shuffle):
+    """
+    Builds a :class:`~mwtext.utilities.shuffle.SplitWriter` from the
+    '--validation', '--test', '--seed', '--buckets' and '--tmp-dir' options.
+    """
+    held_out = []
+    for split in ("validation", "test"):
+        path = args['--' + split]
+        if path is not None:
+            held_out.append(
+                (split, float(args['--' + split + '-rate']), open(path, "w")))
+
+    tmp_dir = args['--tmp-dir'] if args['--tmp-dir'] != "<tmp>" else None
+
+    return split_writer(output, held_out=held_out, shuffle=shuffle,
+                        seed=args['--seed'], buckets=int(args['--buckets']),
+                        tmp_dir=tmp_dir)
+
+
+def shuffle_split(input_files, writer):
+    for input_file in input_files:
+        for line in input_file:
+            writer.write_line(line.rstrip("\n"))
+    writer.close()
+    logger.info("Lines per split: {0}".format(writer.counts))
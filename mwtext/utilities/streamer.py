@@ -0,0 +1,104 @@
+"""
+A :class:`mwcli.Streamer` for `transform_content` that can write binary
+revdocs (see :mod:`~mwtext.utilities.revdoc_format`), random-access page
+indexes (see :mod:`~mwtext.utilities.page_index`) and size-based shards
+(see :mod:`~mwtext.utilities.shards`).  Input files are processed largest
+first (see :mod:`~mwtext.utilities.scheduler`).
+"""
+import sys
+
+import docopt
+import mwcli
+import mwcli.files
+import para
+
+from .revdoc_format import RevdocWriter
+from .scheduler import open_task, plan_tasks
+from .shards import ShardWriter, write_manifest
+
+
+class RevdocStreamer(mwcli.Streamer):
+    """
+    Writes binary revdocs rather than JSON lines when run with
+    '--format=binary'.  Output files get a ".revdocs" extension (plus ".bz2"
+    or ".gz" with '--compress').  With '--index', each output file is
+    written in blocks of '--block-size' records with a page index next to it.
+    With '--shard-records' or '--shard-bytes', each input's output is split
+    into shards of about that size.  With '--split-size', large multistream
+    dumps are processed in parts of about that size and each part gets its
+    own output files.  Whenever output goes to a directory, a manifest of
+    all of the output files is written to it.
+    """
+    binary = False
+    index = False
+    block_size = None
+    shard_records = None
+    shard_bytes = None
+    split_size = None
+
+    @property
+    def sharded(self):
+        return self.shard_records is not None or self.shard_bytes is not None
+
+    def main(self, argv=None):
+        args = docopt.docopt(self.doc, argv=argv)
+        if args['--format'] not in ("json", "binary"):
+            raise RuntimeError("Unknown format {0}".format(args['--format']))
+        self.binary = args['--format'] == "binary"
+        self.index = bool(args['--index'])
+        self.block_size = int(args['--block-size'])
+        if args['--shard-records'] is not None:
+            self.shard_records = int(args['--shard-records'])
+        if args['--shard-bytes'] is not None:
+            self.shard_bytes = int(args['--shard-bytes'])
+        if args['--split-size'] is not None:
+            self.split_size = int(args['--split-size'])
+        if self.index and args['--output'] == "<stdout>":
+            raise RuntimeError("'--index' needs an '--output' directory")
+        if self.sharded and args['--output'] == "<stdout>":
+            raise RuntimeError("Sharding needs an '--output' directory")
+        super().main(argv=argv)
+
+    def run(self, paths, threads, kwargs, output_dir, compression, verbose):
+        # Tasks are started largest first.  Large multistream dumps are split
+        # into parts that idle workers can take (see scheduler.py).
+        tasks = plan_tasks(paths, split_size=self.split_size)
+        order = {path: i for i, path in enumerate(paths)}
+
+        def process_task(task):
+            f = open_task(task)
+            outputs = self.a2b(self.file_reader(f), verbose=verbose,
+                               **kwargs)
+
+            if output_dir is None:
+                yield from outputs
+            else:
+                writer = self.shard_writer(task, output_dir, compression)
+                for doc in outputs:
+                    writer.write(doc)
+                for shard in writer.close():
+                    yield (order[task.path], task.part or 0), shard
+
+        results = para.map(process_task, tasks, mappers=threads)
+        if output_dir is None:
+            if self.binary:
+                writer = RevdocWriter(sys.stdout.buffer)
+                for doc in results:
+                    writer.write(doc)
+                sys.stdout.buffer.flush()
+            else:
+                for doc in results:
+                    self.line_writer(doc, sys.stdout)
+        else:
+            # Shards are listed in input order whichever worker finished first
+            shards = [shard for _, shard in
+                      sorted(results, key=lambda result: result[0])]
+            write_manifest(output_dir, shards,
+                           format="binary" if self.binary else "json",
+                           compression=compression)
+
+    def shard_writer(self, task, output_dir, compression):
+        return ShardWriter(
+            task.path, output_dir, compression, binary=self.binary,
+            max_records=self.shard_records, max_bytes=self.shard_bytes,
+            index=self.index, block_size=self.block_size, part=task.part)
@@ -0,0 +1,248 @@
+r"""
+``$ mwtext sweep_vectors -h``
+::
+
+    Searches fastText hyperparameters for `learn_vectors`.  Trials run
+    concurrently under a total CPU budget: up to '--parallel' trials (but no
+    more than '--cpus') run at once and split the '--cpus' fastText threads
+    between them, so "thread" can't be searched.  Every trial is
+    evaluated on a held-out split (e.g. from `words2plaintext
+    --validation`).  Writes a results table, the best model and the best
+    model's vectors to '--output-dir'.
+
+    The search space is a JSON object mapping fastText parameters (and
+    "qt_cutoff") to a list of values.  By default every combination is
+    tried.  With '--random', that many combinations are sampled instead and
+    a parameter may also be a range like {"min": 0.01, "max": 1.0,
+    "log": true} (add "int": true for integer ranges).
+
+    Usage:
+        sweep_vectors (-h|--help)
+        sweep_vectors <train> <validation> <space>
+                      [--random=<num>] [--seed=<num>]
+                      [--cpus=<num>] [--parallel=<num>]
+                      [--output-dir=<path>]
+                      [--format=<type>] [--float16]
+                      [--verbose] [--debug]
+
+    Options:
+        -h --help            Print this documentation
+        <train>              The path of a fasttext formatted training file
+        <validation>         The path of a fasttext formatted held-out file
+        <space>              The path of a JSON search space
+        --random=<num>       Sample this many combinations rather than
+                             trying all of them
+        --seed=<num>         Seeds random search [default: 0]
+        --cpus=<num>         The total number of fastText threads to use
+                             [default: <cpu_count>]
+        --parallel=<num>     The number of trials to run at once
+                             [default: 2]
+        --output-dir=<path>  The directory to write results to
+                             [default: sweep]
+        --format=<type>      The format of the best vectors (see
+                             `learn_vectors`) [default: text]
+        --float16            Store the best vectors as float16
+        --verbose            Print progress information to stderr.
+        --debug              Print debug logs.
+"""
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from multiprocessing import cpu_count
+
+import docopt
+import fasttext
+import numpy as np
+
+from .learn_vectors import FORMATS, train_model, write_vectors
+
+logger = logging.getLogger(__name__)
+
+QT_CUTOFF = "qt_cutoff"
+THREAD = "thread"
+RESULT_HEADERS = ("trial", "params", "examples", "precision", "recall",
+                  "seconds")
+VECTOR_PATHS = {"text": "vectors.vec", "binary": "vectors.bin",
+                "npy": "vectors", "gensim": "vectors.kv"}
+
+
+def main(argv=None):
+    args = docopt.docopt(__doc__, argv=argv)
+
+    logging.basicConfig(
+        level=logging.INFO if not args['--debug'] else logging.DEBUG,
+        format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
+    )
+
+    with open(args['<space>']) as f:
+        space = json.load(f)
+    if args['--random'] is not None:
+        trials = random_trials(space, int(args['--random']),
+                               seed=int(args['--seed']))
+    else:
+        trials = grid_trials(space)
+
+    if args['--cpus'] == "<cpu_count>":
+        cpus = cpu_count()
+    else:
+        cpus = int(args['--cpus'])
+    parallel = int(args['--parallel'])
+
+    format = args['--format']
+    if format not in FORMATS:
+        raise RuntimeError("Unknown format {0}".format(format))
+    if args['--float16'] and format not in ("npy", "gensim"):
+        raise RuntimeError("--float16 only works with 'npy' and 'gensim'")
+    dtype = np.float16 if args['--float16'] else np.float32
+
+    output_dir = args['--output-dir']
+    os.makedirs(output_dir, exist_ok=True)
+
+    results = sweep_vectors(args['<train>'], args['<validation>'], trials,
+                            output_dir, cpus=cpus, parallel=parallel,
+                            verbose=bool(args['--verbose']))
+    best = write_results(results, output_dir, format=format, dtype=dtype)
+    if best is not None:
+        logger.info("Best trial {0}: {1} (precision={2})".format(
+            best['trial'], json.dumps(best['params']), best['precision']))
+
+
+def grid_trials(space):
+    """
+    Returns a list of parameter dicts for every combination of the values in
+    `space`.
+    """
+    names = sorted(space)
+    for name in names:
+        if not isinstance(space[name], list):
+            raise ValueError("Grid search needs a list of values for {0}"
+                             .format(name))
+    return [dict(zip(names, values))
+            for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_trials(space, n, seed=0):
+    """
+    Returns `n` parameter dicts sampled from `space`.
+    """
+    rng = random.Random(seed)
+    return [{name: sample_value(space[name], rng) for name in sorted(space)}
+            for _ in range(n)]
+
+
+def sample_value(spec, rng):
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    elif spec.get('log', False):
+        value = math.exp(rng.uniform(math.log(spec['min']),
+                                     math.log(spec['max'])))
+    else:
+        value = rng.uniform(spec['min'], spec['max'])
+    return int(round(value)) if spec.get('int', False) else value
+
+
+def sweep_vectors(train_path, validation_path, trials, output_dir, cpus=1,
+                  parallel=1, verbose=False):
+    """
+    Trains and evaluates a model for each trial's params in forked worker
+    processes.  Returns a list of result dicts in trial order.
+    """
+    if any(THREAD in params for params in trials):
+        raise ValueError("'{0}' is set from --cpus and --parallel and can't "
+                         "be searched".format(THREAD))
+    processes, threads = divide_cpus(cpus, parallel, len(trials))
+    tasks = [(i, params, threads, train_path, validation_path, output_dir)
+             for i, params in enumerate(trials)]
+
+    results = []
+    context = multiprocessing.get_context("fork")
+    # A fresh process per trial returns each model's memory when it's done
+    with context.Pool(processes, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(run_trial, tasks):
+            results.append(result)
+            if verbose:
+                sys.stderr.write("Trial {0}: precision={1}\n".format(
+                    result['trial'], result['precision']))
+                sys.stderr.flush()
+
+    return sorted(results, key=lambda result: result['trial'])
+
+
+def divide_cpus(cpus, parallel, n_trials):
+    """
+    Returns the number of trials to run at once and the number of fastText
+    threads each gets so that no more than `cpus` threads run at once.
+    """
+    processes = max(1, min(parallel, cpus, n_trials))
+    return processes, max(1, cpus // processes)
+
+
+def run_trial(task):
+    trial, params, threads, train_path, validation_path, output_dir = task
+    fasttext_params = {THREAD: threads}
+    fasttext_params.update((name, value) for name, value in params.items()
+                           if name != QT_CUTOFF)
+
+    start = time.time()
+    try:
+        model = train_model(train_path, fasttext_params,
+                            params.get(QT_CUTOFF, 0))
+        examples, precision, recall = model.test(validation_path)
+    except RuntimeError as e:
+        # e.g. "Encountered NaN." when a learning rate is too high
+        logger.warning("Trial {0} failed: {1}".format(trial, e))
+        return {'trial': trial, 'params': params, 'examples': 0,
+                'precision': None, 'recall': None,
+                'seconds': time.time() - start}
+    model.save_model(trial_model_path(output_dir, trial))
+
+    return {'trial': trial, 'params': params, 'examples': examples,
+            'precision': precision, 'recall': recall,
+            'seconds': time.time() - start}
+
+
+def trial_model_path(output_dir, trial):
+    return os.path.join(output_dir, "trial-{0}.ftz".format(trial))
+
+
+def write_results(results, output_dir, format="text", dtype=np.float32):
+    """
+    Writes `results.tsv`, keeps the best trial's model as `best.ftz` (others
+    are removed) and writes its vectors.  Returns the best result (or None
+    if every trial failed).
+    """
+    with open(os.path.join(output_dir, "results.tsv"), "w") as f:
+        f.write("\t".join(RESULT_HEADERS) + "\n")
+        for result in results:
+            f.write("\t".join(
+                json.dumps(result[header]) if header == 'params'
+                else str(result[header]) for header in RESULT_HEADERS))
+            f.write("\n")
+
+    trained = [result for result in results
+               if result['precision'] is not None]
+    if len(trained) == 0:
+        return None
+    best = max(trained, key=lambda result: result['precision'])
+
+    for result in trained:
+        if result is not best:
+            os.remove(trial_model_path(output_dir, result['trial']))
+    best_path = os.path.join(output_dir, "best.ftz")
+    os.replace(trial_model_path(output_dir, best['trial']), best_path)
+
+    model = fasttext.load_model(best_path)
+    vectors_path = os.path.join(output_dir, VECTOR_PATHS[format])
+    if format in ("text", "binary"):
+        with open(vectors_path, "wb" if format == "binary" else "w") as f:
+            write_vectors(model, f, format=format, dtype=dtype)
+    else:
+        write_vectors(model, vectors_path, format=format, dtype=dtype)
+
+    return best
@@ -16,11 +16,85 @@ r"""
                           [--min-content-length=<chrs>]
                           [--siteinfo=<path>]
                           [--wiki-host=<url>]
+                          [--cache-dir=<path>] [--cache-ttl=<secs>]
+                          [--no-cache] [--offline]
+                          [--memoize] [--memo-size=<revs>]
+                          [--memo-store=<path>]
+                          [--incremental] [--token-deltas]
+                          [--latest-only]
+                          [--sample-rate=<prop>] [--sample-seed=<str>]
                           [--threads=<num>] [--output=<path>]
-                          [--compress=<type>] [--verbose] [--debug]
+                          [--compress=<type>] [--format=<type>]
+                          [--index] [--block-size=<recs>]
+                          [--shard-records=<num>] [--shard-bytes=<num>]
+                          [--split-size=<bytes>]
+                          [--verbose] [--debug]
 
     Options:
         -h --help           Print this documentation
+{transform_options}
+        --token-deltas      Include the tokens added and removed relative to
+                            the parent revision in 'tokens_added' and
+                            'tokens_removed'.  Implies '--incremental'.
+        --threads=<num>     If a collection of files are provided, how many
+                            processor threads?  Note that this actually uses
+                            subprocesses and will parallelize over CPU.
+                            The largest files are started first.
+                            [default: <cpu_count>]
+        --output=<path>     Write output to a directory with one output file
+                            per input path (or shard) and a 'manifest.json'
+                            listing them.  [default: <stdout>]
+        --compress=<type>   If set, output written to the output-dir will be
+                            compressed in this format: "bz2", "gz" or
+                            "json" for none. [default: bz2]
+        --format=<type>     "json" writes JSON lines.  "binary" writes the
+                            compact binary revdocs format (see
+                            `convert_revdocs`) to ".revdocs" files.
+                            [default: json]
+        --index             Write each output file in independently
+                            compressed blocks (bz2 multistream or gzip
+                            members) with a page index next to it (see
+                            `lookup_revdocs`).  Needs '--output'.
+        --block-size=<recs>  The number of records per block with '--index'
+                             [default: 100]
+        --shard-records=<num>  Split each output file into shards of this
+                               many records
+        --shard-bytes=<num>  Start a new shard once this many (uncompressed)
+                             bytes have been written to one.  Can be
+                             combined with '--shard-records'.
+        --split-size=<bytes>  Split bz2 multistream dump files that are larger
+                              than this into parts of about this many
+                              (compressed) bytes that are processed in
+                              parallel.  Needs the dump's multistream index
+                              next to it.  Each part gets its own output
+                              files.
+        --verbose           Print progress information to stderr.  Kind of a
+                            mess when running multi-threaded.
+        --debug             Print debug logs.
+"""
+import json
+import logging
+import re
+import sys
+
+import mwcli
+import mwcli.files
+import yamlconf
+
+from ..content_transformers import Wikitext2Words
+from ..content_transformers.incremental_words import \
+    IncrementalWikitext2Words
+from ..filter_functions import all_pages_and_revisions
+from ..site_cache import DEFAULT_CACHE_DIR, SiteCache, fetch_siteinfo
+from . import dump_reader
+from .memo import TransformMemo
+from .shards import COMPRESSORS
+from .streamer import RevdocStreamer
+from .util import (is_relevant_page, is_relevant_page_header,
+                   read_dump_siteinfo)
+
+# The options that `dump2plaintext` shares
+TRANSFORM_OPTIONS = r"""
         <content-transformer>  Path to a content transformer to construct and
                                execute.
         <input-file>        The path to a MediaWiki XML Dump file
@@ -33,6 +107,9 @@ r"""
                             to run against each revision to determine if it
                             should be processed. If set, only revisions for
                             which the function returns true will be included.
+                            The module may also contain an "include_page"
+                            that is run once per page before any of its
+                            revisions are read.
         --include-redirects  If set, include redirects
         --namespace=<id>    Limit processing to this namespace.  Can be
                             repeated to select for multiple namespaces.
@@ -44,49 +121,128 @@ r"""
                             document JSON encoded.
         --wiki-host=<url>   The hostname of the MediaWiki install to query for
                             siteinfo.  Note that this argument is ignored when
-                            '--siteinfo' is specified.
-        --threads=<num>     If a collection of files are provided, how many
-                            processor threads?  Note that this actually uses
-                            subprocesses and will parallelize over CPU
-                            [default: <cpu_count>]
-        --output=<path>     Write output to a directory with one output file
-                            per input path.  [default: <stdout>]
-        --compress=<type>   If set, output written to the output-dir will be
-                            compressed in this format. [default: bz2]
-        --verbose           Print progress information to stderr.  Kind of a
-                            mess when running multi-threaded.
-        --debug             Print debug logs.
+                            '--siteinfo' is specified.  If neither is set,
+                            namespaces are read from the <siteinfo> header of
+                            the first <input-file> (using cached namespace
+                            aliases if available).
+        --cache-dir=<path>  A directory to cache documents fetched from
+                            '--wiki-host' in.  Can be shared between runs
+                            and pre-populated with `mwtext cache_siteinfo`.
+                            ("$XDG_CACHE_HOME/mwtext" or
+                            "~/.cache/mwtext") [default: <default>]
+        --cache-ttl=<secs>  How long a cached document stays fresh
+                            [default: 604800]
+        --no-cache          Always fetch documents from '--wiki-host'
+        --offline           Only use cached documents.  Never query
+                            '--wiki-host'.
+        --memoize           Re-use the transformed content of an earlier
+                            revision of the same page with the same sha1
+                            (e.g. reverts in a full-history dump) rather
+                            than transforming it again.
+        --memo-size=<revs>  The maximum number of transformed revisions to
+                            hold in memory per page.  0 only uses
+                            '--memo-store'. [default: 64]
+        --memo-store=<path>  A sqlite database to share memoized content
+                             across pages, processes and runs.  Implies
+                             '--memoize'.
+        --incremental       Tokenize the revisions of a page incrementally,
+                            re-using the tokens of unchanged paragraphs from
+                            earlier revisions.  Only for Wikitext2Words.
+                            '--memoize' is ignored when this is set.
+        --latest-only       Only process the latest revision of each page.
+                            Earlier revisions in a full-history dump are
+                            streamed past without being parsed.
+        --sample-rate=<prop>  Only process this proportion of pages
+                              (in (0, 1], e.g. 0.01).  Pages are chosen by a
+                              stable hash of their id, so samples are
+                              reproducible.
+        --sample-seed=<str>   Seeds the sample.  Different seeds draw
+                              different samples. [default: 0]
 """
-import json
-import logging
-import re
-import sys
-
-import mwapi
-import mwcli
-import mwcli.files
-import yamlconf
-
-from ..filter_functions import all_pages_and_revisions
-from .util import get_siteinfo, is_relevant_page
+__doc__ = __doc__.replace("{transform_options}\n", TRANSFORM_OPTIONS)
 
 logger = logging.getLogger(__name__)
 REDIRECT_RE = re.compile("#redirect", re.I)
+# mwcli names output files after '--compress' and writes "json" uncompressed
+OUTPUT_COMPRESSIONS = set(COMPRESSORS) | {"json"}
 
 
 def transform_content(
         dump, transformer, include_criteria=None, allowed_namespaces=None,
         allowed_content_models=None, include_redirects=False,
-        min_content_length=None, verbose=False):
+        min_content_length=None, memo_size=None, memo_store=None,
+        incremental=False, token_deltas=False, latest_only=False,
+        sample_rate=None, sample_seed="0", verbose=False):
 
     namespace_id_map = {ns.id: ns.name for ns in dump.site_info.namespaces}
 
+    if incremental or token_deltas:
+        incremental = IncrementalWikitext2Words(transformer)
+        memo = None
+    elif memo_size is not None or memo_store is not None:
+        incremental = None
+        memo = TransformMemo(transformer,
+                             size=64 if memo_size is None else memo_size,
+                             store_path=memo_store)
+    else:
+        incremental = None
+        memo = None
+
+    try:
+        yield from _transform_pages(
+            dump, transformer, namespace_id_map, memo=memo,
+            incremental=incremental, token_deltas=token_deltas,
+            latest_only=latest_only, sample_rate=sample_rate,
+            sample_seed=sample_seed,
+            include_criteria=include_criteria,
+            allowed_namespaces=allowed_namespaces,
+            allowed_content_models=allowed_content_models,
+            include_redirects=include_redirects,
+            min_content_length=min_content_length, verbose=verbose)
+    finally:
+        if incremental is not None:
+            logger.info("Incremental tokenization: {0} characters tokenized"
+                        .format(incremental.tokenized_chars))
+        if memo is not None:
+            logger.info("Memoization stats: {0}".format(memo.stats()))
+            memo.close()
+
+
+def _transform_pages(
+        dump, transformer, namespace_id_map, memo=None, incremental=None,
+        token_deltas=False, latest_only=False, sample_rate=None,
+        sample_seed="0", include_criteria=None, allowed_namespaces=None,
+        allowed_content_models=None, include_redirects=False,
+        min_content_length=None, verbose=False):
+
     for page in dump:
         if verbose:
             sys.stderr.write(page.title + ": ")
             sys.stderr.flush()
 
-        for revision in page:
+        relevant_page = is_relevant_page_header(
+            page, include_criteria=include_criteria,
+            allowed_namespaces=allowed_namespaces,
+            sample_rate=sample_rate, sample_seed=sample_seed)
+        if not relevant_page:
+            # The page's revisions are streamed past without being parsed
+            if verbose:
+                sys.stderr.write("skipped\n")
+                sys.stderr.flush()
+            continue
+
+        if memo is not None:
+            memo.new_page()
+        if incremental is not None:
+            incremental.new_page()
+
+        if latest_only:
+            latest_revision = page.latest_revision()
+            revisions = [latest_revision] if latest_revision else []
+        else:
+            revisions = page
+
+        for revision in revisions:
             relevant = is_relevant_page(
                 page, revision, include_criteria=include_criteria,
                 allowed_namespaces=allowed_namespaces,
@@ -96,13 +252,19 @@ def transform_content(
             if not relevant:
                 continue
 
-            transformed_doc = transformer.transform(revision.text)
-            rev_doc = revision.to_json()
-            rev_doc['page'] = page.to_json()
-            rev_doc['page']['page_name'] = \
-                format_page_name(page, namespace_id_map)
-            del rev_doc['text']
-            rev_doc['transformed_content'] = transformed_doc
+            if incremental is not None:
+                transformed_doc, added, removed = \
+                    incremental.transform_revision(
+                        revision.text, revision.id, revision.parent_id)
+            elif memo is not None:
+                transformed_doc = memo.transform(revision.sha1, revision.text)
+            else:
+                transformed_doc = transformer.transform(revision.text)
+            rev_doc = format_rev_doc(
+                page, revision, transformed_doc, namespace_id_map)
+            if token_deltas:
+                rev_doc['tokens_added'] = added
+                rev_doc['tokens_removed'] = removed
             yield rev_doc
 
             if verbose:
@@ -114,6 +276,19 @@ def transform_content(
             sys.stderr.flush()
 
 
+def format_rev_doc(page, revision, transformed_doc, namespace_id_map):
+    rev_doc = revision.to_json()
+    rev_doc['page'] = page.to_json()
+    rev_doc['page']['page_name'] = format_page_name(page, namespace_id_map)
+    # Older versions of mwxml put text at the top level.  Newer versions
+    # keep it with each content slot.
+    rev_doc.pop('text', None)
+    for content in rev_doc.get('slots', {}).get('contents', {}).values():
+        content.pop('text', None)
+    rev_doc['transformed_content'] = transformed_doc
+    return rev_doc
+
+
 def format_page_name(page, namespace_id_map):
     if page.namespace == 0:
         return page.title
@@ -122,25 +297,57 @@ def format_page_name(page, namespace_id_map):
 
 
 def process_args(args):
+    if args['--compress'] not in OUTPUT_COMPRESSIONS:
+        raise RuntimeError("Unknown '--compress' {0}.  Expected one of {1}"
+                           .format(repr(args['--compress']),
+                                   sorted(OUTPUT_COMPRESSIONS)))
+
+    if args['--sample-rate'] is not None:
+        sample_rate = float(args['--sample-rate'])
+        if not 0 < sample_rate <= 1:
+            raise RuntimeError("'--sample-rate' must be in (0, 1], not {0}"
+                               .format(args['--sample-rate']))
+    else:
+        sample_rate = None
+
     try:
         Transformer = yamlconf.import_path(args['<content-transformer>'])
     except ImportError:
         Transformer = yamlconf.import_path(
             "mwtext.content_transformers." + args['<content-transformer>'])
+    if args['--no-cache']:
+        cache = None
+    else:
+        if args['--cache-dir'] == "<default>":
+            cache_dir = DEFAULT_CACHE_DIR
+        else:
+            cache_dir = args['--cache-dir']
+        cache = SiteCache(cache_dir, ttl=int(args['--cache-ttl']),
+                          offline=bool(args['--offline']))
+
     if args['--siteinfo'] is not None:
         siteinfo = json.load(open(args['--siteinfo']))['query']
+    elif args['--wiki-host'] is None and len(args['<input-file>']) > 0:
+        logger.info("Reading siteinfo from the header of {0}"
+                    .format(args['<input-file>'][0]))
+        siteinfo = read_dump_siteinfo(args['<input-file>'][0], cache=cache)
+    elif args['--wiki-host'] is None:
+        raise RuntimeError("Reading from <stdin> requires '--siteinfo' or " +
+                           "'--wiki-host'")
     else:
         logger.info("Gathering siteinfo from {0}".format(args['--wiki-host']))
-        session = mwapi.Session(
-            args['--wiki-host'], user_agent="mwtext transform_content")
-        siteinfo = get_siteinfo(session)
+        if cache is not None:
+            siteinfo = cache.get_siteinfo(args['--wiki-host'])
+        else:
+            siteinfo = fetch_siteinfo(args['--wiki-host'])
 
     kwarg_params = {}
     for kv in args['--param']:
         key, value = process_param(kv)
         kwarg_params[key] = value
 
-    transformer = Transformer.from_siteinfo(siteinfo, **kwarg_params)
+    transformer = Transformer.from_siteinfo(
+        siteinfo, cache=cache, **kwarg_params)
 
     if args['--include']:
         try:
@@ -165,13 +372,33 @@ def process_args(args):
 
     min_content_length = int(args['--min-content-length'])
 
+    if args['--memoize'] or args['--memo-store'] is not None:
+        memo_size = int(args['--memo-size'])
+        if memo_size < 0:
+            raise RuntimeError("'--memo-size' can't be negative, not {0}"
+                               .format(args['--memo-size']))
+    else:
+        memo_size = None
+
+    token_deltas = bool(args['--token-deltas'])
+    incremental = bool(args['--incremental']) or token_deltas
+    if incremental and not isinstance(transformer, Wikitext2Words):
+        raise RuntimeError("'--incremental' only works with Wikitext2Words")
+
     return {
         'transformer': transformer,
         'include_criteria': include_criteria,
         'include_redirects': include_redirects,
         'allowed_namespaces': allowed_namespaces,
         'allowed_content_models': allowed_content_models,
-        'min_content_length': min_content_length
+        'min_content_length': min_content_length,
+        'memo_size': memo_size,
+        'memo_store': args['--memo-store'],
+        'incremental': incremental,
+        'token_deltas': token_deltas,
+        'latest_only': bool(args['--latest-only']),
+        'sample_rate': sample_rate,
+        'sample_seed': args['--sample-seed']
     }
 
 
@@ -180,12 +407,12 @@ def process_param(kv):
     return key, json.loads(value_str)
 
 
-streamer = mwcli.Streamer(
+streamer = RevdocStreamer(
     __doc__,
     __name__,
     transform_content,
     process_args=process_args,
-    file_reader=mwcli.Streamer.read_xml,
+    file_reader=dump_reader.read_xml,
     line_writer=mwcli.Streamer.write_json
 )
 
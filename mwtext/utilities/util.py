@@ -1,6 +1,32 @@
+import hashlib
+import json
 import re
+import struct
+import sys
+from array import array
+from urllib.parse import urlparse
+
+import mwcli.files
 
 REDIRECT_RE = re.compile("#redirect", re.I)
+QID_RE = re.compile("^Q([0-9]+)$")
+
+QID_SET_MAGIC = b"MWQIDSET"
+QID_SET_HEADER = struct.Struct("<8sI")
+
+# MediaWiki core's canonical namespace names.  A dump's <siteinfo> only has
+# the local names.
+CANONICAL_NAMESPACE_NAMES = {
+    -2: "Media", -1: "Special", 1: "Talk", 2: "User", 3: "User talk",
+    4: "Project", 5: "Project talk", 6: "File", 7: "File talk",
+    8: "MediaWiki", 9: "MediaWiki talk", 10: "Template", 11: "Template talk",
+    12: "Help", 13: "Help talk", 14: "Category", 15: "Category talk"
+}
+# Aliases that MediaWiki core defines for every wiki.
+DEFAULT_NAMESPACE_ALIASES = [
+    {'id': 6, 'alias': "Image"},
+    {'id': 7, 'alias': "Image talk"}
+]
 
 
 def get_siteinfo(session):
@@ -10,6 +36,90 @@ def get_siteinfo(session):
     return doc['query']
 
 
+def siteinfo_from_dump(site_info, namespacealiases=None):
+    """
+    Builds a siteinfo document in the shape returned by the API from the
+    <siteinfo> header of an XML dump.  The header doesn't contain namespace
+    aliases, so core's defaults are used unless a table of
+    `namespacealiases` (e.g. from a cached siteinfo) is provided.
+    """
+    namespaces = {}
+    for namespace in site_info.namespaces or []:
+        namespace_doc = {'id': namespace.id, 'name': namespace.name,
+                         'case': namespace.case}
+        if namespace.id in CANONICAL_NAMESPACE_NAMES:
+            namespace_doc['canonical'] = CANONICAL_NAMESPACE_NAMES[namespace.id]
+        namespaces[str(namespace.id)] = namespace_doc
+
+    general = {'sitename': site_info.name, 'wikiid': site_info.dbname,
+               'base': site_info.base, 'generator': site_info.generator,
+               'case': site_info.case}
+    if site_info.base is not None:
+        general['server'] = "//" + urlparse(site_info.base).netloc
+
+    if namespacealiases is None:
+        namespacealiases = DEFAULT_NAMESPACE_ALIASES
+
+    return {'general': general, 'namespaces': namespaces,
+            'namespacealiases': list(namespacealiases)}
+
+
+def read_dump_siteinfo(path, cache=None):
+    """
+    Reads the <siteinfo> header of an XML dump file and converts it with
+    `siteinfo_from_dump()`.  If a :class:`mwtext.site_cache.SiteCache` is
+    provided and already holds the wiki's siteinfo, its namespace alias table
+    is used.  No network requests are made.
+    """
+    f = mwcli.files.reader(path)
+    try:
+        site_info = mwcli.Streamer.read_xml(f).site_info
+    finally:
+        f.close()
+    siteinfo = siteinfo_from_dump(site_info)
+
+    server = siteinfo['general'].get('server')
+    if cache is not None and server is not None:
+        cached_siteinfo = cache.peek(server, "siteinfo")
+        if cached_siteinfo is not None:
+            siteinfo['namespacealiases'] = \
+                cached_siteinfo['namespacealiases']
+
+    return siteinfo
+
+
+def in_sample(id, sample_rate, seed=0):
+    """
+    Deterministically decides whether `id` falls in a `sample_rate` sized
+    sample using a stable hash of the id and `seed`, so the same sample is
+    drawn on every run and machine.
+    """
+    key = "{0}:{1}".format(seed, id).encode('utf-8')
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'big') < sample_rate * 2 ** 64
+
+
+def is_relevant_page_header(page, include_criteria=None,
+                            allowed_namespaces=None, sample_rate=None,
+                            sample_seed=0):
+    """
+    Checks the parts of `is_relevant_page()` that only depend on the page so
+    that irrelevant pages can be skipped before any revisions are read.
+    `include_criteria` modules may optionally define `include_page(page)`.
+    """
+    if sample_rate is not None:
+        if not in_sample(page.id, sample_rate, sample_seed):
+            return False
+    if allowed_namespaces is not None:
+        if page.namespace not in allowed_namespaces:
+            return False
+    if include_criteria and hasattr(include_criteria, 'include_page'):
+        if not include_criteria.include_page(page):
+            return False
+
+    return True
+
+
 def is_relevant_page(page, revision, include_criteria=None,
                      allowed_content_models=None, allowed_namespaces=None,
                      include_redirects=False, min_content_length=None):
@@ -32,3 +142,74 @@ def is_relevant_page(page, revision, include_criteria=None,
             return False
 
     return True
+
+
+def qid_to_int(qid):
+    """
+    Converts a "Q123" style item identifier to its numeric id.  Returns None
+    for anything that isn't an item identifier.
+    """
+    match = QID_RE.match(qid or "")
+    return int(match.group(1)) if match is not None else None
+
+
+def write_qid_set(qids, f):
+    """
+    Writes a set of numeric item ids to a binary file as a sorted array of
+    little-endian uint32s behind a small header.
+    """
+    ids = array('I', sorted(set(qids)))
+    if sys.byteorder == "big":
+        ids.byteswap()
+    f.write(QID_SET_HEADER.pack(QID_SET_MAGIC, len(ids)))
+    f.write(ids.tobytes())
+
+
+def read_qid_set(path):
+    """
+    Reads a set of item ids from either a binary file written by
+    `write_qid_set()` or a plaintext file with one "Q123" per line.  Returns a
+    `frozenset` of numeric ids so that membership checks are O(1).
+    """
+    with open(path, 'rb') as f:
+        header = f.read(QID_SET_HEADER.size)
+        if header[:len(QID_SET_MAGIC)] == QID_SET_MAGIC:
+            _, count = QID_SET_HEADER.unpack(header)
+            ids = array('I')
+            ids.frombytes(f.read(count * ids.itemsize))
+            if sys.byteorder == "big":
+                ids.byteswap()
+            return frozenset(ids)
+        else:
+            content = header + f.read()
+            qids = (qid_to_int(line.strip())
+                    for line in content.decode('utf-8').splitlines())
+            return frozenset(id for id in qids if id is not None)
+
+
+def read_revdoc(line):
+    """
+    Returns the page name and tokens of a revdoc with Wikitext2Words or
+    Wikitext2Structured content.
+    """
+    rev_doc = json.loads(line) if isinstance(line, str) else line
+    return rev_doc['page']['page_name'], revdoc_tokens(rev_doc)
+
+
+def revdoc_tokens(rev_doc):
+    content = rev_doc['transformed_content']
+    if isinstance(content, dict):
+        return " ".join(paragraph['plaintext']
+                        for paragraph in content['paragraphs']).split()
+    else:
+        return content
+
+
+def read_plaintext(line):
+    """
+    Returns the first few words (as a name) and the tokens of a line of
+    fastText formatted plaintext.
+    """
+    tokens = [token for token in line.split()
+              if not token.startswith("__label__")]
+    return " ".join(tokens[:8]), tokens
@@ -0,0 +1,277 @@
+"""
+Nearest-neighbor indexes over word or document vectors.
+
+:class:`ExactIndex` scores every vector with blocked matrix products and
+keeps a running top-k per query with `np.argpartition`.
+:class:`IVFIndex` clusters the vectors with k-means and stores each
+cluster's vectors contiguously (an inverted list), so a query only scores
+the vectors of the `nprobe` clusters whose centroids are nearest to it.
+
+With the "cosine" metric vectors are normalized when the index is built and
+queries are normalized when searching, so scores are cosine similarities.
+With "dot" scores are raw dot products.  Indexes are saved as a directory of
+`.npy` files (plus a key per line), so opening one with `mmap=True` is
+instant and forked processes share a single page-cached copy.
+"""
+import json
+import os
+
+import numpy as np
+
+from .product_quantizer import assign, kmeans
+
+METRICS = {"cosine", "dot"}
+META_FILE = "meta.json"
+KEYS_FILE = "keys.txt"
+DEFAULT_BLOCK_SIZE = 65536
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors),
+                     where=norms > 0)
+
+
+def merge_top_k(ids, scores, new_ids, new_scores, k):
+    """
+    Merges (q, k) running top-k arrays with (q, m) new candidates.  Returns
+    the new (q, <=k) top-k arrays, unsorted.
+    """
+    ids = np.concatenate([ids, new_ids], axis=1)
+    scores = np.concatenate([scores, new_scores], axis=1)
+    if scores.shape[1] > k:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        ids = np.take_along_axis(ids, best, axis=1)
+        scores = np.take_along_axis(scores, best, axis=1)
+    return ids, scores
+
+
+def sort_top_k(ids, scores):
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return (np.take_along_axis(ids, order, axis=1),
+            np.take_along_axis(scores, order, axis=1))
+
+
+def empty_top_k(n):
+    return (np.empty((n, 0), dtype=np.int64),
+            np.empty((n, 0), dtype=np.float32))
+
+
+class ExactIndex:
+    """
+    Args:
+        vectors (np.ndarray): an (n, dim) array of (normalized, for
+            "cosine") vectors
+        keys (list(str)): the key of each vector
+        metric (str): "cosine" or "dot"
+    """
+    KIND = "exact"
+    FILES = ("vectors.npy",)
+
+    def __init__(self, vectors, keys, metric="cosine"):
+        if metric not in METRICS:
+            raise ValueError("Unknown metric {0}".format(metric))
+        self.vectors = vectors
+        self.keys = keys
+        self.metric = metric
+        self.key2id = {key: i for i, key in enumerate(keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, vectors, keys, metric="cosine"):
+        if metric == "cosine":
+            vectors = normalize(vectors)
+        return cls(np.asarray(vectors, dtype=np.float32), keys, metric)
+
+    def prepare(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return normalize(queries) if self.metric == "cosine" else queries
+
+    def search(self, queries, k=10, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Returns (q, k) arrays of the ids and scores of the `k` best vectors
+        for each query, best first.
+        """
+        queries = self.prepare(queries)
+        ids, scores = empty_top_k(len(queries))
+        for start in range(0, len(self.vectors), block_size):
+            block = np.asarray(self.vectors[start:start + block_size],
+                               dtype=np.float32)
+            block_scores = queries @ block.T
+            block_ids = np.broadcast_to(
+                np.arange(start, start + len(block)), block_scores.shape)
+            ids, scores = merge_top_k(ids, scores, block_ids, block_scores, k)
+        return sort_top_k(ids, scores)
+
+    def vectors_of(self, keys):
+        return np.asarray(self.vectors[[self.key2id[key] for key in keys]],
+                          dtype=np.float32)
+
+    def arrays(self):
+        return (self.vectors,)
+
+    def meta(self):
+        return {'kind': self.KIND, 'metric': self.metric}
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for filename, values in zip(self.FILES, self.arrays()):
+            np.save(os.path.join(path, filename), values)
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump(self.meta(), f)
+        with open(os.path.join(path, KEYS_FILE), "w") as f:
+            for key in self.keys:
+                f.write(key + "\n")
+
+    @classmethod
+    def from_arrays(cls, arrays, keys, meta):
+        vectors, = arrays
+        return cls(vectors, keys, meta['metric'])
+
+
+class IVFIndex(ExactIndex):
+    """
+    Args:
+        centroids (np.ndarray[float32]): an (nlist, dim) array of coarse
+            centroids
+        offsets (np.ndarray[int64]): the start of each list in `vectors`
+            (nlist + 1 entries)
+        vectors (np.ndarray): an (n, dim) array of vectors in list order
+        ids (np.ndarray[int64]): the id (position in `keys`) of each row of
+            `vectors`
+        keys (list(str)): the key of each id
+        metric (str): "cosine" or "dot"
+    """
+    KIND = "ivf"
+    FILES = ("centroids.npy", "offsets.npy", "vectors.npy", "ids.npy")
+
+    def __init__(self, centroids, offsets, vectors, ids, keys,
+                 metric="cosine"):
+        super().__init__(vectors, keys, metric)
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.row_of = None
+
+    @classmethod
+    def build(cls, vectors, keys, metric="cosine", nlist=1024,
+              iterations=20, sample=100000, seed=0):
+        """
+        Clusters (a sample of up to `sample` of) `vectors` into `nlist`
+        centroids and sorts the vectors into their nearest centroid's list.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if metric == "cosine":
+            vectors = normalize(vectors)
+        rng = np.random.default_rng(seed)
+        nlist = min(nlist, len(vectors))
+        if sample is not None and len(vectors) > sample:
+            training = vectors[np.sort(rng.choice(len(vectors), sample,
+                                                  replace=False))]
+        else:
+            training = vectors
+        centroids = kmeans(training, nlist, iterations=iterations, rng=rng)
+
+        lists, _ = assign(vectors, centroids)
+        ids = np.argsort(lists, kind='stable')
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=nlist), out=offsets[1:])
+        return cls(centroids, offsets, vectors[ids], ids, keys, metric)
+
+    def probe(self, queries, nprobe):
+        """
+        Returns a (q, nprobe) array of the lists nearest to each query.
+        """
+        distances = (self.centroids ** 2).sum(axis=1) - \
+            2 * queries @ self.centroids.T
+        nprobe = min(nprobe, len(self.centroids))
+        return np.argpartition(distances, nprobe - 1, axis=1)[:, :nprobe]
+
+    def search(self, queries, k=10, nprobe=8):
+        """
+        Returns (q, k) arrays of the ids and scores of the `k` best vectors
+        in each query's `nprobe` nearest lists, best first.  Queries that
+        probe the same list are scored against it together.  If fewer than
+        `k` vectors were scored, missing ids are -1.
+        """
+        queries = self.prepare(queries)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if len(queries) == 0:
+            return ids, scores
+
+        probes = self.probe(queries, nprobe)
+        pairs_queries = np.repeat(np.arange(len(queries)), probes.shape[1])
+        pairs_lists = probes.ravel()
+        order = np.argsort(pairs_lists, kind='stable')
+        pairs_queries = pairs_queries[order]
+        pairs_lists = pairs_lists[order]
+        boundaries = np.flatnonzero(np.diff(pairs_lists)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(pairs_lists)]])
+        for start, end in zip(starts, ends):
+            list_id = pairs_lists[start]
+            query_ids = pairs_queries[start:end]
+            begin, finish = self.offsets[list_id], self.offsets[list_id + 1]
+            if begin == finish:
+                continue
+            block = np.asarray(self.vectors[begin:finish], dtype=np.float32)
+            block_scores = queries[query_ids] @ block.T
+            block_ids = np.broadcast_to(self.ids[begin:finish],
+                                        block_scores.shape)
+            ids[query_ids], scores[query_ids] = merge_top_k(
+                ids[query_ids], scores[query_ids], block_ids, block_scores, k)
+        return sort_top_k(ids, scores)
+
+    def exact(self):
+        """
+        Returns an :class:`ExactIndex` over the same vectors (in list order)
+        for measuring recall.
+        """
+        return ExactIndex(self.vectors, [self.keys[i] for i in self.ids],
+                          self.metric)
+
+    def vectors_of(self, keys):
+        if self.row_of is None:
+            self.row_of = np.empty(len(self.ids), dtype=np.int64)
+            self.row_of[self.ids] = np.arange(len(self.ids))
+        rows = self.row_of[[self.key2id[key] for key in keys]]
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def arrays(self):
+        return (self.centroids, self.offsets, self.vectors, self.ids)
+
+    @classmethod
+    def from_arrays(cls, arrays, keys, meta):
+        centroids, offsets, vectors, ids = arrays
+        return cls(np.asarray(centroids), np.asarray(offsets), vectors, ids,
+                   keys, meta['metric'])
+
+
+INDEX_KINDS = {index.KIND: index for index in (ExactIndex, IVFIndex)}
+
+
+def load_index(path, mmap=True):
+    mmap_mode = 'r' if mmap else None
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    cls = INDEX_KINDS[meta['kind']]
+    arrays = [np.load(os.path.join(path, filename), mmap_mode=mmap_mode)
+              for filename in cls.FILES]
+    with open(os.path.join(path, KEYS_FILE)) as f:
+        keys = [line.rstrip("\n") for line in f]
+    return cls.from_arrays(arrays, keys, meta)
+
+
+def recall(expected_ids, ids):
+    """
+    Returns the mean proportion of each query's `expected_ids` that are in
+    its `ids`.
+    """
+    k = expected_ids.shape[1]
+    hits = sum(len(np.intersect1d(expected, found))
+               for expected, found in zip(expected_ids, ids))
+    return hits / (len(expected_ids) * k) if len(expected_ids) > 0 else 1.0
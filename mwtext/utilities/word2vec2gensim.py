@@ -3,12 +3,17 @@ r"""
 ::
 
     Converts a word2vec formatted file to a gensim-compatible binary
-    containing the same vectors.
+    containing the same vectors.  The input is streamed into a single
+    pre-allocated matrix, so at most '--limit' vectors are ever held in
+    memory.  The vectors are written to a separate ".vectors.npy" file so
+    that `KeyedVectors.load(<output>, mmap='r')` shares one page-cached copy
+    between processes.
 
     Usage:
         word2vec2gensim (-h|--help)
         word2vec2gensim <input> <output>
-                        [--limit=<num>]
+                        [--limit=<num>] [--binary]
+                        [--float16]
                         [--verbose] [--debug]
 
     Options:
@@ -17,17 +22,26 @@ r"""
                             be bz2 or gz compressed)
         <output>            The name of the main output file to write.
                             A second output file will be written with
-                            ".vectors.numpy" added to the filename provided.
+                            ".vectors.npy" added to the filename provided.
         --limit=<num>       Set a limit on the number of words that should be
                             loaded from the word2vec formatted file.  Unlimited
                             if not specified.
+        --binary            Read the binary word2vec format (e.g. from
+                            `learn_vectors --format=binary`)
+        --float16           Store vectors as float16.  (For smaller
+                            vectors, see `compress_vectors`.  gensim
+                            computes with the stored vectors directly, so
+                            they can't be scaled integers.)
         --verbose           Print progress information to stderr.  Kind of a
                             mess when running multi-threaded.
         --debug             Print debug logs.
 """
 import logging
+import sys
 
 import docopt
+import numpy as np
+from gensim import utils
 from gensim.models import KeyedVectors
 
 logger = logging.getLogger(__name__)
@@ -45,10 +59,137 @@ def main(argv=None):
     output_path = args['<output>']
     limit = int(args['--limit']) if args['--limit'] is not None else None
     verbose = args['--verbose']
+    dtype = np.float16 if args['--float16'] else np.float32
 
-    word2vec2gensim(input_path, limit, output_path, verbose)
+    word2vec2gensim(input_path, limit, output_path, verbose,
+                    binary=bool(args['--binary']), dtype=dtype)
 
 
-def word2vec2gensim(input_path, limit, output_path, verbose):
-    model = KeyedVectors.load_word2vec_format(input_path, limit=limit)
-    model.save(output_path)
+def word2vec2gensim(input_path, limit, output_path, verbose, binary=False,
+                    dtype=np.float32):
+    with utils.open(input_path, "rb") as f:
+        kv = read_word2vec(f, limit=limit, binary=binary, dtype=dtype,
+                           verbose=verbose)
+    save_keyed_vectors(kv, output_path)
+
+
+def read_word2vec(f, limit=None, binary=False, dtype=np.float32,
+                  verbose=False):
+    """
+    Reads up to `limit` vectors from a word2vec formatted file (opened in
+    binary mode) into a :class:`~gensim.models.KeyedVectors`.  Vectors are
+    converted to `dtype` (a float type) as they are read.
+    """
+    if not np.issubdtype(dtype, np.floating):
+        raise ValueError("KeyedVectors need float vectors, not {0}"
+                         .format(np.dtype(dtype)))
+    count, dim = (int(v) for v in f.readline().split())
+    if limit is not None:
+        count = min(count, limit)
+
+    kv = KeyedVectors(dim, count=0, dtype=dtype)
+    vectors = np.zeros((count, dim), dtype=dtype)
+    words = []
+    key_to_index = {}
+
+    if binary:
+        pairs = read_binary_vectors(f, dim)
+    else:
+        pairs = read_text_vectors(f, dim)
+
+    for word, vector in pairs:
+        if len(words) >= count:
+            break
+        if word in key_to_index:
+            logger.warning("Duplicate word {0!r}, keeping the first"
+                           .format(word))
+            continue
+        i = len(words)
+        vectors[i] = vector
+        key_to_index[word] = i
+        words.append(word)
+        if verbose and i % 10000 == 0:
+            sys.stderr.write(".")
+            sys.stderr.flush()
+
+    if verbose:
+        sys.stderr.write("\n")
+    if len(words) < count:
+        logger.warning("Expected {0} vectors, but only read {1}"
+                       .format(count, len(words)))
+        vectors = vectors[:len(words)]
+
+    kv.vectors = vectors
+    kv.index_to_key = words
+    kv.key_to_index = key_to_index
+    kv.next_index = len(words)
+    return kv
+
+
+def read_text_vectors(f, dim):
+    for line in f:
+        parts = line.decode('utf-8').rstrip().split(" ")
+        if len(parts) != dim + 1:
+            raise ValueError("Expected {0} values, but got {1} in {2!r}"
+                             .format(dim, len(parts) - 1, parts[0]))
+        yield parts[0], np.array(parts[1:], dtype=np.float32)
+
+
+def read_binary_vectors(f, dim, chunk_size=1 << 20):
+    """
+    Reads (word, vector) pairs from the body of a binary word2vec file.
+    Input is read in `chunk_size` blocks and each word ends at the first
+    space after the previous vector.
+    """
+    vector_size = dim * np.dtype('<f4').itemsize
+    buffer = b""
+    start = 0
+    eof = False
+    while True:
+        space = buffer.find(b" ", start)
+        end = space + 1 + vector_size
+        if space == -1 or len(buffer) < end:
+            if eof:
+                # Vectors may or may not end with a newline
+                word = buffer[start:space if space != -1 else None] \
+                    .lstrip(b"\n")
+                if space == -1 and len(word) == 0:
+                    return
+                raise ValueError("Unexpected end of file {0} {1!r}".format(
+                    "after" if space == -1 else "in", word))
+            chunk = f.read(chunk_size)
+            eof = chunk == b""
+            buffer = buffer[start:] + chunk
+            start = 0
+            continue
+        word = buffer[start:space].lstrip(b"\n")
+        yield word.decode('utf-8'), \
+            np.frombuffer(buffer, dtype='<f4', count=dim, offset=space + 1)
+        start = end
+
+
+def load_keyed_vectors(path, binary=False):
+    """
+    Memory-maps a KeyedVectors file (".kv") or reads a word2vec file.
+    """
+    if path.endswith(".kv"):
+        return KeyedVectors.load(path, mmap='r')
+    else:
+        with utils.open(path, "rb") as f:
+            return read_word2vec(f, binary=binary)
+
+
+def save_keyed_vectors(kv, path):
+    """
+    Saves `kv` with its arrays in separate `.npy` files so that it can be
+    loaded with `mmap='r'`.
+    """
+    kv.save(path, separately=['vectors'], ignore=['norms'])
+
+
+def get_vectors(kv, keys):
+    """
+    Returns a float32 matrix of the vectors of `keys`.
+    """
+    indexes = [kv.get_index(key) for key in keys]
+    return kv.vectors[indexes].astype(np.float32)
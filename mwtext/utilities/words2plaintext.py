@@ -10,30 +10,99 @@
         words2plaintext (-h|--help)
         words2plaintext [<input-file>...]
                         [--labels=<path>] [--title-lang=<l>] [--label-field=<k>]
+                        [--threads=<num>] [--unordered]
+                        [--external-join] [--buffer-size=<num>]
+                        [--buffer-bytes=<num>]
+                        [--shuffle] [--seed=<str>] [--buckets=<num>]
+                        [--validation=<path>] [--validation-rate=<prop>]
+                        [--test=<path>] [--test-rate=<prop>]
+                        [--tmp-dir=<path>]
+                        [--vocab=<path>] [--min-count=<num>]
                         [--output=<path>] [--verbose] [--debug]
 
   Options:
       -h --help         Print this documentation
       <input-file>      The path to a collection of revdocs containing
                         'transformed_content' in the form of "words".
+                        Files with a ".revdocs" extension are read as
+                        binary revdocs (see `convert_revdocs`).  A
+                        'manifest.json' written by `transform_content` is
+                        read as all of its shards.
       --labels=<path>   The path to a file containing label data for
-                        associating with text.  If not set, no labels will
-                        be included.
+                        associating with text or to a label index directory
+                        written by `build_label_index`.  If not set, no
+                        labels will be included.
       --title-lang=<lang>  The lang code to use to identify the title from
                            sitelinks in the labeled dataset.
       --label-field=<k>   The field to examine within the labels file
                           [default: taxo_labels]
+      --threads=<num>     The number of worker processes to decode and
+                          format revdocs with.  Workers share the label map
+                          with the main process.  [default: 1]
+      --unordered         Write lines as soon as a worker finishes them
+                          rather than in input order.
+      --external-join     Join revdocs and labels by sorting both on disk
+                          rather than holding the labels in memory.  Lines
+                          are written in page name order.  Requires a labels
+                          file (not an index directory).
+      --buffer-size=<num>  The number of records to sort in memory before
+                           spilling a run to disk with --external-join
+                           [default: 1000000]
+      --buffer-bytes=<num>  Also spill a run once its keys and payloads add
+                            up to about this many bytes (characters)
+                            [default: 268435456]
+      --shuffle           Shuffle the output lines on disk (see
+                          `shuffle_split`)
+      --seed=<str>        Seeds the shuffle and the held-out splits
+                          [default: 0]
+      --buckets=<num>     The number of on-disk buckets to shuffle in.  Each
+                          bucket is shuffled in memory. [default: 64]
+      --validation=<path>  Hold out a validation split to this path
+      --validation-rate=<prop>  The proportion of lines to hold out for
+                                validation [default: 0.01]
+      --test=<path>       Hold out a test split to this path
+      --test-rate=<prop>  The proportion of lines to hold out for testing
+                          [default: 0.01]
+      --tmp-dir=<path>    The directory to spill sorted runs and shuffle
+                          buckets to [default: <tmp>]
+      --vocab=<path>      A frequency table written by `count_vocab`.  If
+                          set, tokens that aren't in the table (or are
+                          seen less than '--min-count' times) are dropped.
+      --min-count=<num>   The minimum count of a token in '--vocab' to keep
+                          [default: 1]
       --output=<path>     A path to write output to [default: <stdout>]
 """
 import json
-import sys
 import logging
+import os
+import sys
+import multiprocessing
+import tempfile
+from itertools import islice
 
 import docopt
 import mwcli.files
 
+from .external_sort import (DEFAULT_BUFFER_BYTES, DEFAULT_BUFFER_SIZE,
+                            external_sort, merge_join)
+from .count_vocab import read_vocab
+from .label_index import LabelIndex, read_labeled_pages
+from .revdoc_format import open_revdocs
+from .shards import expand_manifests
+from .shuffle_split import writer_from_args
+
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1000
+PAGE_NAME_KEY = '"page_name": '
+CONTENT_KEY = '"transformed_content": '
+WORDS_FIELDS = {'page', 'transformed_content'}
+json_decoder = json.JSONDecoder()
+
+# Set before workers are forked so that they share the parent's copy
+_page_name2labels = None
+_vocab = None
+
 
 def main(argv=None):
     args = docopt.docopt(__doc__, argv=argv)
@@ -43,19 +112,10 @@ def main(argv=None):
         format='%(asctime)s %(levelname)s:%(name)s -- %(message)s'
     )
     if len(args['<input-file>']) == 0:
-        input_files = [sys.stdin]
-    else:
-        input_files = [open(p) for p in args['<input-file>']]
-
-    if args['--labels'] is not None:
-        title_lang = args['--title-lang']
-        label_field = args['--label-field']
-        logger.info("Reading label file {0}...".format(args['--labels']))
-        page_name2labels, label2ids = create_label_map(
-            mwcli.files.reader(args['--labels']), title_lang, label_field)
-        logger.debug("Label2ids: {0}".format(label2ids))
+        input_files = [open_revdocs(sys.stdin.buffer, fields=WORDS_FIELDS)]
     else:
-        page_name2labels = None
+        input_files = [open_revdocs(p, fields=WORDS_FIELDS)
+                       for p in expand_manifests(args['<input-file>'])]
 
     if args['--output'] == "<stdout>":
         output = sys.stdout
@@ -64,30 +124,193 @@ def main(argv=None):
 
     verbose = args['--verbose']
 
-    run(input_files, page_name2labels, output, verbose)
+    if args['--vocab'] is not None:
+        with open(args['--vocab']) as f:
+            vocab = read_vocab(f, min_count=int(args['--min-count']))
+        logger.info("Keeping {0} tokens from {1}"
+                    .format(len(vocab), args['--vocab']))
+    else:
+        vocab = None
+
+    if args['--shuffle'] or args['--validation'] is not None or \
+       args['--test'] is not None:
+        writer = writer_from_args(args, output, shuffle=args['--shuffle'])
+        outputs = writer.outputs.values()
+    else:
+        writer = output
+        outputs = [output]
 
+    if args['--external-join']:
+        if args['--labels'] is None:
+            raise RuntimeError("--external-join requires --labels")
+        if args['--tmp-dir'] == "<tmp>":
+            tmp_dir = None
+        else:
+            tmp_dir = args['--tmp-dir']
+        run_join(input_files, mwcli.files.reader(args['--labels']),
+                 args['--title-lang'], args['--label-field'], writer,
+                 verbose, buffer_size=int(args['--buffer-size']),
+                 buffer_bytes=int(args['--buffer-bytes']),
+                 tmp_dir=tmp_dir, vocab=vocab)
+    else:
+        if args['--labels'] is not None:
+            page_name2labels = read_label_index(
+                args['--labels'], args['--title-lang'],
+                args['--label-field'])
+            logger.debug("Label2ids: {0}"
+                         .format(page_name2labels.label2ids))
+        else:
+            page_name2labels = None
 
-def run(input_files, page_name2labels, output, verbose):
+        run(input_files, page_name2labels, writer, verbose,
+            threads=int(args['--threads']),
+            ordered=not args['--unordered'], vocab=vocab)
+
+    if writer is not output:
+        writer.close()
+        logger.info("Lines per split: {0}".format(writer.counts))
+    for f in outputs:
+        if f is not sys.stdout:
+            f.close()
+
+
+def run(input_files, page_name2labels, output, verbose, threads=1,
+        ordered=True, vocab=None):
+    if threads > 1:
+        run_parallel(input_files, page_name2labels, output, threads,
+                     ordered=ordered, vocab=vocab)
+        return
 
     for input_file in input_files:
         for line in input_file:
-            rev_doc = json.loads(line)
-            page_name = rev_doc['page']['page_name']
-            if page_name2labels is not None:
-                if page_name not in page_name2labels:
-                    logger.debug("Skipping {0} because it has no labels."
-                                 .format(page_name))
-                    continue
-                else:
-                    labels = page_name2labels[page_name]
-            else:
-                labels = []
-            words = rev_doc['transformed_content']
-            output.write(format_words_and_labels(words, labels))
+            formatted = process_line(line, page_name2labels, vocab=vocab)
+            if formatted is not None:
+                output.write(formatted)
+                output.write("\n")
+
+
+def run_join(input_files, labels_file, title_lang, label_field, output,
+             verbose, buffer_size=DEFAULT_BUFFER_SIZE,
+             buffer_bytes=DEFAULT_BUFFER_BYTES, tmp_dir=None, vocab=None):
+    """
+    Sorts the words of each revdoc and the labels of each page by page name
+    into runs of up to `buffer_size` records (or about `buffer_bytes`) on
+    disk and merges them.  Only one run's worth of records (and the map of
+    label ids) is held in memory.
+    """
+    with tempfile.TemporaryDirectory(prefix="words2plaintext-",
+                                     dir=tmp_dir) as run_dir:
+        label2ids = {}
+        labeled_pages = (
+            (page_name, json.dumps(label_ids))
+            for page_name, label_ids in read_labeled_pages(
+                labels_file, title_lang, label_field, label2ids))
+        sorted_labels = external_sort(labeled_pages, run_dir, buffer_size,
+                                      buffer_bytes)
+
+        words_docs = (
+            (page_name, json.dumps(words))
+            for input_file in input_files
+            for page_name, words in map(decode_words_doc, input_file))
+        sorted_words = external_sort(words_docs, run_dir, buffer_size,
+                                     buffer_bytes)
+
+        for words, labels in merge_join(sorted_words, sorted_labels):
+            if len(labels) == 0:
+                continue
+            # The last set of labels for a repeated page name wins
+            output.write(format_words_and_labels(
+                json.loads(words), json.loads(labels[-1]), vocab=vocab))
             output.write("\n")
 
+        logger.debug("Label2ids: {0}".format(label2ids))
+
+
+def run_parallel(input_files, page_name2labels, output, threads,
+                 ordered=True, vocab=None):
+    """
+    Splits the input lines into chunks and formats them in forked worker
+    processes.  The label index is inherited by the workers (its arrays are
+    never written to, so their pages stay shared) rather than pickled and
+    each worker returns one buffer per chunk.
+    """
+    global _page_name2labels, _vocab
+    _page_name2labels = page_name2labels
+    _vocab = vocab
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(threads) as pool:
+        chunks = read_chunks(input_files, CHUNK_SIZE)
+        if ordered:
+            buffers = pool.imap(process_chunk, chunks)
+        else:
+            buffers = pool.imap_unordered(process_chunk, chunks)
+        for buffer in buffers:
+            output.write(buffer)
+
+    _page_name2labels = None
+    _vocab = None
+
+
+def read_chunks(input_files, chunk_size):
+    for input_file in input_files:
+        while True:
+            chunk = list(islice(input_file, chunk_size))
+            if len(chunk) == 0:
+                break
+            yield chunk
+
+
+def process_chunk(lines):
+    formatted_lines = []
+    for line in lines:
+        formatted = process_line(line, _page_name2labels, vocab=_vocab)
+        if formatted is not None:
+            formatted_lines.append(formatted)
+            formatted_lines.append("\n")
+    return "".join(formatted_lines)
+
+
+def process_line(line, page_name2labels, vocab=None):
+    page_name, words = decode_words_doc(line)
+    if page_name2labels is not None:
+        if page_name not in page_name2labels:
+            logger.debug("Skipping {0} because it has no labels."
+                         .format(page_name))
+            return None
+        else:
+            labels = page_name2labels[page_name]
+    else:
+        labels = []
+    return format_words_and_labels(words, labels, vocab=vocab)
+
+
+def decode_words_doc(line):
+    """
+    Decodes only the page name and transformed content of a revdoc line
+    rather than the whole document.  Falls back to `json.loads()` if the line
+    wasn't written with json's default separators.  Revdocs read from binary
+    files are already decoded.
+    """
+    if isinstance(line, dict):
+        return line['page']['page_name'], line['transformed_content']
 
-def format_words_and_labels(words, labels):
+    name_start = line.find(PAGE_NAME_KEY)
+    content_start = line.rfind(CONTENT_KEY)
+    if name_start == -1 or content_start == -1:
+        rev_doc = json.loads(line)
+        return rev_doc['page']['page_name'], rev_doc['transformed_content']
+
+    page_name, _ = json_decoder.raw_decode(
+        line, name_start + len(PAGE_NAME_KEY))
+    words, _ = json_decoder.raw_decode(
+        line, content_start + len(CONTENT_KEY))
+    return page_name, words
+
+
+def format_words_and_labels(words, labels, vocab=None):
+    if vocab is not None:
+        words = [word for word in words if word in vocab]
     return " ".join(words) + format_labels(labels)
 
 
@@ -99,31 +322,25 @@ def format_labels(labels):
         return ""
 
 
+def read_label_index(path, title_lang, label_field):
+    """
+    Memory-maps a pre-built label index directory or builds an index from a
+    labels file.
+    """
+    if os.path.isdir(path):
+        logger.info("Loading label index {0}...".format(path))
+        return LabelIndex.load(path)
+    else:
+        logger.info("Reading label file {0}...".format(path))
+        return LabelIndex.from_labels_file(
+            mwcli.files.reader(path), title_lang, label_field)
+
+
 def create_label_map(f, title_lang, label_field):
     label2ids = {}
     page_name2labels = {}
-    for line in f:
-        ob = json.loads(line)
-
-        # Get title
-        if title_lang == "wikidata":
-            if ob['qid'] is None:
-                continue
-            else:
-                page_name = ob['qid']
-        else:
-            if title_lang not in ob['sitelinks']:
-                continue
-            else:
-                page_name = ob['sitelinks'][title_lang]
-
-        # Get labels
-        label_ids = set()
-        for label in ob[label_field]:
-            if label not in label2ids:
-                label2ids[label] = len(label2ids)
-            label_ids.add(label2ids[label])
-
+    for page_name, label_ids in read_labeled_pages(
+            f, title_lang, label_field, label2ids):
         page_name2labels[page_name] = set(label_ids)
 
     return page_name2labels, label2ids
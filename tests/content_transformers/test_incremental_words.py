@@ -0,0 +1,111 @@
+import json
+import os
+
+from mwtext.content_transformers import Wikitext2Words
+from mwtext.content_transformers.incremental_words import (
+    IncrementalWikitext2Words, segment_wikitext, strip_matches)
+
+local_dir = os.path.dirname(os.path.realpath(__file__))
+
+
+def load_albedo():
+    path = os.path.join(local_dir, "data", "39_Albedo_953762015.wikitext")
+    return open(path).read()
+
+
+def load_transformer():
+    siteinfo = json.load(open(os.path.join(local_dir, "enwiki_siteinfo.json")))
+    return Wikitext2Words.from_siteinfo(siteinfo)
+
+
+def test_segment_wikitext():
+    transformer = load_transformer()
+
+    text = "Foo\n\nBar {{template\n\n| a = b}}\n \n\n[[link\n\n]] baz"
+    assert segment_wikitext(text, transformer) == \
+        ["Foo", "\n\nBar {{template\n\n| a = b}}", "\n \n\n[[link\n\n]] baz"]
+
+    text = load_albedo()
+    segments = segment_wikitext(text, transformer)
+    assert len(segments) > 1
+    assert "".join(segments) == text
+
+
+def test_strip_matches():
+    # Only trying the positions where a strip pattern can start must find the
+    # same matches as `re.sub()`
+    transformer = load_transformer()
+    for text in [load_albedo().lower(),
+                 ";term\nfoo https://example.org and [//example.org] &amp; " +
+                 "''b'' <b>x</b> {| a |} [[category:foo]] [[file:bar]]"]:
+        assert [m.span() for m in strip_matches(text, transformer.strip_regex)] \
+            == [m.span() for m in transformer.strip_regex.finditer(text)]
+
+
+def test_incremental_matches_full():
+    transformer = load_transformer()
+    incremental = IncrementalWikitext2Words(transformer)
+
+    text = load_albedo()
+    revisions = [
+        text,
+        text + "\n\nVandalism is [[not\n\nfun]].",
+        text,
+        text.replace("\n\n", "\n\nNew paragraph.\n\n", 1),
+    ]
+
+    tokens, added, removed = incremental.transform_revision(revisions[0], 1)
+    assert tokens == transformer.transform(revisions[0])
+    assert added == tokens
+    assert removed == []
+
+    tokens, added, removed = incremental.transform_revision(
+        revisions[1], 2, 1)
+    assert tokens == transformer.transform(revisions[1])
+    assert added == ["vandalism", "is", "not", "fun"]
+    assert removed == []
+
+    tokens, added, removed = incremental.transform_revision(
+        revisions[2], 3, 2)
+    assert tokens == transformer.transform(revisions[2])
+    assert added == []
+    assert removed == ["vandalism", "is", "not", "fun"]
+
+    tokens, added, removed = incremental.transform_revision(
+        revisions[3], 4, 3)
+    assert tokens == transformer.transform(revisions[3])
+    assert added == ["new", "paragraph"]
+    assert removed == []
+
+
+def test_incremental_matches_full_unclosed():
+    transformer = load_transformer()
+    incremental = IncrementalWikitext2Words(transformer)
+
+    # Patterns like "<[^>]*>" and headers match across paragraph breaks
+    for text in ["Less than a < b.\n\nSome words > here.",
+                 "== Broken header\n\nMore words ==\n\nEnd.",
+                 "== h\n\n[[x]] ==\n\nEnd.",
+                 "[<x>[a\n\nb]]\n\nEnd."]:
+        assert incremental.transform(text) == transformer.transform(text)
+
+
+def test_incremental_matches_full_mismatched():
+    transformer = load_transformer()
+    incremental = IncrementalWikitext2Words(transformer)
+
+    # Mismatched or unclosed markup leaves the rest of the text in one piece
+    for text in ["Foo {{a ]]\n\nb}} bar\n\nbaz",
+                 "Foo [[a }}\n\nb]] bar\n\nbaz",
+                 "Foo ]] bar\n\n[[a\n\nb]]",
+                 "[[a|b [[c]]\n\n]] d",
+                 "<ref name=a/>x\n\ny</ref>",
+                 "<!-- a > {{b\n\nc}} -->\n\nd",
+                 "Foo <!-- a\n\nb",
+                 "{{a|}}\n\nb"]:
+        assert incremental.transform(text) == transformer.transform(text)
+
+    assert segment_wikitext("Foo {{a ]]\n\nb}} bar\n\nbaz", transformer) == \
+        ["Foo {{a ]]\n\nb}} bar\n\nbaz"]
+    assert segment_wikitext("Foo.\n\nBar.", transformer) == \
+        ["Foo.", "\n\nBar."]
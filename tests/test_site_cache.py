@@ -0,0 +1,48 @@
+import os
+
+from pytest import raises
+
+from mwtext.site_cache import CacheMiss, SiteCache, normalize_host
+
+
+def test_normalize_host():
+    assert normalize_host("//en.wikipedia.org") == "https://en.wikipedia.org"
+    assert normalize_host("https://En.Wikipedia.org/") == \
+        "https://en.wikipedia.org"
+    assert normalize_host("en.wikipedia.org") == "https://en.wikipedia.org"
+
+
+def test_get(tmpdir):
+    calls = []
+
+    def fetch(host):
+        calls.append(host)
+        return {'host': host, 'n': len(calls)}
+
+    cache = SiteCache(str(tmpdir))
+    assert cache.get("//en.wikipedia.org", "siteinfo", fetch) == \
+        {'host': "https://en.wikipedia.org", 'n': 1}
+    assert cache.get("https://en.wikipedia.org", "siteinfo", fetch)['n'] == 1
+    assert cache.get("https://cs.wikipedia.org", "siteinfo", fetch)['n'] == 2
+    assert cache.get("https://en.wikipedia.org", "siteinfo", fetch,
+                     refresh=True)['n'] == 3
+
+    # Expired entries are re-fetched
+    path = cache.path("https://en.wikipedia.org", "siteinfo")
+    os.utime(path, (0, 0))
+    assert cache.get("https://en.wikipedia.org", "siteinfo", fetch)['n'] == 4
+
+
+def test_offline(tmpdir):
+    def fetch(host):
+        raise AssertionError("Should not fetch when offline")
+
+    SiteCache(str(tmpdir)).put("https://en.wikipedia.org", "siteinfo",
+                               {'foo': 1})
+    cache = SiteCache(str(tmpdir), offline=True)
+    path = cache.path("https://en.wikipedia.org", "siteinfo")
+    os.utime(path, (0, 0))
+    assert cache.get("https://en.wikipedia.org", "siteinfo", fetch) == \
+        {'foo': 1}
+    with raises(CacheMiss):
+        cache.get("https://cs.wikipedia.org", "siteinfo", fetch)
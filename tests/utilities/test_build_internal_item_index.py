@@ -0,0 +1,91 @@
+import io
+import json
+
+from mwtext.utilities import dump_reader
+from mwtext.utilities.build_internal_item_index import (
+    extract_subclass_edges, subclass_closure, truthy_item_values)
+from mwtext.utilities.util import read_qid_set, write_qid_set
+
+
+def item_value_statement(value, rank="normal"):
+    return {"mainsnak": {"snaktype": "value", "property": "P279",
+                         "datavalue": {"type": "wikibase-entityid",
+                                       "value": {"entity-type": "item",
+                                                 "numeric-id": value,
+                                                 "id": "Q{0}".format(value)}}},
+            "type": "statement", "rank": rank}
+
+
+def item_page_xml(id, parents):
+    doc = {"id": "Q{0}".format(id), "type": "item",
+           "claims": {"P279": [item_value_statement(p) for p in parents]}}
+    return """
+    <page>
+      <title>Q{0}</title>
+      <ns>0</ns>
+      <id>{0}</id>
+      <revision>
+        <id>{0}</id>
+        <timestamp>2020-01-01T00:00:00Z</timestamp>
+        <contributor><ip>127.0.0.1</ip></contributor>
+        <model>wikibase-item</model>
+        <format>application/json</format>
+        <text>{1}</text>
+        <sha1>foo</sha1>
+      </revision>
+    </page>
+    """.format(id, json.dumps(doc).replace("&", "&amp;")
+               .replace("<", "&lt;"))
+
+
+def test_extract_subclass_edges():
+    dump = dump_reader.Dump.from_page_xml(io.StringIO(
+        item_page_xml(10, [1]) + item_page_xml(11, [10, 2])))
+    assert list(extract_subclass_edges(dump)) == [(10, 1), (11, 10), (11, 2)]
+
+
+def test_extract_subclass_edges_history():
+    # The last revision with item JSON is used, even if a later revision
+    # had its text removed
+    history = item_page_xml(12, [3]).replace(
+        "</page>", """
+      <revision>
+        <id>13</id>
+        <timestamp>2020-01-02T00:00:00Z</timestamp>
+        <contributor><ip>127.0.0.1</ip></contributor>
+        <model>wikibase-item</model>
+        <format>application/json</format>
+        <text deleted="deleted" />
+        <sha1>bar</sha1>
+      </revision>
+    </page>""")
+    dump = dump_reader.Dump.from_page_xml(io.StringIO(
+        history + item_page_xml(14, [12])))
+    assert list(extract_subclass_edges(dump)) == [(12, 3), (14, 12)]
+
+
+def test_truthy_item_values():
+    doc = {"claims": {"P279": [item_value_statement(1),
+                               item_value_statement(2, rank="preferred"),
+                               item_value_statement(3, rank="deprecated")]}}
+    assert list(truthy_item_values(doc, "P279")) == [2]
+    doc = {"claims": {"P279": [item_value_statement(1),
+                               item_value_statement(3, rank="deprecated")]}}
+    assert list(truthy_item_values(doc, "P279")) == [1]
+
+
+def test_subclass_closure():
+    subclasses = {1: [10, 12], 10: [11, 1], 2: [20]}
+    assert subclass_closure(subclasses, [1]) == {1, 10, 11, 12}
+
+
+def test_qid_set_roundtrip(tmpdir):
+    path = str(tmpdir.join("internal_items.bin"))
+    with open(path, "wb") as f:
+        write_qid_set([17442446, 4167410, 5, 5], f)
+    assert read_qid_set(path) == frozenset([5, 4167410, 17442446])
+
+    path = str(tmpdir.join("internal_items.txt"))
+    with open(path, "w") as f:
+        f.write("Q17442446\nQ4167410\n")
+    assert read_qid_set(path) == frozenset([4167410, 17442446])
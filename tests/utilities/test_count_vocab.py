@@ -0,0 +1,74 @@
+import bz2
+import gzip
+import io
+import json
+from collections import Counter
+
+from mwtext.utilities.count_min_sketch import (CountMinSketch, HeavyHitters,
+                                               token_hashes)
+from mwtext.utilities.count_vocab import (count_vocab, read_vocab,
+                                          write_vocab)
+from mwtext.utilities.util import read_plaintext, read_revdoc
+
+TOKENS = ["a"] * 50 + ["b"] * 20 + ["c"] * 5 + \
+    ["rare{0}".format(i) for i in range(200)]
+
+
+def test_token_hashes():
+    # Short tokens don't share either hash (adler32 clusters them)
+    tokens = ["w{0}".format(i) for i in range(1000)]
+    first, second = token_hashes(tokens)
+    assert len(set(first)) == len(tokens)
+    assert len(set(second)) == len(tokens)
+    first, second = token_hashes([])
+    assert len(first) == len(second) == 0
+
+
+def test_count_min_sketch():
+    sketch = CountMinSketch(width=64, depth=4)
+    sketch.add(TOKENS)
+    estimates = sketch.estimate(["a", "b", "c", "missing"])
+    # Estimates never under-count
+    assert all(estimate >= count for estimate, count
+               in zip(estimates, [50, 20, 5, 0]))
+
+    other = CountMinSketch(width=64, depth=4)
+    other.add(["a"] * 10)
+    sketch.merge(other)
+    assert sketch.estimate(["a"])[0] >= 60
+
+
+def test_heavy_hitters():
+    heavy_hitters = HeavyHitters(capacity=3, width=4096)
+    heavy_hitters.update(TOKENS)
+    other = HeavyHitters(capacity=3, width=4096)
+    other.update(["c"] * 100)
+    heavy_hitters.merge(other)
+    assert [token for token, _ in heavy_hitters.most_common()] == \
+        ["c", "a", "b"]
+
+
+def test_count_vocab():
+    lines = ["a a b __label__1\n", "b c\n", "a\n"]
+    counts = count_vocab([io.StringIO("".join(lines))], read_plaintext)
+    assert counts == Counter({'a': 3, 'b': 2, 'c': 1})
+
+    f = io.StringIO()
+    write_vocab(counts.most_common(), f, min_count=1)
+    assert f.getvalue() == "a\t3\nb\t2\nc\t1\n"
+    assert read_vocab(io.StringIO(f.getvalue()), min_count=2) == {"a", "b"}
+
+
+def test_count_vocab_compressed(tmpdir):
+    paths = []
+    for i, opener in enumerate([bz2.open, gzip.open]):
+        path = str(tmpdir.join("revdocs{0}.json.{1}".format(
+            i, "bz2" if opener is bz2.open else "gz")))
+        with opener(path, "wt") as f:
+            for tokens in [["a", "a", "b"], ["c", "a"]]:
+                f.write(json.dumps({'page': {'page_name': "Foo"},
+                                    'transformed_content': tokens}) + "\n")
+        paths.append(path)
+
+    counts = count_vocab(paths, read_revdoc, threads=2)
+    assert counts == Counter({'a': 6, 'b': 2, 'c': 2})
@@ -0,0 +1,50 @@
+import io
+from types import SimpleNamespace
+
+import docopt
+from pytest import raises
+
+from mwtext.utilities import dump2plaintext as d2p
+from mwtext.utilities import dump_reader, transform_content
+from mwtext.utilities.dump2plaintext import dump2plaintext
+
+from .test_dump_reader import PAGE_XML
+
+DUMP_XML = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <siteinfo>
+    <sitename>Wikipedia</sitename>
+    <dbname>enwiki</dbname>
+    <namespaces>
+      <namespace key="0" case="first-letter" />
+    </namespaces>
+  </siteinfo>
+""" + PAGE_XML + "</mediawiki>\n"
+
+transformer = SimpleNamespace(transform=lambda text: text.lower().split())
+
+
+def test_dump2plaintext():
+    dump = dump_reader.read_xml(io.StringIO(DUMP_XML))
+    assert list(dump2plaintext(dump, transformer)) == ["old", "new", "qux"]
+
+    dump = dump_reader.read_xml(io.StringIO(DUMP_XML))
+    lines = dump2plaintext(dump, transformer, page_name2labels={"Baz": [3]},
+                           latest_only=True)
+    assert list(lines) == ["qux __label__3"]
+
+
+def test_usage():
+    # Every transform option that dump2plaintext accepts is documented
+    args = docopt.docopt(d2p.__doc__, argv=["a.Transformer"])
+    assert args['--memo-size'] == "64"
+    assert args['--sample-seed'] == "0"
+    assert args['--cache-dir'] == "<default>"
+    assert args['--label-field'] == "taxo_labels"
+    assert "{transform_options}" not in d2p.__doc__
+
+
+def test_unknown_compress():
+    for doc in (d2p.__doc__, transform_content.__doc__):
+        args = docopt.docopt(doc, argv=["a.Transformer", "--compress=xz"])
+        with raises(RuntimeError):
+            transform_content.process_args(args)
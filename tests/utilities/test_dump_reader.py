@@ -0,0 +1,68 @@
+import io
+
+from mwtext.utilities import dump_reader
+
+PAGE_XML = """
+<page>
+  <title>Foo</title>
+  <ns>0</ns>
+  <id>1</id>
+  <revision>
+    <id>10</id>
+    <timestamp>2020-01-01T00:00:00Z</timestamp>
+    <contributor><username>Bar</username><id>2</id></contributor>
+    <model>wikitext</model>
+    <format>text/x-wiki</format>
+    <text bytes="3" xml:space="preserve">Old</text>
+    <sha1>aaa</sha1>
+  </revision>
+  <revision>
+    <id>11</id>
+    <parentid>10</parentid>
+    <timestamp>2020-01-02T00:00:00Z</timestamp>
+    <contributor><ip>127.0.0.1</ip></contributor>
+    <comment>Hi</comment>
+    <model>wikitext</model>
+    <format>text/x-wiki</format>
+    <text bytes="3" xml:space="preserve">New</text>
+    <sha1>bbb</sha1>
+  </revision>
+</page>
+<page>
+  <title>Baz</title>
+  <ns>0</ns>
+  <id>2</id>
+  <revision>
+    <id>20</id>
+    <timestamp>2020-01-03T00:00:00Z</timestamp>
+    <contributor><username>Bar</username><id>2</id></contributor>
+    <model>wikitext</model>
+    <format>text/x-wiki</format>
+    <text bytes="3" xml:space="preserve">Qux</text>
+    <sha1>ccc</sha1>
+  </revision>
+</page>
+"""
+
+
+def test_iteration():
+    dump = dump_reader.Dump.from_page_xml(io.StringIO(PAGE_XML))
+    pages = [(page.title, [(r.id, r.text) for r in page]) for page in dump]
+    assert pages == [("Foo", [(10, "Old"), (11, "New")]),
+                     ("Baz", [(20, "Qux")])]
+
+
+def test_latest_revision():
+    full_dump = dump_reader.Dump.from_page_xml(io.StringIO(PAGE_XML))
+    expected = [list(page)[-1].to_json() for page in full_dump]
+
+    dump = dump_reader.Dump.from_page_xml(io.StringIO(PAGE_XML))
+    latest = [page.latest_revision() for page in dump]
+    assert [revision.to_json() for revision in latest] == expected
+    assert latest[0].page.title == "Foo"
+    assert latest[0].user.text == "127.0.0.1"
+
+
+def test_skip_pages():
+    dump = dump_reader.Dump.from_page_xml(io.StringIO(PAGE_XML))
+    assert [page.title for page in dump] == ["Foo", "Baz"]
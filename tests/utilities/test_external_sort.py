@@ -0,0 +1,36 @@
+import json
+import os
+
+from mwtext.utilities.external_sort import external_sort, merge_join
+
+
+def test_external_sort(tmpdir):
+    records = [("b", "1"), ("a", "2"), ("c\t", "3"), ("b", "4"), ("a", "5")]
+    sorted_records = list(external_sort(records, str(tmpdir), buffer_size=2))
+    assert [payload for _, payload in sorted_records] == \
+        ["2", "5", "1", "4", "3"]
+    # Runs are cleaned up once they have been merged
+    assert os.listdir(str(tmpdir)) == []
+
+    assert list(external_sort([], str(tmpdir))) == []
+
+
+def test_external_sort_bytes(tmpdir):
+    records = [(str(i % 7), "x" * 100 + str(i)) for i in range(20)]
+    sorted_records = external_sort(records, str(tmpdir), buffer_bytes=250)
+    first_record = next(sorted_records)
+    # Runs are limited by size rather than by the (default) record count
+    assert len(os.listdir(str(tmpdir))) == 7
+    assert [first_record] + list(sorted_records) == \
+        sorted(((json.dumps(key), payload) for key, payload in records),
+               key=lambda record: record[0])
+
+
+def test_merge_join(tmpdir):
+    left = external_sort([("b", "l1"), ("a", "l2"), ("d", "l3"), ("b", "l4")],
+                         str(tmpdir), buffer_size=3)
+    right = external_sort([("c", "r1"), ("b", "r2"), ("b", "r3"), ("a", "r4")],
+                          str(tmpdir), buffer_size=3)
+    assert list(merge_join(left, right)) == \
+        [("l2", ["r4"]), ("l1", ["r2", "r3"]), ("l4", ["r2", "r3"]),
+         ("l3", [])]
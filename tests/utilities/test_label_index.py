@@ -0,0 +1,50 @@
+import io
+import json
+
+from mwtext.utilities.label_index import LabelIndex
+from mwtext.utilities.words2plaintext import create_label_map
+
+LABELS = [
+    {'qid': "Q1", 'sitelinks': {'en': "Foo"}, 'taxo_labels': ["a", "b"]},
+    {'qid': "Q2", 'sitelinks': {'en': "Bar"}, 'taxo_labels': ["c", "a", "a"]},
+    {'qid': "Q3", 'sitelinks': {}, 'taxo_labels': ["d"]},
+    {'qid': None, 'sitelinks': {'en': "Baz"}, 'taxo_labels': []},
+    {'qid': "Q4", 'sitelinks': {'en': "Foo"}, 'taxo_labels': ["c"]}
+]
+
+
+def labels_file():
+    return io.StringIO("".join(json.dumps(ob) + "\n" for ob in LABELS))
+
+
+def test_from_labels_file():
+    page_name2labels, label2ids = create_label_map(
+        labels_file(), "en", "taxo_labels")
+    label_index = LabelIndex.from_labels_file(
+        labels_file(), "en", "taxo_labels")
+
+    assert label_index.label2ids == label2ids
+    assert len(label_index) == len(page_name2labels) == 3
+    for page_name, labels in page_name2labels.items():
+        assert list(label_index[page_name]) == sorted(labels)
+    # The last set of labels for a repeated page wins
+    assert list(label_index["Foo"]) == [label2ids["c"]]
+    assert list(label_index["Baz"]) == []
+    assert "Q3" not in label_index
+    assert label_index.get("Q3") is None
+
+    label_index = LabelIndex.from_labels_file(
+        labels_file(), "wikidata", "taxo_labels")
+    assert list(label_index.get("Q3")) == [label_index.label2ids["d"]]
+
+
+def test_save_load(tmpdir):
+    page_name2labels, label2ids = create_label_map(
+        labels_file(), "en", "taxo_labels")
+    label_index = LabelIndex.from_label_map(page_name2labels, label2ids)
+    label_index.save(str(tmpdir.join("index")))
+
+    loaded = LabelIndex.load(str(tmpdir.join("index")))
+    assert loaded.label2ids == label2ids
+    for page_name, labels in page_name2labels.items():
+        assert set(loaded[page_name]) == labels
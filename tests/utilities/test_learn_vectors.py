@@ -0,0 +1,81 @@
+import io
+from types import SimpleNamespace
+
+import numpy as np
+from gensim.models import KeyedVectors
+
+from mwtext.utilities import learn_vectors
+from mwtext.utilities.learn_vectors import (word_vectors,
+                                            write_word2vec_binary,
+                                            write_word2vec_text)
+
+INPUT_MATRIX = np.arange(24, dtype=np.float32).reshape(6, 4)
+SUBWORDS = {"foo": [0], "bar": [1, 4, 5], "baz": [2, 3]}
+
+
+def get_word_vector(vector, word):
+    np.asarray(vector)[:] = INPUT_MATRIX[SUBWORDS[word]].mean(axis=0)
+
+
+def fake_model(quantized=False):
+    return SimpleNamespace(
+        is_quantized=lambda: quantized,
+        get_dimension=lambda: 4,
+        get_input_matrix=lambda: INPUT_MATRIX,
+        get_subwords=lambda word: ([], np.array(SUBWORDS[word])),
+        f=SimpleNamespace(getWordVector=get_word_vector))
+
+
+def test_word_vectors():
+    words = ["foo", "bar", "baz"]
+    expected = word_vectors(fake_model(quantized=True), words)
+    assert np.allclose(word_vectors(fake_model(), words), expected)
+    assert np.allclose(expected[1], INPUT_MATRIX[[1, 4, 5]].mean(axis=0))
+    assert word_vectors(fake_model(), []).shape == (0, 4)
+
+
+def test_learn_vectors(monkeypatch):
+    def decode_one(vector, word):
+        raise AssertionError("Vectors should be gathered in one batch")
+
+    def train_supervised(input_path, **params):
+        assert params == {'dim': 4}
+        model = fake_model()
+        model.get_words = lambda: ["</s>", "foo", "bar", "baz"]
+        model.f.getWordVector = decode_one
+        return model
+    monkeypatch.setattr(learn_vectors.fasttext, "train_supervised",
+                        train_supervised)
+    monkeypatch.setitem(SUBWORDS, "</s>", [0])
+
+    f = io.StringIO()
+    learn_vectors.learn_vectors("input.txt", {'dim': 4}, 0, f)
+    lines = f.getvalue().splitlines()
+    assert lines[0] == "4 4"
+    assert [line.split()[0] for line in lines[1:]] == \
+        ["</s>", "foo", "bar", "baz"]
+
+    # The cutoff keeps the largest vectors (and "</s>") in their order
+    f = io.StringIO()
+    learn_vectors.learn_vectors("input.txt", {'dim': 4}, 3, f)
+    lines = f.getvalue().splitlines()
+    assert lines[0] == "3 4"
+    assert [line.split()[0] for line in lines[1:]] == ["</s>", "bar", "baz"]
+    assert np.allclose([float(v) for v in lines[2].split()[1:]],
+                       INPUT_MATRIX[[1, 4, 5]].mean(axis=0))
+
+
+def test_write_word2vec(tmpdir):
+    words = ["foo", "bär"]
+    vectors = np.array([[0.5, -1.25], [3.0, 0.125]], dtype=np.float32)
+
+    f = io.StringIO()
+    write_word2vec_text(words, vectors, f)
+    assert f.getvalue() == "2 2\nfoo 0.5 -1.25\nbär 3.0 0.125\n"
+
+    path = str(tmpdir.join("vectors.bin"))
+    with open(path, "wb") as f:
+        write_word2vec_binary(words, vectors, f)
+    kv = KeyedVectors.load_word2vec_format(path, binary=True)
+    assert kv.index_to_key == words
+    assert np.array_equal(kv.vectors, vectors)
@@ -0,0 +1,55 @@
+from mwtext.content_transformers import Wikitext2Words
+from mwtext.utilities.memo import TransformMemo
+
+
+class CountingTransformer(Wikitext2Words):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._calls = 0
+
+    def transform(self, content):
+        self._calls += 1
+        return super().transform(content)
+
+
+def test_fingerprint():
+    assert Wikitext2Words(['file', 'category']).fingerprint() == \
+        Wikitext2Words({'category', 'file'}).fingerprint()
+    assert Wikitext2Words(['file', 'category']).fingerprint() != \
+        Wikitext2Words(['file', 'category'], tok_strategy='CJK').fingerprint()
+
+
+def test_memo(tmpdir):
+    store_path = str(tmpdir.join("memo.db"))
+    transformer = CountingTransformer(['file', 'category'])
+    memo = TransformMemo(transformer, size=2, store_path=store_path)
+
+    memo.new_page()
+    assert memo.transform("a", "Foo bar") == ["foo", "bar"]
+    assert memo.transform("b", "Foo bar baz") == ["foo", "bar", "baz"]
+    assert memo.transform("a", "Foo bar") == ["foo", "bar"]
+    assert memo.transform(None, "Foo") == ["foo"]
+    assert transformer._calls == 3
+    assert memo.stats()['hits'] == 1
+    memo.close()
+
+    transformer = CountingTransformer(['file', 'category'])
+    memo = TransformMemo(transformer, size=2, store_path=store_path)
+    memo.new_page()
+    assert memo.transform("b", "Foo bar baz") == ["foo", "bar", "baz"]
+    assert transformer._calls == 0
+    assert memo.stats() == \
+        {'hits': 0, 'store_hits': 1, 'misses': 0, 'hit_rate': 1.0}
+    memo.close()
+
+
+def test_memo_size_0(tmpdir):
+    store_path = str(tmpdir.join("memo.db"))
+    transformer = CountingTransformer(['file', 'category'])
+    memo = TransformMemo(transformer, size=0, store_path=store_path)
+    memo.new_page()
+    assert memo.transform("a", "Foo bar") == ["foo", "bar"]
+    assert memo.transform("a", "Foo bar") == ["foo", "bar"]
+    assert len(memo.lru) == 0
+    assert memo.stats()['store_hits'] == 1
+    memo.close()
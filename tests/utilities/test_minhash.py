@@ -0,0 +1,112 @@
+import bz2
+import io
+import json
+import random
+
+import numpy as np
+from pytest import raises
+
+from mwtext.utilities.dedup_minhash import dedup_minhash
+from mwtext.utilities.minhash import DuplicateFinder, MinHasher
+from mwtext.utilities.revdoc_format import RevdocWriter
+from mwtext.utilities.util import read_revdoc
+
+
+def random_docs(n, length=200, seed=0):
+    rng = random.Random(seed)
+    vocab = ["word{0}".format(i) for i in range(5000)]
+    return [[rng.choice(vocab) for _ in range(length)] for _ in range(n)]
+
+
+def test_signature():
+    minhasher = MinHasher(num_perm=64)
+    doc, other = random_docs(2)
+    assert (minhasher.signature(doc) == minhasher.signature(doc)).all()
+    assert (minhasher.signature(doc) == minhasher.signature(other)).mean() \
+        < 0.1
+    near_doc = doc[:100] + ["changed"] + doc[101:]
+    assert (minhasher.signature(doc) ==
+            minhasher.signature(near_doc)).mean() > 0.8
+    assert minhasher.signature(["short"]).dtype == np.uint32
+
+
+def test_duplicate_finder(tmpdir):
+    docs = random_docs(200)
+    # Near-duplicates of the first ten documents, plus two empty documents
+    docs += [doc[:50] + ["changed"] + doc[51:] for doc in docs[:10]]
+    docs += [list(docs[0]), [], []]
+
+    finder = DuplicateFinder(MinHasher(), threshold=0.8, tmp_dir=str(tmpdir))
+    for doc in docs:
+        finder.add(doc)
+    keep, duplicate_of, similarity = finder.find()
+    finder.close()
+
+    assert list(np.flatnonzero(~keep)) == list(range(200, 211))
+    assert list(duplicate_of[200:211]) == list(range(10)) + [0]
+    assert (similarity[200:211] >= 0.8).all()
+
+    finder = DuplicateFinder(MinHasher(), max_copies=2, tmp_dir=str(tmpdir))
+    for doc in docs:
+        finder.add(doc)
+    keep, _, _ = finder.find()
+    finder.close()
+    assert list(np.flatnonzero(~keep)) == [210]
+
+
+def test_duplicate_finder_chain(tmpdir):
+    # The middle document is a near-duplicate of both of the others, but they
+    # aren't near-duplicates of each other.  All three are one cluster.
+    first = ["word{0}".format(i) for i in range(0, 100)]
+    last = ["word{0}".format(i) for i in range(20, 120)]
+    middle = ["word{0}".format(i) for i in range(10, 110)]
+
+    minhasher = MinHasher(num_perm=256, shingle_size=1)
+    finder = DuplicateFinder(minhasher, bands=32, threshold=0.75,
+                             tmp_dir=str(tmpdir))
+    for doc in [first, last, middle]:
+        finder.add(doc)
+    keep, duplicate_of, similarity = finder.find()
+    finder.close()
+
+    assert (minhasher.signature(first) ==
+            minhasher.signature(last)).mean() < 0.75
+    assert list(keep) == [True, False, False]
+    assert list(duplicate_of) == [0, 0, 0]
+    assert similarity[0] == 1.0
+    assert (similarity[1:] >= 0.75).all()
+
+
+def test_bands_must_divide_num_perm():
+    with raises(ValueError):
+        DuplicateFinder(MinHasher(num_perm=100), bands=16)
+
+
+def test_dedup_minhash_revdocs(tmpdir):
+    docs = random_docs(20)
+    docs.append(list(docs[3]))
+    rev_docs = [{'id': i, 'page': {'id': i, 'page_name': "Page {0}".format(i)},
+                 'transformed_content': doc}
+                for i, doc in enumerate(docs)]
+
+    # The default output of transform_content is bz2 compressed JSON lines
+    json_path = str(tmpdir.join("revdocs.json.bz2"))
+    with bz2.open(json_path, "wt") as f:
+        for rev_doc in rev_docs[:10]:
+            f.write(json.dumps(rev_doc) + "\n")
+    binary_path = str(tmpdir.join("revdocs.revdocs.bz2"))
+    with bz2.open(binary_path, "wb") as f:
+        writer = RevdocWriter(f)
+        for rev_doc in rev_docs[10:]:
+            writer.write(rev_doc)
+
+    finder = DuplicateFinder(MinHasher(), tmp_dir=str(tmpdir))
+    output = io.StringIO()
+    report = io.StringIO()
+    dedup_minhash([json_path, binary_path], read_revdoc, finder, output,
+                  report=report)
+    finder.close()
+
+    kept = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert kept == rev_docs[:-1]
+    assert report.getvalue().splitlines()[1] == "20\t3\t1.000\tPage 20"
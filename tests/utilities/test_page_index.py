@@ -0,0 +1,65 @@
+import bz2
+import gzip
+import json
+
+from mwtext.utilities.page_index import BlockWriter, PageIndex, index_path
+from mwtext.utilities.revdoc_format import RevdocWriter, open_revdocs
+
+
+def rev_docs():
+    for page_id in range(1, 30):
+        for rev_id in range(3):
+            yield {'id': page_id * 10 + rev_id,
+                   'page': {'id': page_id,
+                            'page_name': "Page {0}".format(page_id)},
+                   'transformed_content': ["rev", str(rev_id)]}
+
+
+def write_indexed(path, compression, binary=False):
+    blocks = BlockWriter(open(path, "wb"), compression, block_size=4)
+    writer = RevdocWriter(blocks) if binary else None
+    for doc in rev_docs():
+        blocks.start_record(doc['page']['id'], doc['page']['page_name'],
+                            doc['id'])
+        if binary:
+            writer.write(doc)
+        else:
+            blocks.write(json.dumps(doc).encode('utf-8') + b"\n")
+        blocks.end_record()
+    blocks.close()
+    page_index = blocks.page_index(
+        path, format="binary" if binary else "json",
+        fields=writer.fields if binary else None)
+    page_index.save(index_path(path))
+    return PageIndex.load(index_path(path))
+
+
+def test_page_index(tmpdir):
+    expected = list(rev_docs())
+    for compression, opener in [("bz2", bz2.open), ("gz", gzip.open),
+                                (None, open)]:
+        path = str(tmpdir.join("revdocs.{0}".format(compression)))
+        page_index = write_indexed(path, compression)
+        assert len(page_index) == len(expected)
+        # The blocks are still one readable stream
+        with opener(path, "rt") as f:
+            assert [json.loads(line) for line in f] == expected
+
+        assert [doc['id'] for doc in page_index.find(page_id=7)] == \
+            [70, 71, 72]
+        assert [doc['id'] for doc in page_index.find(page_name="Page 12")] \
+            == [120, 121, 122]
+        assert list(page_index.find(rev_id=281)) == [expected[3 * 27 + 1]]
+        assert list(page_index.find(page_id=1000)) == []
+        assert list(page_index.find(page_name="Missing")) == []
+
+
+def test_binary_page_index(tmpdir):
+    path = str(tmpdir.join("revdocs.revdocs.bz2"))
+    page_index = write_indexed(path, "bz2", binary=True)
+    assert list(open_revdocs(path)) == list(rev_docs())
+    assert list(page_index.find(rev_id=42, fields={'id'})) == [{'id': 42}]
+    docs = list(page_index.find(page_name="Page 29",
+                                fields={'transformed_content'}))
+    assert [doc['transformed_content'] for doc in docs] == \
+        [["rev", "0"], ["rev", "1"], ["rev", "2"]]
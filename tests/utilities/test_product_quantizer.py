@@ -0,0 +1,60 @@
+import numpy as np
+
+from mwtext.utilities.product_quantizer import (CompressedVectors,
+                                                ProductQuantizer, kmeans,
+                                                reconstruction_error)
+
+
+def clustered_vectors(n=600, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(4, dim)) * 5
+    return (centers[rng.integers(0, 4, n)] +
+            rng.normal(scale=0.1, size=(n, dim))).astype(np.float32)
+
+
+def test_kmeans():
+    vectors = clustered_vectors(dim=2)
+    centroids = kmeans(vectors, 4, rng=np.random.default_rng(1))
+    distances = ((vectors[:, None] - centroids[None]) ** 2).sum(axis=2)
+    assert distances.min(axis=1).max() < 1
+
+
+def test_product_quantizer(tmpdir):
+    vectors = clustered_vectors()
+    words = ["w{0}".format(i) for i in range(len(vectors))]
+    quantizer = ProductQuantizer.fit(vectors, 4, clusters=16, sample=500)
+    assert quantizer.codebooks.shape == (4, 16, 2)
+
+    codes = quantizer.encode(vectors, batch_size=100)
+    assert codes.shape == (600, 4) and codes.dtype == np.uint8
+    decoded = quantizer.decode(codes)
+    report = reconstruction_error(quantizer, vectors, codes, batch_size=64)
+    assert report['vectors'] == 600
+    assert np.isclose(report['mse'], ((vectors - decoded) ** 2).mean())
+    assert report['cosine'] > 0.99
+
+    # Lookups on codes match products with the decoded vectors
+    queries = vectors[:3]
+    assert np.allclose(quantizer.dot(queries, codes), queries @ decoded.T,
+                       atol=1e-3)
+    assert np.allclose(quantizer.norms(codes),
+                       np.linalg.norm(decoded, axis=1))
+
+    path = str(tmpdir.join("compressed"))
+    CompressedVectors(words, codes, quantizer).save(path)
+    store = CompressedVectors.load(path)
+    assert isinstance(store.codes, np.memmap)
+    assert len(store) == 600 and "w5" in store
+    assert np.allclose(store.get_vectors(["w5", "w0"]), decoded[[5, 0]])
+    batches = list(store.decode(batch_size=250))
+    assert [len(batch_words) for batch_words, _ in batches] == [250, 250, 100]
+    assert np.allclose(np.vstack([v for _, v in batches]), decoded)
+
+    similar = store.most_similar("w0", topn=3)
+    assert len(similar) == 3 and "w0" not in dict(similar)
+    nearest = np.linalg.norm(vectors - vectors[0], axis=1).argsort()[1:]
+    assert similar[0][1] > 0.99
+    assert similar[0][0] in {words[i] for i in nearest[:100]}
+    cosine = decoded[0] @ decoded[1] / np.linalg.norm(decoded[[0, 1]],
+                                                      axis=1).prod()
+    assert np.isclose(store.similarity("w0", "w1"), cosine, atol=1e-5)
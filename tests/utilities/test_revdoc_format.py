@@ -0,0 +1,84 @@
+import io
+import json
+import os
+
+from mwtext.utilities.convert_revdocs import convert_revdocs
+from mwtext.utilities.revdoc_format import (RevdocReader, RevdocWriter,
+                                            is_binary_path, open_binary,
+                                            open_revdocs, output_path)
+from mwtext.utilities.words2plaintext import decode_words_doc
+
+REV_DOCS = [
+    {'id': 10, 'timestamp': "2020-01-01T00:00:00Z",
+     'user': {'id': 2, 'text': "Bär"}, 'minor': False, 'comment': None,
+     'page': {'id': 1, 'title': "Foo", 'namespace': 0, 'restrictions': [],
+              'page_name': "Foo"},
+     'transformed_content': ["foo", "bär", "", "日本"]},
+    {'id': 2 ** 70, 'parent_id': -3, 'minor': True,
+     'page': {'id': 2, 'page_name': "Bar"},
+     'transformed_content': {'paragraphs': [{'plaintext': "a b",
+                                             'score': 0.25}]},
+     'tokens_added': ["a\x00b", "c"], 'tokens_removed': [],
+     'new_field': [1, [2.5, None], "x"]}]
+
+
+def write_binary(docs, fields=None):
+    f = io.BytesIO()
+    writer = RevdocWriter(f) if fields is None else RevdocWriter(f, fields)
+    for doc in docs:
+        writer.write(doc)
+    return f.getvalue()
+
+
+def test_roundtrip():
+    data = write_binary(REV_DOCS)
+    assert list(RevdocReader(io.BytesIO(data))) == REV_DOCS
+    # Much smaller than JSON lines
+    assert len(data) < len("".join(json.dumps(doc) + "\n"
+                                   for doc in REV_DOCS))
+
+    # Fields missing from the schema are defined inline
+    data = write_binary(REV_DOCS, fields=["page"])
+    assert list(RevdocReader(io.BytesIO(data))) == REV_DOCS
+
+    reader = RevdocReader(io.BytesIO(data),
+                          fields={'page', 'transformed_content'})
+    docs = list(reader)
+    assert docs[0] == {'page': REV_DOCS[0]['page'],
+                       'transformed_content': ["foo", "bär", "", "日本"]}
+    assert decode_words_doc(docs[0]) == \
+        ("Foo", ["foo", "bär", "", "日本"])
+
+
+def test_open_revdocs(tmpdir):
+    data = write_binary(REV_DOCS)
+    assert list(open_revdocs(io.BytesIO(data))) == REV_DOCS
+    lines = "".join(json.dumps(doc) + "\n" for doc in REV_DOCS)
+    assert open_revdocs(io.BytesIO(lines.encode('utf-8'))).read() == lines
+    assert list(open_revdocs(io.StringIO(lines))) == lines.splitlines(True)
+
+    assert is_binary_path("enwiki.revdocs")
+    assert is_binary_path("/foo/enwiki.revdocs.bz2")
+    assert not is_binary_path("enwiki.json.bz2")
+    path = output_path("/dumps/enwiki-pages1.xml.bz2", str(tmpdir), "bz2")
+    assert path == str(tmpdir.join("enwiki-pages1.revdocs.bz2"))
+    assert output_path("/dumps/enwiki-articles27.xml-p1p41242.bz2", "out",
+                       "gz") == \
+        os.path.join("out", "enwiki-articles27.xml-p1p41242.revdocs.gz")
+
+    with open_binary(path, "wb") as f:
+        f.write(data)
+    assert list(open_revdocs(path, fields={'id'})) == \
+        [{'id': 10}, {'id': 2 ** 70}]
+
+
+def test_convert_revdocs():
+    lines = "".join(json.dumps(doc) + "\n" for doc in REV_DOCS)
+    binary = io.BytesIO()
+    assert convert_revdocs([io.StringIO(lines)], binary) == 2
+    assert binary.getvalue() == write_binary(REV_DOCS)
+
+    text = io.StringIO()
+    convert_revdocs([open_revdocs(io.BytesIO(binary.getvalue()))], text,
+                    to="json")
+    assert text.getvalue() == lines
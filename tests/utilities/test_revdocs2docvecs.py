@@ -0,0 +1,91 @@
+import io
+import json
+
+import numpy as np
+from gensim.models import KeyedVectors
+
+from mwtext.utilities.revdocs2docvecs import (inverse_document_frequencies,
+                                              revdocs2docvecs)
+
+WORDS = ["foo", "bar", "baz"]
+VECTORS = np.array([[1.0, 0.0], [0.0, 2.0], [4.0, 4.0]], dtype=np.float32)
+
+
+def keyed_vectors():
+    kv = KeyedVectors(2, count=0)
+    kv.add_vectors(WORDS, VECTORS)
+    return kv
+
+
+def rev_doc_line(page_id, page_name, content):
+    return json.dumps({'page': {'id': page_id, 'page_name': page_name},
+                       'transformed_content': content}) + "\n"
+
+
+def write_revdocs(path, docs):
+    with open(path, "w") as f:
+        for doc in docs:
+            f.write(rev_doc_line(*doc))
+
+
+DOCS1 = [(1, "One", ["foo", "bar", "unknown"]),
+         (2, "Two", ["unknown"]),
+         (3, "Three", {'paragraphs': [{'plaintext': "baz foo"},
+                                      {'plaintext': "foo"}]})]
+DOCS2 = [(4, "Four", ["bar", "bar"]),
+         (5, "Five", [])]
+
+
+def test_revdocs2docvecs(tmpdir):
+    paths = [str(tmpdir.join("1.json")), str(tmpdir.join("2.json"))]
+    write_revdocs(paths[0], DOCS1)
+    write_revdocs(paths[1], DOCS2)
+    output = str(tmpdir.join("docvecs"))
+
+    n = revdocs2docvecs(paths, keyed_vectors(), output, batch_size=2,
+                        threads=2, tmp_dir=str(tmpdir))
+    assert n == 5
+    vectors = np.load(output + ".npy", mmap_mode='r')
+    assert np.allclose(vectors, [[0.5, 1.0], [0, 0], [2.0, 4 / 3],
+                                 [0, 2.0], [0, 0]])
+    with open(output + ".pages") as f:
+        assert f.read() == "1\tOne\n2\tTwo\n3\tThree\n4\tFour\n5\tFive\n"
+
+    # An empty input contributes no rows
+    empty_path = str(tmpdir.join("empty.json"))
+    write_revdocs(empty_path, [])
+    assert revdocs2docvecs([paths[0], empty_path, paths[1]], keyed_vectors(),
+                           output + "3", batch_size=2) == 5
+    assert np.array_equal(np.load(output + "3.npy"), vectors)
+
+    # Batching doesn't change the result
+    revdocs2docvecs(paths, keyed_vectors(), output + "2", batch_size=1000,
+                    dtype=np.float16)
+    vectors2 = np.load(output + "2.npy")
+    assert vectors2.dtype == np.float16
+    assert np.allclose(vectors2, vectors, atol=1e-3)
+
+
+def test_tfidf(tmpdir):
+    path = str(tmpdir.join("1.json"))
+    write_revdocs(path, DOCS1 + DOCS2)
+    idf = inverse_document_frequencies([path], keyed_vectors(), batch_size=2)
+    # foo is in 2 of 5 documents, bar in 2 and baz in 1
+    assert np.allclose(idf, np.log(6 / np.array([3, 3, 2])) + 1)
+
+    output = str(tmpdir.join("docvecs"))
+    revdocs2docvecs([path], keyed_vectors(), output, weighting="tfidf")
+    vectors = np.load(output + ".npy")
+    weights = idf[[0, 2, 0]]
+    expected = (VECTORS[[0, 2, 0]] * weights[:, None]).sum(axis=0) / \
+        weights.sum()
+    assert np.allclose(vectors[2], expected)
+    assert np.allclose(vectors[3], VECTORS[1])
+
+
+def test_stdin(tmpdir):
+    output = str(tmpdir.join("docvecs"))
+    revdocs2docvecs([io.StringIO("".join(rev_doc_line(*doc)
+                                         for doc in DOCS2))],
+                    keyed_vectors(), output)
+    assert np.allclose(np.load(output + ".npy"), [[0, 2.0], [0, 0]])
@@ -0,0 +1,137 @@
+import bz2
+import json
+
+from mwtext.utilities import dump_reader
+from mwtext.utilities.scheduler import (largest_first, multistream_index_path,
+                                        open_task, plan_tasks)
+from mwtext.utilities.shards import expand_manifests, read_manifest
+from mwtext.utilities.streamer import RevdocStreamer
+
+HEADER = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <siteinfo>
+    <sitename>Wikipedie</sitename>
+    <dbname>cswiki</dbname>
+    <base>https://cs.wikipedia.org/wiki/Hlavn%C3%AD_strana</base>
+    <generator>MediaWiki 1.36.0-wmf.18</generator>
+    <case>first-letter</case>
+    <namespaces>
+      <namespace key="0" case="first-letter" />
+    </namespaces>
+  </siteinfo>
+"""
+PAGE = """  <page>
+    <title>Page {0}</title>
+    <ns>0</ns>
+    <id>{0}</id>
+    <revision>
+      <id>{1}</id>
+      <timestamp>2020-01-01T00:00:00Z</timestamp>
+      <contributor><username>Bar</username><id>2</id></contributor>
+      <model>wikitext</model>
+      <format>text/x-wiki</format>
+      <text bytes="3" xml:space="preserve">{2}</text>
+      <sha1>aaa</sha1>
+    </revision>
+  </page>
+"""
+PAGES = 40
+PAGES_PER_STREAM = 4
+
+
+def write_multistream(directory):
+    """
+    Writes a dump with one bz2 stream for the header, one per
+    `PAGES_PER_STREAM` pages and one for the closing tag, like the
+    "pages-articles-multistream" dumps.
+    """
+    path = str(directory.join(
+        "cswiki-20240101-pages-articles-multistream1.xml-p1p40.bz2"))
+    index = []
+    with open(path, "wb") as f:
+        f.write(bz2.compress(HEADER.encode('utf-8')))
+        for start in range(1, PAGES + 1, PAGES_PER_STREAM):
+            offset = f.tell()
+            page_ids = range(start, start + PAGES_PER_STREAM)
+            xml = "".join(PAGE.format(page_id, page_id * 10,
+                                      " ".join(["text"] * page_id))
+                          for page_id in page_ids)
+            f.write(bz2.compress(xml.encode('utf-8')))
+            index.extend("{0}:{1}:Page {1}\n".format(offset, page_id)
+                         for page_id in page_ids)
+        f.write(bz2.compress(b"</mediawiki>\n"))
+    with bz2.open(str(directory.join(
+            "cswiki-20240101-pages-articles-multistream-index1.txt-p1p40.bz2")),
+            "wt") as f:
+        f.writelines(index)
+    return path
+
+
+def read_page_ids(f):
+    return [page.id for page in dump_reader.read_xml(f)]
+
+
+def test_largest_first(tmpdir):
+    paths = []
+    for name, size in [("a", 10), ("b", 30), ("c", 20), ("d", 30)]:
+        path = str(tmpdir.join(name))
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        paths.append(path)
+    assert largest_first(paths) == [paths[1], paths[3], paths[2], paths[0]]
+
+
+def test_plan_tasks(tmpdir):
+    path = write_multistream(tmpdir)
+    assert multistream_index_path(path) is not None
+    other_path = str(tmpdir.join("other.xml.bz2"))
+    with bz2.open(other_path, "wt") as f:
+        f.write(HEADER + "</mediawiki>\n")
+    assert multistream_index_path(other_path) is None
+
+    # Without a split size, files are ordered by size
+    tasks = plan_tasks([other_path, path])
+    assert [(task.path, task.part) for task in tasks] == \
+        [(path, None), (other_path, None)]
+
+    tasks = plan_tasks([other_path, path], split_size=600)
+    parts = sorted((task for task in tasks if task.path == path),
+                   key=lambda task: task.part)
+    assert len(parts) > 2
+    assert [task.size for task in tasks] == \
+        sorted((task.size for task in tasks), reverse=True)
+    # The parts cover all of the page streams
+    assert parts[-1].end is None
+    assert all(part.end == next_part.start
+               for part, next_part in zip(parts, parts[1:]))
+
+    page_ids = []
+    for task in parts:
+        task_page_ids = read_page_ids(open_task(task))
+        assert len(task_page_ids) > 0
+        page_ids.extend(task_page_ids)
+    assert page_ids == list(range(1, PAGES + 1))
+
+
+def test_streamer_split(tmpdir):
+    path = write_multistream(tmpdir.mkdir("input"))
+    output_dir = tmpdir.mkdir("output")
+
+    def read_docs(dump, verbose):
+        for page in dump:
+            for revision in page:
+                yield {'id': revision.id,
+                       'page': {'id': page.id, 'page_name': page.title}}
+
+    streamer = RevdocStreamer("", "test", read_docs,
+                              file_reader=dump_reader.read_xml)
+    streamer.split_size = 600
+    streamer.run([path], 2, {}, str(output_dir), "bz2", False)
+
+    manifest = read_manifest(str(output_dir))
+    parts = [shard['part'] for shard in manifest['shards']]
+    assert parts == list(range(len(parts))) and len(parts) > 2
+    docs = []
+    for shard_path in expand_manifests([str(output_dir)]):
+        with bz2.open(shard_path, "rt") as f:
+            docs.extend(json.loads(line) for line in f)
+    assert [doc['page']['id'] for doc in docs] == list(range(1, PAGES + 1))
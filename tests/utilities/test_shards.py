@@ -0,0 +1,170 @@
+import bz2
+import json
+import os
+
+import pytest
+
+from mwtext.utilities.page_index import PageIndex
+from mwtext.utilities.revdoc_format import open_revdocs
+from mwtext.utilities.shards import (ShardWriter, expand_manifests,
+                                     read_manifest, verify_manifest,
+                                     write_manifest)
+from mwtext.utilities.streamer import RevdocStreamer
+
+
+def rev_docs(pages=25):
+    for page_id in range(1, pages + 1):
+        yield {'id': page_id * 10,
+               'page': {'id': page_id,
+                        'page_name': "Page {0}".format(page_id)},
+               'transformed_content': ["words", str(page_id)]}
+
+
+def write_shards(output_dir, **kwargs):
+    writer = ShardWriter("/dumps/enwiki-pages1.xml.bz2", output_dir, "bz2",
+                         **kwargs)
+    for doc in rev_docs():
+        writer.write(doc)
+    shards = writer.close()
+    write_manifest(output_dir, shards)
+    return shards
+
+
+def read_all(paths):
+    docs = []
+    for path in paths:
+        for line in open_revdocs(path):
+            docs.append(json.loads(line) if isinstance(line, str) else line)
+    return docs
+
+
+def test_shard_records(tmpdir):
+    shards = write_shards(str(tmpdir), max_records=10)
+    assert [shard['path'] for shard in shards] == \
+        ["enwiki-pages1.xml-00000.bz2", "enwiki-pages1.xml-00001.bz2",
+         "enwiki-pages1.xml-00002.bz2"]
+    assert [shard['records'] for shard in shards] == [10, 10, 5]
+    assert [(shard['min_page_id'], shard['max_page_id'])
+            for shard in shards] == [(1, 10), (11, 20), (21, 25)]
+
+    manifest = read_manifest(str(tmpdir))
+    assert manifest['records'] == 25
+    assert verify_manifest(manifest, checksums=True) == []
+    assert read_all(expand_manifests([str(tmpdir)])) == list(rev_docs())
+
+
+def test_split_dump_parts(tmpdir):
+    # Parts of a split dump share everything before their first "."
+    paths = ["/dumps/enwiki-articles27.xml-p1p41242.bz2",
+             "/dumps/enwiki-articles27.xml-p41243p151573.bz2"]
+    for binary in (False, True):
+        for max_records in (None, 10):
+            output_dir = str(tmpdir.mkdir("{0}-{1}".format(binary,
+                                                           max_records)))
+            shards = []
+            for path in paths:
+                writer = ShardWriter(path, output_dir, "bz2", binary=binary,
+                                     max_records=max_records)
+                for doc in rev_docs():
+                    writer.write(doc)
+                shards.extend(writer.close())
+            names = [shard['path'] for shard in shards]
+            assert len(set(names)) == len(names)
+            assert len(os.listdir(output_dir)) == len(names)
+            if binary:
+                assert all(name.endswith(".revdocs.bz2") for name in names)
+
+
+def test_binary_shard_names(tmpdir):
+    writer = ShardWriter("/dumps/enwiki-articles27.xml-p1p41242.bz2",
+                         str(tmpdir), "bz2", binary=True, max_records=10)
+    for doc in rev_docs():
+        writer.write(doc)
+    assert [shard['path'] for shard in writer.close()][:2] == \
+        ["enwiki-articles27.xml-p1p41242-00000.revdocs.bz2",
+         "enwiki-articles27.xml-p1p41242-00001.revdocs.bz2"]
+
+
+def test_shard_bytes(tmpdir):
+    shards = write_shards(str(tmpdir), binary=True, max_bytes=300,
+                          index=True, block_size=4)
+    assert len(shards) > 1
+    assert all(shard['path'].endswith(".revdocs.bz2") for shard in shards)
+    # Every shard but the last reaches the size limit
+    assert all(shard['uncompressed_bytes'] >= 300 for shard in shards[:-1])
+    assert sum(shard['records'] for shard in shards) == 25
+    assert read_all(expand_manifests(
+        [str(tmpdir.join("manifest.json"))])) == list(rev_docs())
+
+    last = shards[-1]
+    page_index = PageIndex.load(str(tmpdir.join(last['index'])))
+    assert [doc['id'] for doc in page_index.find(
+        page_id=last['max_page_id'])] == [last['max_page_id'] * 10]
+
+
+def test_gz_checksums(tmpdir, monkeypatch):
+    # Writing the same records again gives the same bytes, even if the clock
+    # has moved on
+    for index in (False, True):
+        sha256s = []
+        for i, now in enumerate([1000000000, 2000000000]):
+            monkeypatch.setattr("time.time", lambda: now)
+            output_dir = str(tmpdir.join("{0}-{1}".format(index, i)))
+            os.mkdir(output_dir)
+            writer = ShardWriter("/dumps/enwiki-pages1.xml.bz2", output_dir,
+                                 "gz", max_records=10, index=index,
+                                 block_size=4)
+            for doc in rev_docs():
+                writer.write(doc)
+            sha256s.append([shard['sha256'] for shard in writer.close()])
+        assert sha256s[0] == sha256s[1]
+
+
+def test_incomplete_manifest(tmpdir):
+    write_shards(str(tmpdir), max_records=10)
+    with open(str(tmpdir.join("enwiki-pages1.xml-00001.bz2")), "ab") as f:
+        f.write(b"\x00")
+    os.remove(str(tmpdir.join("enwiki-pages1.xml-00002.bz2")))
+
+    problems = verify_manifest(read_manifest(str(tmpdir)))
+    assert len(problems) == 2
+    with pytest.raises(RuntimeError):
+        expand_manifests([str(tmpdir)])
+
+
+def test_streamer_manifest(tmpdir):
+    input_dir = tmpdir.mkdir("input")
+    output_dir = tmpdir.mkdir("output")
+    docs = list(rev_docs())
+    paths = []
+    for i, part in enumerate([docs[:15], docs[15:]]):
+        path = str(input_dir.join("part{0}.json.bz2".format(i)))
+        with bz2.open(path, "wt") as f:
+            for doc in part:
+                f.write(json.dumps(doc) + "\n")
+        paths.append(path)
+
+    streamer = RevdocStreamer(
+        "", "test", lambda docs, verbose: docs)
+    streamer.shard_records = 4
+    streamer.run(paths, 1, {}, str(output_dir), "bz2", False)
+
+    manifest = read_manifest(str(output_dir))
+    assert manifest['format'] == "json"
+    assert [shard['records'] for shard in manifest['shards']] == \
+        [4, 4, 4, 3, 4, 4, 2]
+    assert [shard['input'] for shard in manifest['shards']] == \
+        [paths[0]] * 4 + [paths[1]] * 3
+    assert read_all(expand_manifests([str(output_dir)])) == docs
+
+    # Unsharded output gets a manifest too
+    output_dir = tmpdir.mkdir("unsharded")
+    streamer.shard_records = None
+    streamer.binary = True
+    streamer.run(paths, 1, {}, str(output_dir), "gz", False)
+    manifest = read_manifest(str(output_dir))
+    assert manifest['format'] == "binary"
+    assert [os.path.basename(shard['path'])
+            for shard in manifest['shards']] == \
+        ["part0.revdocs.gz", "part1.revdocs.gz"]
+    assert read_all(expand_manifests([str(output_dir)])) == docs
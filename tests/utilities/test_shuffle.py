@@ -0,0 +1,45 @@
+import io
+import os
+
+from mwtext.utilities.shuffle import TRAIN, split_writer
+
+
+def write_lines(lines, tmp_dir, shuffle=True, seed=0, buckets=4):
+    train, validation = io.StringIO(), io.StringIO()
+    writer = split_writer(train, held_out=[("validation", 0.2, validation)],
+                          shuffle=shuffle, seed=seed, buckets=buckets,
+                          tmp_dir=tmp_dir)
+    # Writes don't need to line up with line breaks
+    text = "".join(line + "\n" for line in lines)
+    writer.write(text[:7])
+    writer.write(text[7:])
+    writer.close()
+    return writer, train.getvalue().split("\n")[:-1], \
+        validation.getvalue().split("\n")[:-1]
+
+
+def test_shuffle(tmpdir):
+    lines = ["line {0}".format(i) for i in range(1000)]
+    writer, train, validation = write_lines(lines, str(tmpdir))
+
+    assert sorted(train + validation) == sorted(lines)
+    assert 100 < len(validation) < 300
+    assert writer.counts == {TRAIN: len(train),
+                             'validation': len(validation)}
+    assert train != [line for line in lines if line in set(train)]
+    assert os.listdir(str(tmpdir)) == []
+
+    # The same seed gives the same output regardless of bucket count
+    _, train2, validation2 = write_lines(lines, str(tmpdir), buckets=7)
+    assert (train2, validation2) == (train, validation)
+    _, train3, _ = write_lines(lines, str(tmpdir), seed="other")
+    assert train3 != train
+
+
+def test_split_only(tmpdir):
+    lines = ["line {0}".format(i) for i in range(1000)]
+    _, train, validation = write_lines(lines, str(tmpdir), shuffle=False)
+    _, shuffled_train, shuffled_validation = write_lines(lines, str(tmpdir))
+
+    assert train == [line for line in lines if line not in set(validation)]
+    assert set(validation) == set(shuffled_validation)
@@ -0,0 +1,82 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from mwtext.utilities import sweep_vectors
+from mwtext.utilities.sweep_vectors import (divide_cpus, grid_trials,
+                                            random_trials, run_trial,
+                                            write_results)
+
+from .test_learn_vectors import fake_model
+
+
+def test_grid_trials():
+    trials = grid_trials({"lr": [0.1, 0.5], "dim": [50], "qt_cutoff": [0, 10]})
+    assert len(trials) == 4
+    assert trials[0] == {"dim": 50, "lr": 0.1, "qt_cutoff": 0}
+    assert {(t['lr'], t['qt_cutoff']) for t in trials} == \
+        {(0.1, 0), (0.1, 10), (0.5, 0), (0.5, 10)}
+
+
+def test_random_trials():
+    space = {"lr": {"min": 0.01, "max": 1.0, "log": True},
+             "epoch": {"min": 5, "max": 50, "int": True},
+             "dim": [50, 100]}
+    trials = random_trials(space, 20, seed=3)
+    assert trials == random_trials(space, 20, seed=3)
+    assert trials != random_trials(space, 20, seed=4)
+    for trial in trials:
+        assert 0.01 <= trial['lr'] <= 1.0
+        assert isinstance(trial['epoch'], int) and 5 <= trial['epoch'] <= 50
+        assert trial['dim'] in (50, 100)
+
+
+def test_divide_cpus():
+    assert divide_cpus(8, 2, 10) == (2, 4)
+    assert divide_cpus(8, 3, 10) == (3, 2)
+    # Never more concurrent threads than cpus
+    assert divide_cpus(2, 4, 10) == (2, 1)
+    # Fewer trials than --parallel get the whole budget
+    assert divide_cpus(8, 4, 2) == (2, 4)
+    assert divide_cpus(8, 4, 0) == (1, 8)
+
+
+def test_sweep_vectors_thread_param(tmpdir):
+    with pytest.raises(ValueError):
+        sweep_vectors.sweep_vectors("train", "validation", [{"thread": 4}],
+                                    str(tmpdir))
+
+
+def test_run_trial_and_write_results(tmpdir, monkeypatch):
+    output_dir = str(tmpdir)
+
+    def train_model(input_path, params, qt_cutoff):
+        if params['lr'] > 1:
+            raise RuntimeError("Encountered NaN.")
+        return SimpleNamespace(
+            test=lambda path: (10, params['lr'], params['lr']),
+            save_model=lambda path: open(path, "w").close())
+
+    monkeypatch.setattr(sweep_vectors, "train_model", train_model)
+    monkeypatch.setattr(sweep_vectors, "fasttext", SimpleNamespace(
+        load_model=lambda path: SimpleNamespace(
+            get_words=lambda: ["foo", "bar"], **vars(fake_model()))))
+
+    results = [run_trial((i, {"lr": lr}, 2, "train", "validation", output_dir))
+               for i, lr in enumerate([0.1, 0.5, 2.0])]
+    assert [r['precision'] for r in results] == [0.1, 0.5, None]
+
+    best = write_results(results, output_dir)
+    assert best['trial'] == 1
+    assert sorted(os.listdir(output_dir)) == \
+        ["best.ftz", "results.tsv", "vectors.vec"]
+    with open(os.path.join(output_dir, "results.tsv")) as f:
+        lines = f.read().splitlines()
+    assert lines[0].split("\t")[:4] == \
+        ["trial", "params", "examples", "precision"]
+    assert lines[3].split("\t")[:4] == ["2", '{"lr": 2.0}', "0", "None"]
+    with open(os.path.join(output_dir, "vectors.vec")) as f:
+        assert f.readline() == "2 4\n"
+
+    assert write_results(results[2:], output_dir) is None
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+from mwtext.content_transformers.util import \
+    generate_non_link_namespace_names
+from mwtext.filter_functions import all_pages_and_revisions
+from mwtext.site_cache import SiteCache
+from mwtext.utilities.util import (in_sample, is_relevant_page_header,
+                                   read_dump_siteinfo)
+
+DUMP_HEADER = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">
+  <siteinfo>
+    <sitename>Wikipedie</sitename>
+    <dbname>cswiki</dbname>
+    <base>https://cs.wikipedia.org/wiki/Hlavn%C3%AD_strana</base>
+    <generator>MediaWiki 1.36.0-wmf.18</generator>
+    <case>first-letter</case>
+    <namespaces>
+      <namespace key="0" case="first-letter" />
+      <namespace key="6" case="first-letter">Soubor</namespace>
+      <namespace key="14" case="first-letter">Kategorie</namespace>
+    </namespaces>
+  </siteinfo>
+</mediawiki>
+"""
+
+
+def test_read_dump_siteinfo(tmpdir):
+    path = str(tmpdir.join("cswiki.xml"))
+    with open(path, "w") as f:
+        f.write(DUMP_HEADER)
+
+    siteinfo = read_dump_siteinfo(path)
+    assert siteinfo['general']['server'] == "//cs.wikipedia.org"
+    assert siteinfo['namespaces']['6'] == \
+        {'id': 6, 'name': "Soubor", 'canonical': "File",
+         'case': "first-letter"}
+    assert generate_non_link_namespace_names(siteinfo) == \
+        {"soubor", "file", "image", "kategorie", "category"}
+
+    # Aliases come from the cache when it has them
+    cache = SiteCache(str(tmpdir.join("cache")), offline=True)
+    cache.put("https://cs.wikipedia.org", "siteinfo",
+              {'namespacealiases': [{'id': 6, 'alias': "Obrázek"}]})
+    siteinfo = read_dump_siteinfo(path, cache=cache)
+    assert generate_non_link_namespace_names(siteinfo) == \
+        {"soubor", "file", "obrázek", "kategorie", "category"}
+
+
+def test_is_relevant_page_header():
+    page = SimpleNamespace(namespace=0, title="Foo")
+    assert is_relevant_page_header(page)
+    assert is_relevant_page_header(page, allowed_namespaces={0})
+    assert not is_relevant_page_header(page, allowed_namespaces={14})
+
+    assert is_relevant_page_header(page, all_pages_and_revisions)
+    only_bar = SimpleNamespace(include_page=lambda page: page.title == "Bar")
+    assert not is_relevant_page_header(page, only_bar)
+
+    # Modules without include_page() are checked per revision only
+    no_include_page = SimpleNamespace(include=lambda page, revision: False)
+    assert is_relevant_page_header(page, no_include_page)
+
+
+def test_in_sample():
+    sample = [id for id in range(10000) if in_sample(id, 0.05)]
+    assert 400 < len(sample) < 600
+    assert sample == [id for id in range(10000) if in_sample(id, 0.05)]
+    assert sample != [id for id in range(10000)
+                      if in_sample(id, 0.05, seed="other")]
+    # Larger samples contain smaller ones
+    assert set(sample) <= {id for id in range(10000) if in_sample(id, 0.1)}
+    assert not any(in_sample(id, 0) for id in range(1000))
+    assert all(in_sample(id, 1) for id in range(1000))
+
+    page = SimpleNamespace(id=sample[0], namespace=0)
+    assert is_relevant_page_header(page, sample_rate=0.05)
+    page = SimpleNamespace(id=sample[0] + 1, namespace=0)
+    assert is_relevant_page_header(page, sample_rate=0.05) == \
+        in_sample(sample[0] + 1, 0.05)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from mwtext.utilities.query_index import evaluate, query_index
+from mwtext.utilities.vector_index import (ExactIndex, IVFIndex, load_index,
+                                           recall)
+
+from .test_product_quantizer import clustered_vectors
+
+
+def brute_force(vectors, queries, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(queries @ vectors.T), axis=1, kind='stable')[:, :k]
+
+
+def test_exact_index(tmpdir):
+    vectors = clustered_vectors()
+    keys = ["k{0}".format(i) for i in range(len(vectors))]
+    index = ExactIndex.build(vectors, keys)
+    ids, scores = index.search(vectors[:20], k=5, block_size=64)
+    assert ids.shape == (20, 5)
+    assert np.array_equal(ids, brute_force(vectors, vectors[:20], 5))
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+    dot_index = ExactIndex.build(vectors, keys, metric="dot")
+    ids, scores = dot_index.search(vectors[:1], k=3, block_size=100)
+    assert np.allclose(scores[0], np.sort(vectors @ vectors[0])[::-1][:3])
+
+    path = str(tmpdir.join("exact"))
+    index.save(path)
+    loaded = load_index(path)
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.keys == keys and loaded.metric == "cosine"
+    results = list(query_index(loaded, ["k0", "missing"], k=3,
+                               batch_size=1))
+    assert results[1] == {'query': "missing", 'neighbors': []}
+    neighbors = [key for key, _ in results[0]['neighbors']]
+    assert "k0" not in neighbors and len(neighbors) == 3
+    assert neighbors == ["k{0}".format(i) for i in
+                         brute_force(vectors, vectors[:1], 4)[0][1:]]
+
+
+def test_ivf_index(tmpdir):
+    vectors = clustered_vectors(n=2000, dim=8)
+    keys = ["k{0}".format(i) for i in range(len(vectors))]
+    index = IVFIndex.build(vectors, keys, nlist=16, sample=1000)
+    assert index.offsets[-1] == len(vectors)
+    assert sorted(index.ids) == list(range(len(vectors)))
+
+    queries = vectors[:50]
+    expected = brute_force(vectors, queries, 10)
+    # Probing every list is exact
+    ids, _ = index.search(queries, k=10, nprobe=16)
+    assert recall(expected, ids) == 1.0
+    few_ids, _ = index.search(queries, k=10, nprobe=1)
+    assert recall(expected, few_ids) <= 1.0
+    assert index.search(queries[:0], k=10)[0].shape == (0, 10)
+
+    path = str(tmpdir.join("ivf"))
+    index.save(path)
+    loaded = load_index(path)
+    assert isinstance(loaded, IVFIndex)
+    assert np.allclose(loaded.vectors_of(["k3"]),
+                       vectors[3] / np.linalg.norm(vectors[3]))
+    report = evaluate(loaded, k=10, nprobe=16, sample=100, batch_size=30)
+    assert report['queries'] == 100
+    assert report['recall'] == 1.0
@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from mwtext.utilities.learn_vectors import (write_word2vec_binary,
+                                            write_word2vec_text)
+from mwtext.utilities.word2vec2gensim import (get_vectors,
+                                              read_binary_vectors,
+                                              word2vec2gensim)
+
+WORDS = ["foo", "bär", "baz", "foo"]
+VECTORS = np.array([[0.5, -1.25, 2.0],
+                    [3.0, 0.125, -0.5],
+                    [0.0, 0.0, 0.0],
+                    [1.0, 1.0, 1.0]], dtype=np.float32)
+
+
+def test_word2vec2gensim(tmpdir):
+    text_path = str(tmpdir.join("vectors.vec"))
+    with open(text_path, "w") as f:
+        write_word2vec_text(WORDS, VECTORS, f)
+    binary_path = str(tmpdir.join("vectors.bin"))
+    with open(binary_path, "wb") as f:
+        write_word2vec_binary(WORDS, VECTORS, f)
+
+    output_path = str(tmpdir.join("vectors.kv"))
+    for input_path, binary in [(text_path, False), (binary_path, True)]:
+        # The repeated "foo" is dropped
+        word2vec2gensim(input_path, None, output_path, False, binary=binary)
+        kv = KeyedVectors.load(output_path, mmap='r')
+        assert isinstance(kv.vectors, np.memmap)
+        assert kv.index_to_key == WORDS[:3]
+        assert np.array_equal(kv.vectors, VECTORS[:3])
+
+        word2vec2gensim(input_path, 2, output_path, False, binary=binary,
+                        dtype=np.float16)
+        kv = KeyedVectors.load(output_path, mmap='r')
+        assert kv.vectors.dtype == np.float16
+        assert kv.index_to_key == WORDS[:2]
+        assert np.allclose(get_vectors(kv, ["bär"]), VECTORS[1:2])
+
+
+def test_int8(tmpdir):
+    input_path = str(tmpdir.join("vectors.vec"))
+    with open(input_path, "w") as f:
+        write_word2vec_text(WORDS[:3], VECTORS[:3], f)
+
+    output_path = str(tmpdir.join("vectors.kv"))
+    with pytest.raises(ValueError):
+        word2vec2gensim(input_path, None, output_path, False, dtype=np.int8)
+
+
+def test_read_binary_vectors():
+    words = ["w{0}".format(i) for i in range(50)] + ["bär"]
+    vectors = np.arange(len(words) * 3, dtype=np.float32).reshape(-1, 3)
+    f = io.BytesIO()
+    write_word2vec_binary(words, vectors, f)
+    f.seek(0)
+    f.readline()
+    data = f.read()
+
+    # Chunks that split words and vectors
+    for chunk_size in (1, 7, 1 << 20):
+        pairs = list(read_binary_vectors(io.BytesIO(data), 3,
+                                         chunk_size=chunk_size))
+        assert [word for word, _ in pairs] == words
+        assert np.array_equal(np.array([v for _, v in pairs]), vectors)
+
+    # Without trailing newlines
+    data = b"".join(word.encode('utf-8') + b" " + vector.tobytes()
+                    for word, vector in zip(words, vectors))
+    pairs = list(read_binary_vectors(io.BytesIO(data), 3, chunk_size=5))
+    assert [word for word, _ in pairs] == words
+
+    with pytest.raises(ValueError):
+        list(read_binary_vectors(io.BytesIO(data[:-1]), 3))
+    with pytest.raises(ValueError):
+        list(read_binary_vectors(io.BytesIO(data + b"foo"), 3))
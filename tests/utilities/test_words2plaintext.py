@@ -0,0 +1,72 @@
+import io
+import json
+import os
+
+from mwtext.utilities.words2plaintext import (create_label_map,
+                                              decode_words_doc, process_line,
+                                              run, run_join)
+
+
+def rev_doc_line(page_name, words, **kwargs):
+    return json.dumps({'id': 1, 'comment': '"page_name": "Trick"',
+                       'page': {'id': 2, 'title': page_name,
+                                'page_name': page_name},
+                       'transformed_content': words}, **kwargs) + "\n"
+
+
+def test_decode_words_doc():
+    line = rev_doc_line('Foo "bar"', ["foo", "bar"])
+    assert decode_words_doc(line) == ('Foo "bar"', ["foo", "bar"])
+
+    line = rev_doc_line("Foo", ["foo"], separators=(",", ":"))
+    assert decode_words_doc(line) == ("Foo", ["foo"])
+
+
+def test_run_parallel():
+    lines = [rev_doc_line("Page {0}".format(i), ["word", str(i)])
+             for i in range(2500)]
+    page_name2labels = {"Page {0}".format(i): {i % 3} for i in range(0, 2500, 2)}
+
+    serial = io.StringIO()
+    run([io.StringIO("".join(lines))], page_name2labels, serial, False)
+    assert serial.getvalue().split("\n")[:2] == \
+        ["word 0 __label__0", "word 2 __label__2"]
+
+    parallel = io.StringIO()
+    run([io.StringIO("".join(lines))], page_name2labels, parallel, False,
+        threads=3)
+    assert parallel.getvalue() == serial.getvalue()
+
+    unordered = io.StringIO()
+    run([io.StringIO("".join(lines))], page_name2labels, unordered, False,
+        threads=3, ordered=False)
+    assert sorted(unordered.getvalue().split("\n")) == \
+        sorted(serial.getvalue().split("\n"))
+
+
+def test_run_join(tmpdir):
+    lines = [rev_doc_line("Page {0}".format(i), ["word", str(i)])
+             for i in range(50)]
+    labels = "".join(
+        json.dumps({'qid': "Q{0}".format(i),
+                    'sitelinks': {'en': "Page {0}".format(i)},
+                    'taxo_labels': ["label {0}".format(i % 3)]}) + "\n"
+        for i in range(0, 50, 2))
+
+    page_name2labels, _ = create_label_map(
+        io.StringIO(labels), "en", "taxo_labels")
+    in_memory = io.StringIO()
+    run([io.StringIO("".join(lines))], page_name2labels, in_memory, False)
+
+    joined = io.StringIO()
+    run_join([io.StringIO("".join(lines))], io.StringIO(labels), "en",
+             "taxo_labels", joined, False, buffer_size=7, tmp_dir=str(tmpdir))
+    assert sorted(joined.getvalue().split("\n")) == \
+        sorted(in_memory.getvalue().split("\n"))
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_vocab():
+    line = rev_doc_line("Foo", ["foo", "bar", "foo", "baz"])
+    assert process_line(line, {"Foo": [1]}, vocab={"foo", "baz"}) == \
+        "foo foo baz __label__1"